@@ -0,0 +1,206 @@
+# Headless audit of the whole dataset: validation, text/CSV export and skeleton contact sheets
+#
+# Every sample of every mudra (mudra_data/<label>/*.npy or a packed dataset) is checked for
+#   unreadable    the .npy file can't be loaded
+#   shape         not a (21, 3) array
+#   not finite    NaN or infinite coordinates
+#   out of range  x or y more than --margin outside the frame (0-1), or |z| above --max-z
+#   collapsed     all landmarks on (almost) one point
+# and written to the output folder:
+#   landmarks.csv            one row per sample: label, sample name, x0 y0 z0 ... x20 y20 z20
+#   problems.csv             one row per problem found
+#   text/<label>_landmarks.txt   the per-finger listing of export_finger_landmarks.py, for every mudra
+#   sheets/<label>_NN.png    contact sheets of --per-sheet skeletons each, every hand scaled to its
+#                            tile, problem samples framed in red with the problem written on them
+# Each sheet's samples are one task for a process pool: a worker loads them, checks them, formats
+# their CSV rows and text in one string each and renders and saves the sheet. The results come back
+# in order, and every file is written with one call per task instead of one per line.
+#   python audit_mudra_data.py                       # mudra_data (or mudra_data.pack) -> mudra_audit/
+#   python audit_mudra_data.py mudra_data --strict   # exit status 1 when any sample has a problem
+import argparse
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from mudra_dataset import default_data, is_pack, iter_tree, open_pack
+
+FINGER_INDICES = {
+    "Thumb": [1, 2, 3, 4],
+    "Index": [5, 6, 7, 8],
+    "Middle": [9, 10, 11, 12],
+    "Ring": [13, 14, 15, 16],
+    "Pinky": [17, 18, 19, 20],
+}
+CSV_HEADER = "label,sample," + ",".join(f"{axis}{i}" for i in range(21) for axis in "xyz") + "\n"
+TILE = 160              # contact sheet tile size in pixels
+COLUMNS = 6
+HEADER = 30             # sheet title height in pixels
+
+_packs = {}             # per-worker open packed datasets, by path
+
+def format_sample(name, sample):
+    # the per-finger listing of one sample, as export_finger_landmarks.py writes it
+    lines = [f"\nSample: {name}", f"Shape: {sample.shape} (should be 21, 3)"]
+    for finger_name, indices in FINGER_INDICES.items():
+        lines.append(f"\n{finger_name} landmarks:")
+        lines += [f"  L{idx}: ({x:.4f}, {y:.4f}, {z:.4f})" for idx, (x, y, z) in zip(indices, sample[indices])]
+    lines.append("-" * 40)
+    return "\n".join(lines) + "\n"
+
+def check_sample(sample, margin=0.1, max_z=1.0):
+    # -> the sample's problem (see the top of the file), None when it looks fine
+    if sample.shape != (21, 3):
+        return f"shape {sample.shape}"
+    if not np.isfinite(sample).all():
+        return "not finite"
+    if (sample[:, :2] < -margin).any() or (sample[:, :2] > 1 + margin).any() or (np.abs(sample[:, 2]) > max_z).any():
+        return "out of range"
+    if np.ptp(sample[:, :2], axis=0).max() < 1e-3:
+        return "collapsed"
+    return None
+
+def _tile(sample, name, problem):
+    # one skeleton, scaled and centered to fill the tile, with its name (and problem) underneath
+    import cv2
+    from preview_mudra_samples import draw_hand
+    tile = np.full((TILE, TILE, 3), 255, dtype=np.uint8)
+    if problem is None or problem in ("out of range", "collapsed"):
+        points = sample[:, :2].astype(np.float64)
+        low = points.min(axis=0)
+        span = max(np.ptp(points, axis=0).max(), 1e-6)
+        # leaves room for the caption at the bottom
+        fitted = (points - low) / span * 0.65 + (1 - np.ptp(points, axis=0) / span * 0.65) / 2 + [0, 0.02]
+        draw_hand(tile, np.column_stack([fitted, sample[:, 2]]))
+    if problem is not None:
+        cv2.rectangle(tile, (1, 1), (TILE - 2, TILE - 2), (0, 0, 255), 3)
+        cv2.putText(tile, problem[:22], (6, 18), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 0, 255), 1)
+    cv2.putText(tile, os.path.splitext(name)[0][-22:], (6, TILE - 8), cv2.FONT_HERSHEY_PLAIN, 0.9, (0, 0, 0), 1)
+    return tile
+
+def render_sheet(path, title, tiles):
+    import cv2
+    rows = -(-len(tiles) // COLUMNS)
+    sheet = np.full((HEADER + rows * TILE, COLUMNS * TILE, 3), 230, dtype=np.uint8)
+    cv2.putText(sheet, title, (8, 21), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 1)
+    for i, tile in enumerate(tiles):
+        row, column = divmod(i, COLUMNS)
+        sheet[HEADER + row * TILE:HEADER + (row + 1) * TILE, column * TILE:(column + 1) * TILE] = tile
+    cv2.imwrite(path, sheet)
+
+def _load(source, item):
+    # (name, sample) of a tree file path or a pack row, sample is None when the file can't be read
+    if isinstance(item, str):
+        try:
+            return os.path.basename(item), np.load(item, allow_pickle=False)
+        except (OSError, ValueError):
+            return os.path.basename(item), None
+    label, index, row = item
+    if source not in _packs:
+        _packs[source] = open_pack(source)
+    return f"{label}_{index:03d}.npy", np.array(_packs[source].landmarks[row])
+
+def audit_shard(task):
+    # one sheet's worth of samples -> (label, CSV rows, text, [(label, name, problem)], samples)
+    source, label, items, sheet_path, title, options = task
+    csv_rows, text, problems, tiles = [], [], [], []
+    for item in items:
+        name, sample = _load(source, item)
+        if sample is None:
+            problem = "unreadable"
+        else:
+            problem = check_sample(sample, options["margin"], options["max_z"])
+            if sample.shape == (21, 3):
+                csv_rows.append(f"{label},{name}," + ",".join(f"{v:.6f}" for v in sample.ravel().tolist()))
+                if options["export"]:
+                    text.append(format_sample(name, sample))
+        if problem is not None:
+            problems.append((label, name, problem))
+        if sheet_path is not None:
+            tiles.append(_tile(sample, name, problem))
+    if sheet_path is not None:
+        render_sheet(sheet_path, title, tiles)
+    return label, "".join(row + "\n" for row in csv_rows), "".join(text), problems, len(items)
+
+def make_tasks(source, out_dir, per_sheet, sheets, options):
+    # splits every mudra's samples into tasks of per_sheet samples, in label order
+    by_label = {}
+    if is_pack(source):
+        dataset = open_pack(source)
+        for row, (label, index) in enumerate(zip(dataset.label_names().tolist(), dataset.indices.tolist())):
+            by_label.setdefault(label, []).append((label, index, row))
+    else:
+        for label, path in iter_tree(source):
+            by_label.setdefault(label, []).append(path)
+    tasks = []
+    for label in sorted(by_label):
+        items = by_label[label]
+        for sheet, start in enumerate(range(0, len(items), per_sheet)):
+            chunk = items[start:start + per_sheet]
+            sheet_path = os.path.join(out_dir, "sheets", f"{label}_{sheet:02d}.png") if sheets else None
+            title = f"{label}: samples {start + 1}-{start + len(chunk)} of {len(items)}"
+            tasks.append((source, label, chunk, sheet_path, title, options))
+    return tasks
+
+def run(source, out_dir, workers=None, per_sheet=30, sheets=True, export=True, margin=0.1, max_z=1.0):
+    # -> (samples, problems) after writing everything to out_dir
+    options = {"export": export, "margin": margin, "max_z": max_z}
+    for folder in ["sheets"] * sheets + ["text"] * export:
+        os.makedirs(os.path.join(out_dir, folder), exist_ok=True)
+    tasks = make_tasks(source, out_dir, per_sheet, sheets, options)
+    samples, problems = 0, []
+    text_file, text_label = None, None
+    with open(os.path.join(out_dir, "landmarks.csv"), "w", buffering=1 << 20) as csv_file, Pool(workers) as pool:
+        csv_file.write(CSV_HEADER)
+        try:
+            # tasks come back in order, so every file stays sorted by label and sample
+            for label, csv_rows, text, shard_problems, count in pool.imap(audit_shard, tasks):
+                csv_file.write(csv_rows)
+                if export:
+                    if label != text_label:
+                        if text_file is not None:
+                            text_file.close()
+                        text_file = open(os.path.join(out_dir, "text", f"{label}_landmarks.txt"), "w", buffering=1 << 20)
+                        text_file.write(f"=== Gesture: {label} ===\n")
+                        text_label = label
+                    text_file.write(text)
+                problems += shard_problems
+                samples += count
+        finally:
+            if text_file is not None:
+                text_file.close()
+    with open(os.path.join(out_dir, "problems.csv"), "w") as f:
+        f.write("label,sample,problem\n" + "".join(f"{label},{name},{problem}\n" for label, name, problem in problems))
+    return samples, problems
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Validate every sample, export them to text/CSV and render skeleton contact sheets")
+    parser.add_argument("source", nargs="?", default=None,
+                        help="mudra_data folder or packed dataset (default: mudra_data.pack if present, else mudra_data)")
+    parser.add_argument("-o", "--output", default="mudra_audit", help="output folder (default: mudra_audit)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--per-sheet", type=int, default=30, help="samples per contact sheet, also the task size (default: 30)")
+    parser.add_argument("--no-sheets", action="store_true", help="skip rendering the contact sheets")
+    parser.add_argument("--no-text", action="store_true", help="skip the per-mudra text listings")
+    parser.add_argument("--margin", type=float, default=0.1, help="how far x and y may lie outside the frame (default: 0.1)")
+    parser.add_argument("--max-z", type=float, default=1.0, help="largest accepted |z| (default: 1.0)")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 when any sample has a problem")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    source = args.source or default_data()
+    start = time.perf_counter()
+    samples, problems = run(source, args.output, args.workers, args.per_sheet, not args.no_sheets, not args.no_text,
+                            args.margin, args.max_z)
+    elapsed = time.perf_counter() - start
+    print(f"Audited {samples} samples from '{source}' in {elapsed:.1f}s ({samples / max(elapsed, 1e-9):,.0f} samples/s) -> '{args.output}'")
+    for label, name, problem in problems[:20]:
+        print(f"  {label}/{name}: {problem}")
+    if len(problems) > 20:
+        print(f"  ... {len(problems) - 20} more in '{os.path.join(args.output, 'problems.csv')}'")
+    print(f"{len(problems)} problem samples")
+    if args.strict and problems:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Headless mudra recognition over recorded videos or image folders, spread across a process pool
+import argparse
+import csv
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from mudra_features import normalize_handedness
+from mudra_forest import DEFAULT_MODEL, load_model, load_model_and_features
+from mudra_startup import StartupProfiler, add_profile_argument
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# per-worker state, set up once by the pool initializer (cv2/mediapipe are only imported there and
+# in the functions that read frames, so argument parsing stays fast)
+_detector = None
+_forest = None
+_feature_set = None
+
+def _init_worker(model_path, max_num_hands, static_image_mode, flip):
+    global _detector, _forest, _feature_set
+    import mediapipe as mp
+    from mudra_roi import HandDetector
+    hands = mp.solutions.hands.Hands(static_image_mode=static_image_mode, max_num_hands=max_num_hands,
+                                     min_detection_confidence=0.7, min_tracking_confidence=0.7)
+    # flip mirrors the landmarks to match the selfie-view training data, the frames themselves are never flipped
+    _detector = HandDetector(hands, mirror=flip, use_roi=not static_image_mode, max_hands=max_num_hands)
+    _forest, _feature_set = load_model_and_features(model_path)
+
+def _video_frames(path, start, stop):
+    import cv2
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if start and not (cap.set(cv2.CAP_PROP_POS_FRAMES, start) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == start):
+        # the seek failed or landed elsewhere (it's inexact for many codecs), so the chunk would
+        # repeat or skip frames at its boundary: read up to start from the beginning instead
+        cap.release()
+        cap = cv2.VideoCapture(path)
+        for _ in range(start):
+            if not cap.grab():
+                break
+    for index in range(start, stop):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield index, index / fps, frame
+    cap.release()
+
+def _image_frames(paths, start):
+    import cv2
+    for index, path in enumerate(paths, start):
+        frame = cv2.imread(path)
+        if frame is not None:
+            yield index, 0.0, frame
+
+def process_chunk(task):
+    # runs detection on one chunk of frames, then classifies every detected hand in one batch
+    source, kind, start, stop, image_paths = task
+    frames = _video_frames(source, start, stop) if kind == "video" else _image_frames(image_paths, start)
+    rows, landmarks, handedness = [], [], []
+    _detector.reset()
+    for index, timestamp, frame in frames:
+        hands = _detector.detect(frame)
+        if not hands:
+            rows.append([source, index, timestamp, -1, None])
+            continue
+        for hand, hand_landmarks in enumerate(hands):
+            rows.append([source, index, timestamp, hand, len(landmarks)])
+            landmarks.append(hand_landmarks)
+        handedness.extend(_detector.handedness)
+
+    proba = np.empty((0, len(_forest.classes)))
+    if landmarks:
+        landmarks = np.array(landmarks)
+        proba = _forest.predict_proba(_feature_set.extract_batch(normalize_handedness(landmarks, handedness)))
+    n_classes = len(_forest.classes)
+    output = []
+    for source, index, timestamp, hand, row in rows:
+        if row is None:
+            output.append([source, index, f"{timestamp:.3f}", hand, "", ""] + [""] * (63 + n_classes))
+            continue
+        prediction = _forest.classes[np.argmax(proba[row])]
+        output.append([source, index, f"{timestamp:.3f}", hand, handedness[row], prediction]
+                      + [f"{v:.5f}" for v in landmarks[row].ravel()]
+                      + [f"{p:.4f}" for p in proba[row]])
+    return output
+
+def make_tasks(inputs, chunk_size):
+    # splits every video (by frame ranges) and image folder (by file ranges) into chunks
+    import cv2
+    tasks = []
+    for source in inputs:
+        if os.path.isdir(source):
+            paths = sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS))
+            for start in range(0, len(paths), chunk_size):
+                tasks.append((source, "images", start, None, paths[start:start + chunk_size]))
+        else:
+            cap = cv2.VideoCapture(source)
+            if not cap.isOpened():
+                print(f"Skipping '{source}': could not open video")
+                continue
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            for start in range(0, max(frame_count, 1), chunk_size):
+                # the last chunk reads until the video really ends, frame counts can be approximate
+                stop = start + chunk_size if start + chunk_size < frame_count else 2 ** 31
+                tasks.append((source, "video", start, stop, None))
+    return tasks
+
+def run(inputs, output, model_path=DEFAULT_MODEL, workers=None, chunk_size=256,
+        max_num_hands=1, static_image_mode=False, flip=True):
+    classes = load_model(model_path).classes
+    tasks = make_tasks(inputs, chunk_size)
+    header = (["source", "frame", "timestamp", "hand", "handedness", "prediction"]
+              + [f"{axis}{i}" for i in range(21) for axis in "xyz"]
+              + [f"p_{label}" for label in classes])
+    frames = 0
+    start = time.perf_counter()
+    with open(output, "w", newline="") as f, \
+            Pool(workers, initializer=_init_worker, initargs=(model_path, max_num_hands, static_image_mode, flip)) as pool:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        # chunks come back in order, so the table stays sorted by source and frame
+        for rows in pool.imap(process_chunk, tasks):
+            writer.writerows(rows)
+            frames += len({row[1] for row in rows})
+    elapsed = time.perf_counter() - start
+    return frames, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recognize mudras in recorded videos or image folders without a display")
+    parser.add_argument("inputs", nargs="+", help="video files and/or folders of images")
+    parser.add_argument("-o", "--output", default="mudra_results.csv", help="per-frame results table (CSV)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="exported model directory or .pkl")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="frames per task")
+    parser.add_argument("--max-hands", type=int, default=1, help="hands per frame, e.g. 2 per dancer for group footage (default: 1)")
+    parser.add_argument("--static", action="store_true", help="detect every frame independently (no tracking)")
+    parser.add_argument("--no-flip", action="store_true", help="don't mirror frames (training data was recorded mirrored)")
+    add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    if args.profile_startup:
+        # workers pay these costs again in every process
+        profiler = StartupProfiler(True)
+        with profiler.step("import cv2"):
+            import cv2
+        with profiler.step("import mediapipe"):
+            import mediapipe
+        with profiler.step("load model"):
+            load_model_and_features(args.model)
+        profiler.report()
+
+    frames, elapsed = run(args.inputs, args.output, args.model, args.workers, args.chunk_size,
+                          args.max_hands, args.static, not args.no_flip)
+    print(f"Processed {frames} frames in {elapsed:.1f}s ({frames / max(elapsed, 1e-9):.1f} frames/s) -> '{args.output}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Benchmarks audit_mudra_data.py on a synthetic dataset against the one-sample-at-a-time tools
+#
+# The dataset is NUM_SAMPLES jittered copies of the mudra_data samples written as a mudra_data tree.
+# "one at a time" is what auditing it took before: export_finger_landmarks.py's line-by-line
+# writes for every mudra and preview_mudra_samples.py's 480x480 canvas per sample (saved to a file
+# instead of shown for a second). The audit then runs with 1, 2, 4, ... workers up to one per core.
+#   python benchmark_audit.py [NUM_SAMPLES]
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from audit_mudra_data import FINGER_INDICES, run
+from mudra_dataset import iter_tree
+from mudra_synthetic import jittered_hands
+
+def write_tree(path, n):
+    hands, labels = jittered_hands(n, seed=7)
+    counts = {}
+    for hand, label in zip(hands, labels.tolist()):
+        os.makedirs(os.path.join(path, label), exist_ok=True)
+        counts[label] = counts.get(label, -1) + 1
+        np.save(os.path.join(path, label, f"{label}_{counts[label]:03d}.npy"), hand)
+
+def one_at_a_time(data_dir, out_dir):
+    import cv2
+    from preview_mudra_samples import draw_hand
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for label, path in iter_tree(data_dir):
+        sample = np.load(path)
+        if label not in files:
+            files[label] = open(os.path.join(out_dir, f"{label}_landmarks.txt"), "w")
+            files[label].write(f"=== Gesture: {label} ===\n")
+        f = files[label]
+        f.write(f"\nSample: {os.path.basename(path)}\n")
+        f.write(f"Shape: {sample.shape} (should be 21, 3)\n")
+        for finger_name, indices in FINGER_INDICES.items():
+            f.write(f"\n{finger_name} landmarks:\n")
+            for idx in indices:
+                x, y, z = sample[idx]
+                f.write(f"  L{idx}: ({x:.4f}, {y:.4f}, {z:.4f})\n")
+        f.write("-" * 40 + "\n")
+        canvas = draw_hand(np.ones((480, 480, 3), dtype=np.uint8) * 255, sample)
+        cv2.putText(canvas, os.path.basename(path), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        cv2.imwrite(os.path.join(out_dir, os.path.basename(path)[:-4] + ".png"), canvas)
+    for f in files.values():
+        f.close()
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "mudra_data")
+        write_tree(data_dir, samples)
+        print(f"{samples} synthetic samples, {os.cpu_count()} cores\n")
+        print(f"{'run':>16} {'seconds':>8} {'samples/s':>10}")
+        start = time.perf_counter()
+        one_at_a_time(data_dir, os.path.join(tmp, "old"))
+        elapsed = time.perf_counter() - start
+        print(f"{'one at a time':>16} {elapsed:>8.2f} {samples / elapsed:>10,.0f}")
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            run(data_dir, os.path.join(tmp, f"audit_{workers}"), workers)
+            elapsed = time.perf_counter() - start
+            print(f"{f'audit, {workers} workers':>16} {elapsed:>8.2f} {samples / elapsed:>10,.0f}")
+            workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# Benchmarks batch_recognize.py throughput on a synthetic clip for increasing worker counts
+import os
+import sys
+import tempfile
+from batch_recognize import run
+from mudra_synthetic import synthetic_frames, write_clip
+
+# writes a clip by panning across the bundled test frame
+def make_clip(path, frames=240, size=(640, 360), fps=30):
+    write_clip(path, synthetic_frames(frames, size, noise=0), fps)
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 240
+    max_workers = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = os.path.join(tmp, "synthetic.avi")
+        make_clip(clip, frames)
+        print(f"{'workers':>8} {'frames/s':>10} {'scaling':>8}")
+        baseline = None
+        workers = 1
+        while workers <= max_workers:
+            done, elapsed = run([clip], os.path.join(tmp, "results.csv"), workers=workers, chunk_size=max(frames // (4 * workers), 16))
+            fps = done / elapsed
+            baseline = baseline or fps
+            print(f"{workers:>8} {fps:>10.1f} {fps / baseline:>7.2f}x")
+            workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Average trees evaluated per hand versus accuracy for the early-exit cascade, and its calibration
+#
+# Cross-validated over the dataset: each fold trains a forest like train_gesture_classifier.py does,
+# calibrates it on out-of-fold predictions of its own training samples, and classifies the held-out
+# samples one hand at a time (as the live recognizer does) with the full forest and with the cascade
+# at every --deltas value. Delta 0 only stops once the remaining trees can't change the mudra, so
+# it always agrees with the full forest. Every predictor is calibrated on its own out-of-fold outputs
+# (the cascade's partial averages are more extreme than the full forest's); the calibration part
+# compares their raw and calibrated confidence (expected calibration error) and shows how many hands
+# each reject threshold turns into "unknown" and how accurate the accepted ones are.
+#   python benchmark_cascade.py --trees 100 --deltas 0 0.01 0.05 0.1
+import argparse
+import time
+import numpy as np
+from mudra_cascade import Calibration, CascadeForest, expected_calibration_error, held_out_proba
+from mudra_forest import compile_forest
+from train_gesture_classifier import load_dataset
+
+def single_hand_us(predict_proba, X, rounds=3):
+    # -> best-of-rounds microseconds per hand, and the (N, classes) probabilities
+    best = np.inf
+    for _ in range(rounds):
+        start = time.perf_counter()
+        proba = [predict_proba(X[i:i + 1])[0] for i in range(len(X))]
+        best = min(best, (time.perf_counter() - start) / len(X) * 1e6)
+    return best, np.array(proba)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Trees per hand versus accuracy of the early-exit cascade, and confidence calibration")
+    parser.add_argument("--data", default=None, help="mudra_data folder or packed dataset (default: mudra_data.pack if present, else mudra_data)")
+    parser.add_argument("--trees", type=int, default=100, help="trees per forest (default: 100)")
+    parser.add_argument("--folds", type=int, default=5, help="cross-validation folds (default: 5)")
+    parser.add_argument("--deltas", type=float, nargs="+", default=[0.0, 0.001, 0.01, 0.05, 0.1, 0.2],
+                        help="cascade deltas to compare (default: 0 0.001 0.01 0.05 0.1 0.2)")
+    parser.add_argument("--reject", type=float, nargs="+", default=[0.5, 0.7, 0.8, 0.9],
+                        help="reject thresholds to compare (default: 0.5 0.7 0.8 0.9)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import StratifiedKFold
+    X, y = load_dataset(args.data)
+    X = X.astype(np.float32)
+    print(f"{len(X)} samples, {args.folds}-fold cross-validation, {args.trees} trees, one hand per call\n")
+
+    classes = np.unique(y)
+    names = {None: "full forest", **{delta: f"cascade d={delta:g}" for delta in args.deltas}}
+    runs = {delta: {"us": [], "trees": 0.0, "proba": np.zeros((len(X), len(classes)))} for delta in names}
+    for run in runs.values():
+        run["calibrated"] = np.zeros_like(run["proba"])
+    for train, test in StratifiedKFold(args.folds, shuffle=True, random_state=42).split(X, y):
+        clf = RandomForestClassifier(n_estimators=args.trees, random_state=42).fit(X[train], y[train])
+        forest = compile_forest(clf)
+        held_out = held_out_proba(clf, X[train], y[train], deltas=list(runs))
+        for (delta, run), fit_on in zip(runs.items(), held_out):
+            predictor = forest if delta is None else CascadeForest(forest, delta=delta)
+            us, run["proba"][test] = single_hand_us(predictor.predict_proba, X[test])
+            run["us"].append(us)
+            # the cascade's own average over every round
+            run["trees"] += (args.trees if delta is None else predictor.average_trees) * len(test)
+            run["calibrated"][test] = Calibration.fit(*fit_on).apply(run["proba"][test])
+
+    full_labels = classes[np.argmax(runs[None]["proba"], axis=1)]
+    print(f"{'predictor':<16} {'trees/hand':>10} {'accuracy':>9} {'agreement':>10} {'us/hand':>8} {'ECE raw':>8} {'calibrated':>10}")
+    for delta, run in runs.items():
+        labels = classes[np.argmax(run["proba"], axis=1)]
+        run["correct"] = labels == y
+        print(f"{names[delta]:<16} {run['trees'] / len(X):>10.1f} {np.mean(run['correct']):>9.3f} "
+              f"{np.mean(labels == full_labels):>10.3f} {np.mean(run['us']):>8.1f} "
+              f"{expected_calibration_error(run['proba'], run['correct']):>8.3f} "
+              f"{expected_calibration_error(run['calibrated'], run['correct']):>10.3f}")
+
+    print("\nRejected hands and accuracy of the accepted ones, by calibrated confidence threshold")
+    print(f"{'predictor':<16}" + "".join(f"{f'below {threshold:.2f}':>18}" for threshold in args.reject))
+    for delta, run in runs.items():
+        confidence = run["calibrated"].max(axis=1)
+        cells = []
+        for threshold in args.reject:
+            accepted = confidence >= threshold
+            accuracy = f"{np.mean(run['correct'][accepted]):.3f}" if accepted.any() else "-"
+            cells.append(f"{1 - accepted.mean():.1%} / {accuracy}")
+        print(f"{names[delta]:<16}" + "".join(f"{cell:>18}" for cell in cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Benchmarks loading the packed dataset against the per-file mudra_data layout
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from mudra_dataset import import_tree, iter_tree, open_pack
+from mudra_synthetic import jittered_hands
+
+# the original loading loop: one listdir per label and one np.load per sample
+def load_tree(data_dir):
+    landmarks, y = [], []
+    for gesture, path in iter_tree(data_dir):
+        landmarks.append(np.load(path))
+        y.append(gesture)
+    return np.array(landmarks), np.array(y)
+
+def load_packed(path):
+    dataset = open_pack(path)
+    # touch every landmark so the comparison includes reading the data, not just mapping it
+    return float(np.asarray(dataset.landmarks).sum()), dataset.label_names()
+
+# writes a synthetic per-file tree with n samples by jittering the real ones
+def make_tree(data_dir, n, seed=0):
+    hands, labels = jittered_hands(n, seed)
+    counts = {}
+    for gesture, landmarks in zip(labels, hands):
+        os.makedirs(os.path.join(data_dir, gesture), exist_ok=True)
+        count = counts.get(gesture, 0)
+        np.save(os.path.join(data_dir, gesture, f"{gesture}_{count:06d}.npy"), landmarks)
+        counts[gesture] = count + 1
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def report(name, data_dir, pack_path):
+    tree_time = timed(load_tree, data_dir)
+    pack_time = timed(load_packed, pack_path)
+    print(f"{name:>18} {len(open_pack(pack_path)):>9} {tree_time:>12.4f} {pack_time:>12.4f} {tree_time / pack_time:>8.1f}x")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'dataset':>18} {'samples':>9} {'per-file (s)':>12} {'packed (s)':>12} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        import_tree("mudra_data", os.path.join(tmp, "real.pack"))
+        report("mudra_data", "mudra_data", os.path.join(tmp, "real.pack"))
+
+        synthetic_dir = os.path.join(tmp, "synthetic")
+        make_tree(synthetic_dir, n)
+        import_tree(synthetic_dir, os.path.join(tmp, "synthetic.pack"))
+        report("synthetic", synthetic_dir, os.path.join(tmp, "synthetic.pack"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# Benchmarks vectorized feature extraction against the original per-hand implementation
+import sys
+import time
+import numpy as np
+from mudra_features import extract_features_batch
+from mudra_synthetic import jittered_hands
+
+# original per-hand implementation, kept here as the reference for bit-identical output
+def vector(a, b):
+    return np.array(b) - np.array(a)
+
+def angle_between(v1, v2):
+    cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+    cos_angle = np.clip(cos_angle, -1.0, 1.0)
+    return np.degrees(np.arccos(cos_angle))
+
+def reference_extract_features(landmarks):
+    features = []
+    pip_pairs = [(6, 5, 8), (10, 9, 12), (14, 13, 16), (18, 17, 20)]
+    for pip, mcp, tip in pip_pairs:
+        v1 = vector(landmarks[mcp], landmarks[pip])
+        v2 = vector(landmarks[tip], landmarks[pip])
+        features.append(angle_between(v1, v2))
+    wrist = landmarks[0]
+    thumb_base = landmarks[2]
+    thumb_tip = landmarks[4]
+    v1 = vector(wrist, thumb_base)
+    v2 = vector(thumb_base, thumb_tip)
+    features.append(angle_between(v1, v2))
+    return features
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# the per-hand loop is too slow to run on a million hands by default,
+# so it is timed on at most REFERENCE_LIMIT hands and scaled linearly (pass --exact to time all of them)
+REFERENCE_LIMIT = 10000
+
+def main():
+    exact = "--exact" in sys.argv
+    print(f"{'N':>9} {'per-hand (s)':>14} {'batched (s)':>13} {'speedup':>9}  identical")
+    for n in [1, 1000, 1000000]:
+        hands, _ = jittered_hands(n)
+        ref_n = n if exact else min(n, REFERENCE_LIMIT)
+        repeat = 200 if n == 1 else 3
+
+        expected = np.array([reference_extract_features(h) for h in hands[:ref_n]])
+        identical = np.array_equal(extract_features_batch(hands[:ref_n]), expected)
+
+        ref_time = best_time(lambda: [reference_extract_features(h) for h in hands[:ref_n]], repeat if n < 1000000 else 1)
+        ref_time *= n / ref_n
+        batch_time = best_time(lambda: extract_features_batch(hands), repeat)
+
+        note = "" if ref_n == n else f" (per-hand time scaled from {ref_n} hands)"
+        print(f"{n:>9} {ref_time:>14.6f} {batch_time:>13.6f} {ref_time / batch_time:>8.1f}x  {identical}{note}")
+
+if __name__ == "__main__":
+    main()
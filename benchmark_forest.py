@@ -0,0 +1,36 @@
+# Checks the compiled forest against sklearn on mudra_data and benchmarks prediction latency
+import sys
+import time
+import joblib
+import numpy as np
+from mudra_forest import compile_forest
+from train_gesture_classifier import load_dataset
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main():
+    clf = joblib.load("gesture_classifier.pkl")
+    forest = compile_forest(clf)
+    X, y = load_dataset()
+
+    # parity: probabilities must be identical for the whole dataset, batched and one sample at a time
+    expected = clf.predict_proba(X)
+    batch_ok = np.array_equal(forest.predict_proba(X), expected) and np.array_equal(forest.predict(X), clf.predict(X))
+    single_ok = all(np.array_equal(forest.predict_one_proba(x), expected[i]) for i, x in enumerate(X))
+    print(f"Parity with clf.predict_proba on {len(X)} samples: batch {batch_ok}, single {single_ok}")
+
+    print(f"\n{'path':>28} {'us/call':>10}")
+    print(f"{'sklearn predict (1 sample)':>28} {per_call_us(lambda: clf.predict([X[0]])[0], 200):>10.1f}")
+    print(f"{'compiled predict_one':>28} {per_call_us(lambda: forest.predict_one(X[0]), 2000):>10.1f}")
+    print(f"{'sklearn predict (dataset)':>28} {per_call_us(lambda: clf.predict(X), 20):>10.1f}")
+    print(f"{'compiled predict (dataset)':>28} {per_call_us(lambda: forest.predict(X), 20):>10.1f}")
+
+    if not (batch_ok and single_ok):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Compares the allocating capture -> MediaPipe path with the pooled one: time and allocations per frame
+#
+# Both read a synthetic clip frame by frame, search the whole frame (downscaled to 640 wide) and turn
+# the hands into frame-normalized landmarks. "allocating" is the path as it was before the buffer
+# pool: a fresh frame from cap.read(), a fresh resized and RGB image, one array built per hand.
+# "pooled" reads into mudra_buffers.FramePool frames and runs mudra_roi.HandDetector with a reused
+# landmark array. MediaPipe is replaced by a stand-in returning two fixed hands, so only this side of
+# the path is measured (--mediapipe runs the real one, on frames without a hand).
+#
+# Allocations are counted with tracemalloc: after every function call the traced total is checked,
+# and each rise of at least --min-kb counts as one allocation. Two allocations inside one call count
+# once, so the numbers are a lower bound, but every frame-sized array shows up.
+#   python benchmark_frame_buffers.py --frames 300 --size 1280x720
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import numpy as np
+from mudra_buffers import FramePool
+from mudra_synthetic import jittered_hands, synthetic_frames, write_clip
+
+class StandInHands:
+    # answers hands.process() like MediaPipe would for two hands, without running a model
+    def __init__(self, count=2):
+        hands, _ = jittered_hands(count, seed=4)
+        point = types.SimpleNamespace
+        self.results = point(
+            multi_hand_landmarks=[point(landmark=[point(x=float(x), y=float(y), z=float(z)) for x, y, z in hand])
+                                  for hand in hands],
+            multi_handedness=[point(classification=[point(label=side, score=0.95)])
+                              for side in ["Left", "Right"][:count]])
+
+    def process(self, rgb):
+        return self.results
+
+def reference_detect(frame, hands, search_width=640):
+    # the full-frame search as HandDetector did it before the buffers were reused
+    import cv2
+    height, width = frame.shape[:2]
+    scale = min(1.0, search_width / width)
+    crop = frame
+    if scale < 1.0:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+    results = hands.process(rgb)
+    found, bbox = [], None
+    for hand_landmarks in results.multi_hand_landmarks or []:
+        landmarks = np.array([[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark])
+        landmarks[:, 0] = 1.0 - landmarks[:, 0]
+        found.append(landmarks)
+    if found:
+        points = np.concatenate(found)
+        bbox = (points[:, 0].min() * width, points[:, 1].min() * height, points[:, 0].max() * width, points[:, 1].max() * height)
+    return found, bbox
+
+def allocating_path(clip, hands):
+    import cv2
+    cap = cv2.VideoCapture(clip)
+
+    def step():
+        ret, frame = cap.read()
+        if ret:
+            reference_detect(frame, hands)
+        return ret
+    return step, cap
+
+def pooled_path(clip, hands, max_hands=2):
+    import cv2
+    from mudra_roi import HandDetector
+    cap = cv2.VideoCapture(clip)
+    pool = FramePool(2)
+    detector = HandDetector(hands, use_roi=False, max_hands=max_hands)
+    out = np.empty((max_hands, 21, 3), dtype=np.float32)
+
+    def step():
+        buffer = pool.acquire()
+        ret, frame = cap.read(buffer) if buffer is not None else cap.read()
+        if ret:
+            if frame is not buffer:
+                pool.adopt(frame)
+            detector.detect(frame, out)
+            pool.release(frame)
+        return ret
+    return step, cap
+
+def frame_times(make_path, clip, hands):
+    step, cap = make_path(clip, hands)
+    times = []
+    while True:
+        start = time.perf_counter()
+        if not step():
+            break
+        times.append(time.perf_counter() - start)
+    cap.release()
+    # the first frames pay for warm-up (codec, pool), the steady state is what matters for live use
+    return np.array(times[5:]) * 1e6
+
+def allocations(make_path, clip, hands, min_bytes):
+    # (allocations, bytes allocated) per frame, see the top of the file
+    step, cap = make_path(clip, hands)
+    for _ in range(5):
+        step()
+    count, total, last, frames = 0, 0, 0, 0
+
+    def watch(frame, event, arg):
+        nonlocal count, total, last
+        current = tracemalloc.get_traced_memory()[0]
+        if current - last >= min_bytes:
+            count += 1
+            total += current - last
+        last = current
+
+    tracemalloc.start()
+    last = tracemalloc.get_traced_memory()[0]
+    sys.setprofile(watch)
+    try:
+        while step():
+            frames += 1
+    finally:
+        sys.setprofile(None)
+        tracemalloc.stop()
+        cap.release()
+    return count / max(frames, 1), total / max(frames, 1)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time and allocations per frame with and without the frame buffer pool")
+    parser.add_argument("--frames", type=int, default=300, help="frames in the synthetic clip (default: 300)")
+    parser.add_argument("--size", default="1280x720", help="frame size WIDTHxHEIGHT (default: 1280x720)")
+    parser.add_argument("--min-kb", type=float, default=4.0, help="smallest allocation counted, in KB (default: 4)")
+    parser.add_argument("--mediapipe", action="store_true", help="run MediaPipe Hands instead of the stand-in")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    if args.mediapipe:
+        import mediapipe as mp
+        hands = mp.solutions.hands.Hands(max_num_hands=2)
+    else:
+        hands = StandInHands()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = write_clip(os.path.join(tmp, "clip.avi"), synthetic_frames(args.frames, size=size, seed=9))
+        print(f"{args.frames} frames of {size[0]}x{size[1]}, {'MediaPipe' if args.mediapipe else 'stand-in hands'}\n")
+        print(f"{'path':<11} {'p50 us':>9} {'p99 us':>9} {'max us':>9} {'allocs/frame':>13} {'KB/frame':>9}")
+        for name, make_path in [("allocating", allocating_path), ("pooled", pooled_path)]:
+            times = frame_times(make_path, clip, hands)
+            count, total = allocations(make_path, clip, hands, args.min_kb * 1024)
+            p50, p99 = np.quantile(times, (0.5, 0.99))
+            print(f"{name:<11} {p50:>9.0f} {p99:>9.0f} {times.max():>9.0f} {count:>13.1f} {total / 1024:>9.0f}")
+
+if __name__ == "__main__":
+    main()
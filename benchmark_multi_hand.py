@@ -0,0 +1,49 @@
+# Compares per-hand classification against one batched call per frame for growing hand counts
+import sys
+import time
+import numpy as np
+from mudra_features import extract_features, extract_features_batch, normalize_handedness
+from mudra_forest import DEFAULT_MODEL, load_model
+from train_gesture_classifier import load_landmarks
+
+def per_frame_us(fn, frames):
+    start = time.perf_counter()
+    for hands, handedness in frames:
+        fn(hands, handedness)
+    return (time.perf_counter() - start) / len(frames) * 1e6
+
+def main():
+    forest = load_model(DEFAULT_MODEL)
+    samples, _ = load_landmarks()
+    rng = np.random.default_rng(0)
+
+    def per_hand(hands, handedness):
+        # the old live loop: features and prediction one hand at a time
+        return [forest.predict_one_proba(extract_features(hand))
+                for hand in normalize_handedness(hands, handedness)]
+
+    def batched(hands, handedness):
+        return forest.predict_proba(extract_features_batch(normalize_handedness(hands, handedness)))
+
+    print(f"{'hands':>6} {'per hand (us/frame)':>20} {'batched (us/frame)':>19} {'speedup':>8}")
+    ok = True
+    for count in [1, 2, 4, 8, 16]:
+        frames = []
+        for _ in range(200):
+            hands = samples[rng.integers(len(samples), size=count)]
+            handedness = rng.choice(["Left", "Right"], size=count).tolist()
+            frames.append((hands, handedness))
+        ok &= all(np.array_equal(np.array(per_hand(*frame)), batched(*frame)) for frame in frames[:20])
+        loop_us = per_frame_us(per_hand, frames)
+        batch_us = per_frame_us(batched, frames)
+        print(f"{count:>6} {loop_us:>20.1f} {batch_us:>19.1f} {loop_us / batch_us:>7.1f}x")
+
+    # the joint-angle features don't change when a hand is mirrored
+    mirrored = extract_features_batch(normalize_handedness(samples, ["Left"] * len(samples)))
+    mirror_error = np.abs(mirrored - extract_features_batch(samples)).max()
+    print(f"\nBatched == per hand: {ok}, largest feature change from mirroring: {mirror_error:.2e} degrees")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
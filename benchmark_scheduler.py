@@ -0,0 +1,129 @@
+# Simulates the adaptive frame scheduler on devices of different speeds, on a simulated clock
+#
+# Frames come from a synthetic clip file, delivered as a camera would at --fps: a frame that arrives
+# while the previous one is still being processed replaces it, like in the pipeline's drop-oldest
+# queues. Processing a frame advances a mudra_scheduler.SimulatedClock by that level's detection cost
+# (times the device's slowdown) instead of running MediaPipe, so a "board" 4x slower than this
+# machine can be simulated on it in a fraction of a second. Costs come from a simple model, or with
+# --mediapipe from timing MediaPipe Hands on the clip's frames at every level on this machine.
+# Halfway through, the camera stops delivering frames for 1.5 s; the number of read attempts it
+# takes shows CaptureBackoff at work (a busy loop makes hundreds of thousands).
+#
+# Each device runs at full quality, at the cheapest level and adaptively, and the table shows the
+# frame rate processed, the share of a core used and the levels the scheduler went through.
+#   python benchmark_scheduler.py --fps 30 --cpu-budget 0.5 --devices desktop=1 laptop=2 board=4
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from mudra_scheduler import LEVELS, CaptureBackoff, FrameScheduler, SimulatedClock
+from mudra_synthetic import synthetic_frames, write_clip
+
+REUSE_COST = 0.0001         # seconds for a frame that reuses the last detection
+OUTAGE = (0.5, 1.5)         # camera outage: starts at this share of the clip, lasts this many seconds
+
+def model_costs(full=0.016):
+    # seconds per detection at each level: a fixed part plus one growing with the image area,
+    # the lite model taking about 70% of the full one
+    return [full * (0.4 + 0.6 * level.scale ** 2) * (1.0 if level.model_complexity else 0.7) for level in LEVELS]
+
+def mediapipe_costs(clip, frames=30):
+    # median seconds per detection at each level, timed with MediaPipe Hands on the clip's frames
+    import cv2
+    import mediapipe as mp
+    from mudra_roi import HandDetector
+    cap = cv2.VideoCapture(clip)
+    images = [cap.read()[1] for _ in range(frames)]
+    cap.release()
+    costs = {}
+    for level in LEVELS:
+        if (level.scale, level.model_complexity) not in costs:
+            hands = mp.solutions.hands.Hands(max_num_hands=1, model_complexity=level.model_complexity)
+            detector = HandDetector(hands, search_width=round(640 * level.scale), max_hands=1)
+            times = []
+            for image in images:
+                start = time.perf_counter()
+                detector.detect(image)
+                times.append(time.perf_counter() - start)
+            hands.close()
+            costs[level.scale, level.model_complexity] = float(np.median(times[3:]))
+    return [costs[level.scale, level.model_complexity] for level in LEVELS]
+
+def simulate(clip, frames, fps, costs, slowdown, scheduler=None, fixed_level=0):
+    # -> processed frames, detections, busy seconds, elapsed seconds, read attempts during the outage
+    import cv2
+    clock = SimulatedClock()
+    if scheduler is not None:
+        scheduler.clock = clock
+        scheduler._window_start = clock()
+    backoff = CaptureBackoff(clock=clock, sleep=clock.sleep)
+    cap = cv2.VideoCapture(clip)
+    outage_start = frames * OUTAGE[0] / fps
+    processed, detections, busy, attempts, since_detect = 0, 0, 0.0, 0, 0
+    for index in range(frames):
+        ret, _ = cap.read()
+        if not ret:
+            break
+        arrival = index / fps
+        if clock() >= arrival + 1 / fps:
+            continue            # replaced by the next frame before it was picked up
+        clock.now = max(clock(), arrival)
+        if outage_start <= clock() < outage_start + OUTAGE[1]:
+            # reads fail until the camera is back, the next frame is the first one after the outage
+            while clock() < outage_start + OUTAGE[1]:
+                attempts += 1
+                if not backoff.failed():
+                    break
+            continue
+        backoff.succeeded()
+        if scheduler is not None:
+            level_index, detect = scheduler.level_index, scheduler.should_detect()
+        else:
+            level_index, detect = fixed_level, since_detect % LEVELS[fixed_level].detect_every == 0
+            since_detect += 1
+        cost = (costs[level_index] if detect else REUSE_COST) * slowdown
+        clock.advance(cost)
+        if scheduler is not None:
+            scheduler.record(cost)
+        processed += 1
+        detections += detect
+        busy += cost
+    cap.release()
+    return processed, detections, busy, max(clock(), frames / fps), attempts
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Simulate the adaptive frame scheduler on slower and faster devices")
+    parser.add_argument("--frames", type=int, default=900, help="frames in the synthetic clip (default: 900)")
+    parser.add_argument("--fps", type=float, default=30.0, help="camera frame rate and target frame rate (default: 30)")
+    parser.add_argument("--cpu-budget", type=float, default=0.5, help="share of a core detection may use (default: 0.5)")
+    parser.add_argument("--devices", nargs="+", default=["desktop=0.5", "laptop=1", "board=4"],
+                        help="NAME=SLOWDOWN relative to the detection costs (default: desktop=0.5 laptop=1 board=4)")
+    parser.add_argument("--mediapipe", action="store_true", help="time MediaPipe Hands on this machine instead of the cost model")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    devices = [(name, float(slowdown)) for name, slowdown in (device.split("=") for device in args.devices)]
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = write_clip(os.path.join(tmp, "clip.avi"), synthetic_frames(args.frames, seed=5), fps=args.fps)
+        costs = mediapipe_costs(clip) if args.mediapipe else model_costs()
+        print("Detection cost per level" + (" (MediaPipe on this machine)" if args.mediapipe else " (model)") + ":")
+        for i, (level, cost) in enumerate(zip(LEVELS, costs)):
+            print(f"  {i}: {level.describe():<58} {cost * 1e3:6.1f} ms")
+        print(f"\n{args.frames} frames at {args.fps:g} fps, CPU budget {args.cpu_budget:.0%} of a core, "
+              f"camera outage of {OUTAGE[1]:g}s\n")
+        print(f"{'device':<10} {'strategy':<10} {'fps':>6} {'detect/s':>9} {'cpu':>6} {'reads in outage':>16}  levels")
+        for name, slowdown in devices:
+            runs = [("full", None, 0), ("cheapest", None, len(LEVELS) - 1),
+                    ("adaptive", FrameScheduler(args.fps, args.cpu_budget), 0)]
+            for strategy, scheduler, fixed_level in runs:
+                processed, detections, busy, elapsed, attempts = simulate(clip, args.frames, args.fps, costs, slowdown,
+                                                                          scheduler, fixed_level)
+                levels = (" -> ".join(str(index) for index in [0] + [index for _, index in scheduler.changes])
+                          if scheduler is not None else str(fixed_level))
+                print(f"{name:<10} {strategy:<10} {processed / elapsed:>6.1f} {detections / elapsed:>9.1f} "
+                      f"{busy / elapsed:>6.0%} {attempts:>16}  {levels}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Load generator for mudra_server.py: throughput and tail latency with and without micro-batching
+#
+# For each batching setting a server is started on a free local port, then --clients concurrent
+# keep-alive connections each send /predict requests (one jittered mudra_data hand per request) back to
+# back for --duration seconds. Every request's round-trip time is recorded on the client side.
+#   python benchmark_server.py --clients 1 8 32
+#   python benchmark_server.py --connect 127.0.0.1:8765    # a server that is already running
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import numpy as np
+from mudra_synthetic import jittered_hands
+
+# (max batch, max wait in milliseconds), the first one disables batching
+SETTINGS = [(1, 0.0), (16, 1.0), (64, 2.0)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def get_json(host, port, path):
+    with urllib.request.urlopen(f"http://{host}:{port}{path}", timeout=2) as response:
+        return json.loads(response.read())
+
+def start_server(port, max_batch, max_wait_ms, model=None):
+    command = [sys.executable, "mudra_server.py", "--port", str(port), "--max-batch", str(max_batch),
+               "--max-wait-ms", str(max_wait_ms)] + (["--model", model] if model else [])
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            get_json("127.0.0.1", port, "/health")
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("mudra_server.py did not start")
+
+async def client(host, port, bodies, stop_at, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < stop_at:
+            body = bodies[i % len(bodies)]
+            i += 1
+            start = time.perf_counter()
+            writer.write(f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            length = 0
+            status = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            if b" 200 " not in status:
+                raise RuntimeError(f"request failed: {status.decode().strip()}")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+async def load(host, port, bodies, clients, duration):
+    latencies = []
+    start = time.perf_counter()
+    stop_at = start + duration
+    await asyncio.gather(*(client(host, port, bodies[c::clients] or bodies, stop_at, latencies) for c in range(clients)))
+    return np.array(latencies), time.perf_counter() - start
+
+def run(host, port, bodies, clients, duration):
+    before = get_json(host, port, "/health")
+    latencies, elapsed = asyncio.run(load(host, port, bodies, clients, duration))
+    after = get_json(host, port, "/health")
+    batches = after["batches"] - before["batches"]
+    p50, p95, p99 = np.quantile(latencies, (0.5, 0.95, 0.99)) * 1000
+    return {"requests": len(latencies), "rps": len(latencies) / elapsed, "p50_ms": p50, "p95_ms": p95,
+            "p99_ms": p99, "hands_per_batch": (after["hands"] - before["hands"]) / max(batches, 1)}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Load-test the local recognition server")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32], help="concurrent connections (default: 1 8 32)")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per run (default: 3)")
+    parser.add_argument("--model", default=None, help="model for the servers that are started")
+    parser.add_argument("--connect", default=None, metavar="HOST:PORT", help="load an already running server instead")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    hands, _ = jittered_hands(1000, seed=3)
+    bodies = [json.dumps({"landmarks": np.round(hand, 5).tolist()}).encode() for hand in hands]
+
+    print(f"{'batch':>6} {'wait ms':>8} {'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hands/call':>11}")
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        health = get_json(host, int(port), "/health")
+        settings = [(health["max_batch"], health["max_wait_ms"], None)]
+    else:
+        host = "127.0.0.1"
+        settings = [(max_batch, max_wait, free_port()) for max_batch, max_wait in SETTINGS]
+    for max_batch, max_wait, port in settings:
+        process = start_server(port, max_batch, max_wait, args.model) if port is not None else None
+        try:
+            for clients in args.clients:
+                r = run(host, int(port or args.connect.rsplit(":", 1)[1]), bodies, clients, args.duration)
+                print(f"{max_batch:>6} {max_wait:>8g} {clients:>8} {r['rps']:>9.0f} {r['p50_ms']:>8.2f} "
+                      f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['hands_per_batch']:>11.1f}")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Benchmarks model loading at startup: joblib pickle (+ sklearn) against the exported model directory
+import subprocess
+import sys
+import time
+
+# each snippet runs in a fresh interpreter, like a recognizer restart
+PATHS = {
+    "joblib.load(pkl)": "import joblib; joblib.load('gesture_classifier.pkl')",
+    "joblib.load(pkl) + compile": ("import joblib; from mudra_forest import compile_forest; "
+                                   "compile_forest(joblib.load('gesture_classifier.pkl'))"),
+    "load_forest(model dir)": "from mudra_forest import load_forest; load_forest('gesture_classifier.model')",
+}
+
+def startup_time(code, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    baseline = startup_time("import numpy", repeat)
+    print(f"Interpreter + numpy import: {baseline * 1000:.0f}ms (subtracted below)\n")
+    print(f"{'path':>28} {'load (ms)':>10}")
+    for name, code in PATHS.items():
+        print(f"{name:>28} {(startup_time(code, repeat) - baseline) * 1000:>10.0f}")
+
+if __name__ == "__main__":
+    main()
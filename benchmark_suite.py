@@ -0,0 +1,243 @@
+# End-to-end benchmark suite: features, rules, classifier, dataset loading and the frame pipeline
+#
+# All inputs come from the deterministic generators in mudra_synthetic (jittered mudra_data samples
+# and frames built from test_frame.png), so it runs on a CPU-only machine without a camera. Results
+# are written as JSON and can be compared against a previous run to catch regressions, e.g. after
+# upgrading mediapipe or sklearn:
+#   python benchmark_suite.py -o before.json
+#   python benchmark_suite.py -o after.json --compare before.json
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from mudra_dataset import create_pack, import_tree, open_pack
+from mudra_features import FeatureSet, extract_features, extract_features_batch
+from mudra_forest import DEFAULT_MODEL, load_model
+from mudra_rules import ENGINE, evaluate_mudras
+from mudra_synthetic import jittered_hands, synthetic_frames, write_clip
+
+# libraries whose upgrades the suite is meant to catch, recorded with every run
+MODULES = ["numpy", "cv2", "mediapipe", "sklearn", "joblib"]
+
+def measure(fn, repeat, rounds):
+    # seconds per call for each round of `repeat` calls
+    fn()  # warm-up
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        times.append((time.perf_counter() - start) / repeat)
+    return times
+
+def result(times, items=1):
+    # per-item microseconds: median is compared between runs, min shows the best case
+    per_item = [t / items * 1e6 for t in times]
+    return {"unit": "us", "items": items, "median": statistics.median(per_item), "min": min(per_item),
+            "rounds": len(per_item)}
+
+def bench_features(scale):
+    hands, _ = jittered_hands(100000 * scale, seed=1)
+    extended = FeatureSet.parse("extended")
+    return {
+        "features/single": result(measure(lambda: extract_features(hands[0]), 1000, 7)),
+        "features/batch_1000": result(measure(lambda: extract_features_batch(hands[:1000]), 20, 7), 1000),
+        "features/batch_100000": result(measure(lambda: extract_features_batch(hands), 1, 5), len(hands)),
+        "features/extended_single": result(measure(lambda: extended.extract_batch(hands[:1]), 1000, 7)),
+        "features/extended_batch_1000": result(measure(lambda: extended.extract_batch(hands[:1000]), 20, 7), 1000),
+    }
+
+def bench_rules(scale):
+    hands, _ = jittered_hands(10000 * scale, seed=2)
+    return {
+        "rules/single": result(measure(lambda: evaluate_mudras(hands[0]), 500, 7)),
+        "rules/batch_10000": result(measure(lambda: ENGINE.evaluate(hands), 3, 5), len(hands)),
+    }
+
+def bench_classifier(scale):
+    forest = load_model(DEFAULT_MODEL)
+    hands, _ = jittered_hands(10000 * scale, seed=3)
+    X = extract_features_batch(hands)
+    results = {
+        "classifier/compiled_single": result(measure(lambda: forest.predict_one_proba(X[0]), 1000, 7)),
+        "classifier/compiled_batch_10000": result(measure(lambda: forest.predict_proba(X), 3, 5), len(X)),
+    }
+    try:
+        import joblib
+        clf = joblib.load("gesture_classifier.pkl")
+    except (ImportError, OSError) as e:
+        # no sklearn/joblib, or no pickle next to the exported model: only the sklearn entries are skipped
+        print(f"classifier: skipping the sklearn entries ({e})", file=sys.stderr)
+        return results
+    results["classifier/sklearn_single"] = result(measure(lambda: clf.predict_proba(X[:1]), 50, 5))
+    results["classifier/sklearn_batch_10000"] = result(measure(lambda: clf.predict_proba(X), 1, 5), len(X))
+    return results
+
+def bench_temporal(scale):
+    # per-frame cost of the temporal model must not depend on the window length
+    from mudra_temporal import TEMPORAL_MODEL, TemporalWindow, frame_features_batch
+    forest = load_model(TEMPORAL_MODEL)
+    hands, _ = jittered_hands(300 * scale, seed=7)
+    results = {"temporal/frame_features": result(measure(lambda: frame_features_batch(hands[:1]), 500, 7))}
+    for window in (8, 64):
+        buffer = TemporalWindow(window)
+        features = frame_features_batch(hands)
+
+        def run():
+            for i, frame in enumerate(features):
+                forest.predict_one_proba(buffer.push(frame, i / 30.0))
+        results[f"temporal/push_predict_window_{window}"] = result(measure(run, 1, 5), len(features))
+    return results
+
+def bench_dataset(scale):
+    n = 20000 * scale
+    hands, labels = jittered_hands(n, seed=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        real = os.path.join(tmp, "real.pack")
+        synthetic = create_pack(os.path.join(tmp, "synthetic.pack"))
+        synthetic.append_many(labels, hands, np.arange(n), np.zeros(n))
+
+        def load(path):
+            # touch every landmark so reading the data is included, not just mapping it
+            dataset = open_pack(path)
+            return float(np.asarray(dataset.landmarks).sum())
+
+        return {
+            "dataset/import_tree": result(measure(lambda: import_tree("mudra_data", real), 1, 5)),
+            "dataset/load_pack": result(measure(lambda: load(synthetic.path), 1, 5), n),
+        }
+
+def bench_neighbors(scale):
+    # k-NN lookup of a live pose and the duplicate scan, over a synthetic 20000-sample pack
+    from mudra_index import build_index
+    n = 20000 * scale
+    hands, labels = jittered_hands(n, seed=8)
+    with tempfile.TemporaryDirectory() as tmp:
+        pack = create_pack(os.path.join(tmp, "synthetic.pack"))
+        pack.append_many(labels, hands, np.arange(n), np.zeros(n))
+        path = os.path.join(tmp, "synthetic.index")
+        results = {"neighbors/build": result(measure(lambda: build_index(pack.path, path), 1, 3), n)}
+        index = build_index(pack.path, path)
+        results["neighbors/query_k5"] = result(measure(lambda: index.query(hands[:1], 5), 500, 7))
+        results["neighbors/duplicates"] = result(measure(lambda: index.duplicate_groups(0.05), 1, 3), n)
+    return results
+
+def bench_pipeline(scale):
+    # MediaPipe on frames without a hand: the palm detector runs on every frame, the worst case
+    import mediapipe as mp
+    from mudra_metrics import StageTimes
+    from mudra_pipeline import RecognizerPipeline
+    from mudra_roi import HandDetector
+
+    frames = list(synthetic_frames(60 * scale, seed=5))
+    times = StageTimes()
+    with mp.solutions.hands.Hands(max_num_hands=1) as hands:
+        detector = HandDetector(hands, times=times)
+        detect = result(measure(lambda: [detector.detect(frame) for frame in frames], 1, 3), len(frames))
+    results = {"pipeline/detect_frame": detect}
+    # per-stage breakdown inside HandDetector (resize + convert, hands.process)
+    for stage, s in times.snapshot().items():
+        quantiles = {q: v * 1e6 for q, v in s["quantiles"].items()}
+        results[f"pipeline/{stage}"] = {"unit": "us", "items": 1, "median": quantiles[0.5], "min": None,
+                                        "p95": quantiles[0.95], "p99": quantiles[0.99], "rounds": s["count"]}
+
+    # the threaded pipeline reading a clip as fast as it can, frames per second as us/frame
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = write_clip(os.path.join(tmp, "clip.avi"), synthetic_frames(150 * scale, seed=6))
+        per_frame = []
+        for _ in range(3):
+            pipeline = RecognizerPipeline(clip, pace_files=False, queue_size=4)
+            start = time.perf_counter()
+            pipeline.start()
+            frames_out = sum(1 for _ in pipeline.results())
+            per_frame.append((time.perf_counter() - start) / max(frames_out, 1))
+            pipeline.stop()
+        results["pipeline/threaded_frame"] = result(per_frame)
+    return results
+
+SUITES = {
+    "features": bench_features,
+    "rules": bench_rules,
+    "classifier": bench_classifier,
+    "temporal": bench_temporal,
+    "dataset": bench_dataset,
+    "neighbors": bench_neighbors,
+    "pipeline": bench_pipeline,
+}
+
+def environment():
+    versions = {}
+    for module in MODULES:
+        try:
+            versions[module] = getattr(importlib.import_module(module), "__version__", None)
+        except ImportError:
+            versions[module] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit or None, "python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpu_count": os.cpu_count(), "versions": versions}
+
+def compare(results, baseline, threshold):
+    # prints median changes against a baseline run, returns the names that got slower than threshold
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        if name not in baseline:
+            print(f"{name:<36} {'-':>10} {current['median']:>10.2f}      new")
+            continue
+        before = baseline[name]["median"]
+        ratio = current["median"] / before if before else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<36} {before:>10.2f} {current['median']:>10.2f} {ratio:>7.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the mudra benchmark suite and write machine-readable results")
+    parser.add_argument("suites", nargs="*", default=[],
+                        help=f"suites to run (default: all of {', '.join(SUITES)})")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="results file (JSON)")
+    parser.add_argument("--compare", default=None, help="previous results file to compare medians against")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="with --compare, exit with status 1 when a median is this many times slower (default: 1.5)")
+    parser.add_argument("--scale", type=int, default=1, help="multiply input sizes for longer, steadier runs")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in args.suites or SUITES:
+        start = time.perf_counter()
+        results.update(SUITES[name](args.scale))
+        print(f"{name}: done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    print(f"{'benchmark':<36} {'median (us)':>12} {'min (us)':>10} {'items':>7}")
+    for name, r in results.items():
+        best = "-" if r["min"] is None else f"{r['min']:.2f}"
+        print(f"{name:<36} {r['median']:>12.2f} {best:>10} {r['items']:>7}")
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "scale": args.scale, "results": results}, f, indent=2, sort_keys=True)
+    print(f"\nResults written to '{args.output}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than {args.threshold}x the baseline")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,193 @@
 # Live mudra recognizer for real-life mudra identification
-import cv2
-import mediapipe as mp
-import numpy as np
-import joblib
-
-# loads trained random forest classifier model
-clf = joblib.load("gesture_classifier.pkl")
-
-def vector(a, b):
-    return np.array(b) - np.array(a)
-
-def angle_between(v1, v2):
-    cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-    cos_angle = np.clip(cos_angle, -1.0, 1.0)
-    return np.degrees(np.arccos(cos_angle))
-
-def extract_features(landmarks):
-    features = []
-    pip_pairs = [(6, 5, 8), (10, 9, 12), (14, 13, 16), (18, 17, 20)]
-    for pip, mcp, tip in pip_pairs:
-        v1 = vector(landmarks[mcp], landmarks[pip])
-        v2 = vector(landmarks[tip], landmarks[pip])
-        features.append(angle_between(v1, v2))
-    wrist = landmarks[0]
-    thumb_base = landmarks[2]
-    thumb_tip = landmarks[4]
-    v1 = vector(wrist, thumb_base)
-    v2 = vector(thumb_base, thumb_tip)
-    features.append(angle_between(v1, v2))
-    return features
-
-# set up MediaPipe
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7, min_tracking_confidence=0.7)
-
-cap = cv2.VideoCapture(1) # you may need to switch out 1 for whatever camera input you have
-# print(cap.getBackendName()) # to check what backend OpenCV defaults to
-# cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
-print("Live Mudra Recognizer Started — press 'q' to quit.")
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        continue
-
-    frame = cv2.flip(frame, 1)
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = hands.process(rgb)
-
-    label = "No hand detected"
-
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-            # get finger landmarks
-            landmarks = np.array([[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark])
-            features = extract_features(landmarks)
-
-            # predict gesture with classifier
-            prediction = clf.predict([features])[0]
-            label = f"Detected: {prediction}"
-
-    color = (0, 255, 0) if "Detected:" in label and "No hand detected" not in label else (0, 0, 255)
-    cv2.putText(frame, label, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-
-    cv2.imshow("Live Mudra Recognizer", frame)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'): # to quit
-        break
-
-# for exiting
-cap.release()
-cv2.destroyAllWindows()
-hands.close()
-print("Live recognizer exited.")
\ No newline at end of file
+import argparse
+import time
+from mudra_cascade import add_cascade_arguments
+from mudra_forest import DEFAULT_MODEL
+from mudra_metrics import add_metrics_arguments, start_exporter
+from mudra_scheduler import add_scheduler_arguments, scheduler_from_args
+from mudra_temporal import TEMPORAL_MODEL
+from mudra_startup import StartupProfiler, add_profile_argument
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Live mudra recognizer")
+    # you may need to switch out 1 for whatever camera input you have
+    parser.add_argument("source", nargs="?", default="1", help="camera index or path to a video file (default: 1)")
+    parser.add_argument("--model", default=DEFAULT_MODEL,
+                        help=f"exported model directory or gesture_classifier.pkl (default: {DEFAULT_MODEL})")
+    parser.add_argument("--temporal", nargs="?", const=TEMPORAL_MODEL, default=None, metavar="MODEL",
+                        help=f"classify sliding windows of frames with the temporal model (default: {TEMPORAL_MODEL})")
+    parser.add_argument("--no-display", action="store_true", help="print held mudras instead of opening a window")
+    parser.add_argument("--max-hands", type=int, default=1,
+                        help="hands to track, e.g. 2 for both hands of a dancer or more for a group (default: 1)")
+    parser.add_argument("--window", type=int, default=8, help="frames of probabilities averaged before labelling (default: 8)")
+    parser.add_argument("--switch-frames", type=int, default=3, help="frames a new mudra must lead before the label changes (default: 3)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip detection and classification while the hand holds still")
+    parser.add_argument("--full-frame", action="store_true", help="search the whole frame every time instead of tracking the hand's region")
+    parser.add_argument("--search-width", type=int, default=640, help="width frames are downscaled to for a full-frame search (default: 640)")
+    parser.add_argument("--refresh", type=int, default=15, help="with --incremental, always reprocess after this many frames (default: 15)")
+    parser.add_argument("--neighbors", type=int, default=0, metavar="K",
+                        help="show each hand's K closest training samples (printed on label changes with --no-display)")
+    add_cascade_arguments(parser)
+    add_scheduler_arguments(parser)
+    add_metrics_arguments(parser)
+    add_profile_argument(parser)
+    return parser
+
+def print_segment(track_id, segment, max_hands):
+    hand = f"Hand {track_id}: " if max_hands > 1 else ""
+    print(f"{hand}Held {segment.label} for {segment.end - segment.start:.2f}s ({segment.frames} frames)")
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # heavy dependencies (OpenCV, MediaPipe) are only imported once we know we'll need them
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("import cv2"):
+        import cv2
+    with profiler.step("import numpy"):
+        import numpy as np
+    with profiler.step("import mudra_pipeline (mediapipe)"):
+        from mudra_pipeline import RecognizerPipeline, draw_landmarks, mirror_frame
+    with profiler.step("import mudra_* helpers"):
+        from mudra_cascade import REJECT_LABEL, cascade_from_args
+        from mudra_features import normalize_handedness
+        from mudra_forest import load_model, load_model_and_features, read_model_meta
+        from mudra_motion import MotionGate
+        from mudra_recognition import FrameRecognizer
+        from mudra_temporal import WINDOW_FEATURE_NAMES
+
+    # loads the trained random forest classifier as flat arrays for fast single-frame prediction
+    # (the exported model directory needs only NumPy, a .pkl is compiled after loading it with sklearn)
+    with profiler.step("load model"):
+        feature_set, window = None, None
+        if args.temporal:
+            forest = load_model(args.temporal, WINDOW_FEATURE_NAMES)
+            window = read_model_meta(args.temporal)["window"]
+        else:
+            forest, feature_set = load_model_and_features(args.model)
+        # optionally stops evaluating trees once the mudra is settled, and rejects unsure hands
+        forest = cascade_from_args(forest, args.temporal or args.model, args)
+    neighbor_index = None
+    if args.neighbors:
+        with profiler.step("load neighbour index (scipy)"):
+            from mudra_index import open_index
+            neighbor_index = open_index()
+
+    motion_gate = MotionGate(refresh_interval=args.refresh) if args.incremental else None
+    # MediaPipe detection runs in the pipeline's worker thread
+    # optionally trades detection frequency, resolution and model for the frame-rate target / CPU budget
+    scheduler = scheduler_from_args(args)
+    pipeline = RecognizerPipeline(args.source, max_num_hands=args.max_hands, motion_gate=motion_gate, use_roi=not args.full_frame,
+                                  search_width=args.search_width, scheduler=scheduler)
+    if not pipeline.is_opened():
+        print(f"Error: could not open source '{args.source}'")
+        return
+    times = pipeline.times
+    # tracking, features, classifier and smoothing of each frame's hands (shared with replay_mudra.py)
+    recognizer = FrameRecognizer(forest, feature_set, window, motion_gate, times,
+                                 window=args.window, switch_frames=args.switch_frames)
+    # optional per-stage latency export (file and/or local Prometheus endpoint)
+    exporter = start_exporter(times, args)
+    show_percentiles = False
+    percentile_lines, percentiles_updated = [], 0.0
+    pipeline_start = time.perf_counter()
+    pipeline.start()
+    print("Live Mudra Recognizer Started — press 'q' to quit, 'm' to toggle latency percentiles.")
+
+    for packet in pipeline.results():
+        if profiler.enabled and not profiler.reported:
+            profiler.add("mp_hands.Hands() (detection thread)", pipeline.hands_init_time or 0.0)
+            profiler.add("first frame through the pipeline", time.perf_counter() - pipeline_start)
+            profiler.report()
+        frame = packet.frame
+        label = "No hand detected"
+
+        start = time.perf_counter()
+        result = recognizer.process(packet.landmarks, packet.handedness, packet.timestamp)
+        track_ids, closed, labels = result.track_ids, result.closed, result.labels
+        # closest training samples, to see what a (mis)classification is based on
+        nearest = {}
+        if neighbor_index is not None and packet.landmarks and (closed or not args.no_display):
+            with times.span("neighbors"):
+                distances, rows = neighbor_index.query(normalize_handedness(np.array(packet.landmarks), packet.handedness),
+                                                       args.neighbors)
+            nearest = {track_id: ", ".join(f"{neighbor_index.sample_name(row)} ({d:.2f})" for d, row in zip(distances[i], rows[i]))
+                       for i, track_id in enumerate(track_ids)}
+        if len(labels) == 1:
+            label = ("Detecting..." if labels[0] is None else "Unknown mudra" if labels[0] == REJECT_LABEL
+                     else f"Detected: {labels[0]}")
+        elif labels:
+            label = f"Detected {len(labels)} hands"
+        times.add("classify", time.perf_counter() - start)
+
+        for track_id, segment in closed:
+            print_segment(track_id, segment, args.max_hands)
+            if track_id in nearest:
+                print(f"  closest samples now: {nearest[track_id]}")
+        if args.no_display:
+            times.add("end to end", time.perf_counter() - packet.captured_at)
+            continue
+
+        start = time.perf_counter()
+        mirror_frame(frame)
+        for landmarks in packet.landmarks:
+            draw_landmarks(frame, landmarks)
+        if len(labels) > 1:
+            # each hand's own label next to its wrist
+            height, width = frame.shape[:2]
+            for landmarks, hand, hand_label in zip(packet.landmarks, packet.handedness, labels):
+                text = f"{hand[0]}: {hand_label or '...'}"
+                position = (int(landmarks[0][0] * width) - 40, int(landmarks[0][1] * height) + 30)
+                cv2.putText(frame, text, position, cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+        for i, track_id in enumerate(track_ids if nearest else []):
+            text = f"{'Hand ' + str(track_id) + ' ' if len(track_ids) > 1 else ''}nearest: {nearest[track_id]}"
+            cv2.putText(frame, text, (10, frame.shape[0] - 40 - 18 * i), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 255, 255), 1)
+
+        color = (0, 255, 0) if any(labels) else (0, 0, 255)
+        cv2.putText(frame, label, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+        cv2.putText(frame, times.summary(), (10, frame.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        if show_percentiles:
+            # percentiles are recomputed twice a second, not every frame
+            if start - percentiles_updated > 0.5:
+                percentile_lines, percentiles_updated = times.percentile_lines(), start
+            for i, line in enumerate(percentile_lines):
+                cv2.putText(frame, line, (10, 60 + 18 * i), cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 0), 1)
+
+        cv2.imshow("Live Mudra Recognizer", frame)
+        times.add("render", time.perf_counter() - start)
+        times.add("end to end", time.perf_counter() - packet.captured_at)
+
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'): # to quit
+            break
+        if key == ord('m'):
+            show_percentiles = not show_percentiles
+
+    # for exiting
+    for track_id, segment in recognizer.flush():
+        print_segment(track_id, segment, args.max_hands)
+    pipeline.stop()
+    cv2.destroyAllWindows()
+    if exporter is not None:
+        exporter.stop()
+    print("Stage latency percentiles:")
+    for line in times.percentile_lines():
+        print(f"  {line}")
+    print(f"Frames captured: {pipeline.frames_captured}, detected: {pipeline.frames_detected}, "
+          f"dropped before detection: {pipeline.captured.dropped}, dropped before display: {pipeline.detected.dropped}")
+    if pipeline.detector is not None:
+        print(f"Hand region searches: {pipeline.detector.roi_frames}, full-frame searches: {pipeline.detector.full_frames}")
+    if motion_gate is not None:
+        print(f"Incremental mode: {motion_gate.summary()}")
+    if scheduler is not None:
+        print(f"Adaptive quality: {scheduler.summary()}")
+    if pipeline.capture_failed:
+        print(f"Camera '{args.source}' stopped delivering frames ({pipeline.backoff.failures} failed reads)")
+    if hasattr(forest, "average_trees"):
+        print(f"Cascade: {forest.average_trees:.1f} of {forest.n_trees} trees per hand on average")
+    print("Live recognizer exited.")
+
+if __name__ == "__main__":
+    main()
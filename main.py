@@ -1,66 +1,153 @@
 # Set up MediaPipe and access webcam with OpenCV
-import cv2
+import argparse
 import time
-import os
-import mediapipe as mp
+from mudra_metrics import StageTimes, add_metrics_arguments, start_exporter
+from mudra_scheduler import CaptureBackoff, add_scheduler_arguments, scheduler_from_args
+from mudra_startup import StartupProfiler, add_profile_argument
 
-# setting up MediaPipe
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
+def build_parser():
+    parser = argparse.ArgumentParser(description="Check hand tracking on the webcam and save a test frame. Press 'q' or ESC to quit.")
+    parser.add_argument("--camera", default="1", help="camera index or path to a video file (default: 1)")
+    parser.add_argument("--no-pace", action="store_true",
+                        help="process a video file as fast as possible instead of at its own frame rate")
+    parser.add_argument("--max-hands", type=int, default=1, help="hands to track (default: 1)")
+    add_scheduler_arguments(parser)
+    add_metrics_arguments(parser)
+    add_profile_argument(parser)
+    return parser
 
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=1,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.7
-)
+def main(argv=None):
+    args = build_parser().parse_args(argv)
 
-# access webcam with OpenCV
-# cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
-cap = cv2.VideoCapture(1)
-if not cap.isOpened():
-    print("Error: Webcam not accessible")
-    exit()
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("import cv2"):
+        import cv2
+    with profiler.step("import mediapipe"):
+        import mediapipe as mp
 
-print("Webcam opened! Press 'q' to quit or ESC to close.")
+    # setting up MediaPipe
+    mp_hands = mp.solutions.hands
+    mp_drawing = mp.solutions.drawing_utils
 
-frame_saved = False
+    def make_hands(model_complexity=1):
+        return mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=args.max_hands,
+            model_complexity=model_complexity,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.7
+        )
 
-while True:
-    ret, frame = cap.read()
-    print("Captured frame:", ret)
+    with profiler.step("mp_hands.Hands()"):
+        hands = make_hands()
+        model_complexity = 1
 
-    if not ret:
-        print("Failed to grab frame.")
-        break
+    # access webcam with OpenCV
+    # cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
+    with profiler.step("open camera"):
+        is_file = not args.camera.isdigit()
+        cap = cv2.VideoCapture(args.camera if is_file else int(args.camera))
+    if not cap.isOpened():
+        print("Error: Webcam not accessible")
+        return
+    # video files are played back at their own frame rate so they behave like a camera
+    frame_interval = 0.0
+    if is_file and not args.no_pace:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_interval = 1.0 / fps if fps > 0 else 0.0
+    profiler.report()
 
-    frame = cv2.flip(frame, 1)
+    print("Webcam opened! Press 'q' to quit or ESC to close, 'm' to toggle latency percentiles.")
 
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = hands.process(rgb_frame)
+    frame_saved = False
+    # per-stage latency instead of printing every frame
+    times = StageTimes()
+    exporter = start_exporter(times, args)
+    show_percentiles = False
+    percentile_lines, percentiles_updated = [], 0.0
+    # failed reads are retried with growing waits instead of in a busy loop
+    backoff = CaptureBackoff()
+    # optionally adapts detection frequency, resolution and model to --target-fps / --cpu-budget
+    scheduler = scheduler_from_args(args)
+    results = None
+    next_time = time.perf_counter()
 
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(
-                frame,
-                hand_landmarks,
-                mp_hands.HAND_CONNECTIONS
-            )
+    while True:
+        frame_start = time.perf_counter()
+        with times.span("capture"):
+            ret, frame = cap.read()
 
-    if not frame_saved:
-        cv2.imwrite("test_frame.png", frame)
-        print("Saved a test frame as test_frame.png")
-        frame_saved = True
+        if not ret:
+            if is_file:
+                print("End of video.")
+                break
+            if backoff.failed():
+                continue
+            print("Failed to grab frame.")
+            break
+        backoff.succeeded()
 
-    cv2.imshow('Hand Tracking', frame)
+        if scheduler is not None and scheduler.level.model_complexity != model_complexity:
+            hands.close()
+            model_complexity = scheduler.level.model_complexity
+            hands = make_hands(model_complexity)
+        busy_start = time.perf_counter()
+        with times.span("flip + convert"):
+            frame = cv2.flip(frame, 1)
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # with a scheduler, frames in between detections keep showing the last hands
+        if scheduler is None or scheduler.should_detect() or results is None:
+            with times.span("hands.process"):
+                if scheduler is not None and scheduler.level.scale < 1.0:
+                    scale = scheduler.level.scale
+                    rgb_frame = cv2.resize(rgb_frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                results = hands.process(rgb_frame)
 
-    time.sleep(0.05)
+        with times.span("render"):
+            if results.multi_hand_landmarks:
+                for hand_landmarks in results.multi_hand_landmarks:
+                    mp_drawing.draw_landmarks(
+                        frame,
+                        hand_landmarks,
+                        mp_hands.HAND_CONNECTIONS
+                    )
 
-    key = cv2.waitKey(1) & 0xFF
-    if (key == ord('q') or key == 27):
-        break
+            if not frame_saved:
+                cv2.imwrite("test_frame.png", frame)
+                print("Saved a test frame as test_frame.png")
+                frame_saved = True
 
-cap.release()
-cv2.destroyAllWindows()
-hands.close()
-print("Closed webcam and exited.")
\ No newline at end of file
+            if show_percentiles:
+                # percentiles are recomputed twice a second, not every frame
+                if frame_start - percentiles_updated > 0.5:
+                    percentile_lines, percentiles_updated = times.percentile_lines(), frame_start
+                for i, line in enumerate(percentile_lines):
+                    cv2.putText(frame, line, (10, 20 + 18 * i), cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 0), 1)
+            cv2.imshow('Hand Tracking', frame)
+        if scheduler is not None:
+            scheduler.record(time.perf_counter() - busy_start)
+
+        key = cv2.waitKey(1) & 0xFF
+        times.add("frame", time.perf_counter() - frame_start)
+        if (key == ord('q') or key == 27):
+            break
+        if key == ord('m'):
+            show_percentiles = not show_percentiles
+        if frame_interval:
+            next_time += frame_interval
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    cap.release()
+    cv2.destroyAllWindows()
+    hands.close()
+    if exporter is not None:
+        exporter.stop()
+    print("Stage latency percentiles:")
+    for line in times.percentile_lines():
+        print(f"  {line}")
+    if scheduler is not None:
+        print(f"Adaptive quality: {scheduler.summary()}")
+    print("Closed webcam and exited.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Single command-line entry point for all the mudra tools
+#
+# Usage: python mudra.py <command> [args...], e.g. python mudra.py live --profile-startup
+# Only the module behind the chosen command is imported, and each of those imports its heavy
+# dependencies (cv2, mediapipe, sklearn) after parsing its own arguments.
+import importlib
+import sys
+
+COMMANDS = {
+    "live": ("live_mudra_recognizer", "recognize mudras from a camera or video"),
+    "record": ("record_mudra", "record landmark samples for a mudra"),
+    "preview": ("preview_mudra_samples", "preview the saved samples of a mudra"),
+    "audit": ("audit_mudra_data", "validate the dataset, export it to text/CSV, render contact sheets"),
+    "webcam": ("main", "check hand tracking on the webcam"),
+    "train": ("train_gesture_classifier", "train the classifier and export the model"),
+    "train-temporal": ("train_temporal_classifier", "train the sliding-window classifier for --temporal"),
+    "select-features": ("select_features", "rank feature groups by accuracy gained per microsecond"),
+    "serve": ("mudra_server", "serve recognition over HTTP on localhost"),
+    "batch": ("batch_recognize", "recognize mudras in recorded videos or image folders"),
+    "replay": ("replay_mudra", "replay stored landmarks: confusion matrices and throughput"),
+    "cascade": ("mudra_cascade", "calibrate an exported model's confidence for --cascade and --reject"),
+    "dataset": ("mudra_dataset", "import or inspect the packed dataset"),
+    "neighbors": ("mudra_index", "closest samples to a pose, near-duplicate report"),
+    "sequence": ("mudra_sequence", "inspect landmark sequence recordings"),
+    "export": ("mudra_forest", "export a pickled classifier as a model directory"),
+}
+
+def usage():
+    print("Usage: python mudra.py <command> [args...]\n\nCommands:")
+    for name, (_, description) in COMMANDS.items():
+        print(f"  {name:<16} {description}")
+    print("\nRun 'python mudra.py <command> --help' for the arguments of a command.")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        usage()
+        return
+    if argv[0] not in COMMANDS:
+        print(f"Unknown command '{argv[0]}'\n")
+        usage()
+        sys.exit(2)
+    module = importlib.import_module(COMMANDS[argv[0]][0])
+    module.main(argv[1:])
+
+if __name__ == "__main__":
+    main()
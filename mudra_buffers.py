@@ -0,0 +1,61 @@
+# Preallocated, reusable buffers for the capture -> MediaPipe path
+#
+# Every full-size array that is allocated and freed per frame is close to a megabyte of allocator
+# churn at 640x480, plus the page faults of touching fresh memory, and shows up as jitter in the
+# frame times. FramePool keeps a fixed set of frames the capture stage reads into
+# (cv2.VideoCapture.read fills a frame in place when its size matches); a frame goes back to the
+# pool once it has been displayed or dropped. ScratchBuffer hands out contiguous arrays of any
+# shape from one allocation that only grows, as destinations for the resize and color conversion
+# in front of MediaPipe, whose size changes with the tracked hand region.
+import math
+import threading
+import numpy as np
+
+class FramePool:
+    def __init__(self, size):
+        self.size = size                # frames kept for reuse, any beyond that are left to the garbage collector
+        self.shape = None
+        self.allocations = 0            # frames that had to be allocated because none was free
+        self.reuses = 0                 # frames handed out again
+        self._frames = []               # the pool's own frames, free or in flight
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # a free frame to read into, or None when all are in flight (cap.read() then allocates one)
+        with self._lock:
+            if not self._free:
+                return None
+            self.reuses += 1
+            return self._free.pop()
+
+    def adopt(self, frame):
+        # registers a frame that was just allocated, it's kept for reuse while the pool isn't full
+        with self._lock:
+            self.allocations += 1
+            if frame.shape != self.shape:
+                # the source changed resolution, frames of the old size are let go as they come back
+                self.shape = frame.shape
+                self._frames, self._free = [], []
+            if len(self._frames) < self.size:
+                self._frames.append(frame)
+
+    def release(self, frame):
+        # hands a frame back once nothing reads it any more, frames the pool doesn't own are ignored
+        with self._lock:
+            if any(frame is own for own in self._frames) and not any(frame is free for free in self._free):
+                self._free.append(frame)
+
+class ScratchBuffer:
+    def __init__(self):
+        self._buffer = np.empty(0, dtype=np.uint8)
+        self.allocations = 0            # times the buffer had to grow
+
+    def view(self, shape, dtype=np.uint8):
+        # C-contiguous array of the given shape, only valid until the next view() call
+        dtype = np.dtype(dtype)
+        nbytes = math.prod(shape) * dtype.itemsize
+        if nbytes > self._buffer.nbytes:
+            self._buffer = np.empty(nbytes, dtype=np.uint8)
+            self.allocations += 1
+        return self._buffer[:nbytes].view(dtype).reshape(shape)
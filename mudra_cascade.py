@@ -0,0 +1,385 @@
+# Early-exit cascade over a compiled forest, with calibrated confidence and an "unknown" reject label
+#
+# Trees are evaluated in stages of growing size (10, 10, 20, 40, ... trees). After every stage a
+# hand stops as soon as its leading mudra is settled:
+#   certain   the lead over the runner-up is larger than the number of trees left (every tree adds
+#             at most 1 to any class), so the full forest would pick the same mudra
+#   confident the lead is large enough that the remaining trees overturn it with
+#             probability below delta (Hoeffding bound on the per-tree lead: lead^2 > 2 k ln(1/delta)
+#             after k trees). A held pose the trees agree on settles after the first stage.
+# Probabilities are averaged over the trees that were evaluated. A NumPy walk costs the same fixed
+# ~60us whether it covers 10 trees or 100, so for a single hand every tree is turned into nested
+# if/else Python code once (generated on first use, about 0.3us per tree and only as deep as the
+# tree actually is); batches of hands walk each stage with NumPy over the hands still undecided.
+#
+# A forest's averaged votes are not probabilities of being right, so the top probability is mapped
+# to the accuracy actually observed at that level on held-out predictions (monotone histogram
+# binning, fitted by train_gesture_classifier.py, train_temporal_classifier.py or "mudra_cascade.py
+# calibrate" and stored in model.json). The cascade's partial averages are more extreme than the
+# full forest's, so it gets calibrations of its own, fitted on its outputs for each delta
+# ("cascade_calibration"); "calibration" is the full forest's. Hands whose calibrated confidence is
+# below the reject threshold get REJECT_LABEL, with --reject alone the full forest is evaluated as
+# usual. calibrate refits the estimator recorded in model.json (class and parameters) on the same
+# kind of samples the model was trained on: static samples, or for the temporal model the synthetic
+# and recorded windows of train_temporal_classifier.py.
+import argparse
+import json
+import math
+import os
+import numpy as np
+from mudra_forest import DEFAULT_MODEL, read_model_meta
+
+REJECT_LABEL = "unknown"
+DEFAULT_DELTA = 0.05
+
+class Calibration:
+    def __init__(self, edges, accuracy):
+        self.edges = np.asarray(edges, dtype=np.float64)            # top-probability bin edges
+        self.accuracy = np.asarray(accuracy, dtype=np.float64)      # observed accuracy per bin, non-decreasing
+        self._centers = (self.edges[:-1] + self.edges[1:]) / 2
+
+    @classmethod
+    def fit(cls, proba, correct, bins=10):
+        # proba: (N, classes) held-out probabilities, correct: (N,) whether their top class was right
+        top = np.asarray(proba).max(axis=1)
+        # equal-count bins, so every bin's accuracy rests on the same number of samples
+        edges = np.unique(np.quantile(top, np.linspace(0, 1, bins + 1)))
+        if len(edges) < 2:
+            edges = np.array([0.0, 1.0])
+        edges[0], edges[-1] = 0.0, 1.0
+        which = np.clip(np.searchsorted(edges, top, side="right") - 1, 0, len(edges) - 2)
+        counts = np.bincount(which, minlength=len(edges) - 1)
+        hits = np.bincount(which, weights=np.asarray(correct, dtype=np.float64), minlength=len(edges) - 1)
+        # empty bins borrow from their neighbours below, and confidence never drops as votes grow
+        accuracy = np.where(counts > 0, hits / np.maximum(counts, 1), np.nan)
+        accuracy = np.maximum.accumulate(np.nan_to_num(accuracy, nan=0.0))
+        return cls(edges, accuracy)
+
+    def confidence(self, top):
+        # top-class probabilities -> calibrated probability that the top class is right
+        return np.interp(top, self._centers, self.accuracy)
+
+    def apply(self, proba):
+        # scales each row so its top class carries the calibrated confidence and the others share the rest
+        proba = np.asarray(proba, dtype=np.float64)
+        if len(proba) == 1:
+            # one hand, the live case: scalar math instead of a dozen small array operations
+            row = proba[0]
+            best = int(row.argmax())
+            top = float(row[best])
+            confidence = float(np.interp(top, self._centers, self.accuracy))
+            calibrated = row * ((1.0 - confidence) / (1.0 - top) if top < 1.0 else 0.0)
+            calibrated[best] = confidence
+            return calibrated[None]
+        rows = np.arange(len(proba))
+        best = np.argmax(proba, axis=1)
+        top = proba[rows, best]
+        confidence = self.confidence(top)
+        others = 1.0 - top
+        scale = np.divide(1.0 - confidence, others, out=np.zeros_like(others), where=others > 0)
+        calibrated = proba * scale[:, None]
+        calibrated[rows, best] = confidence
+        return calibrated
+
+    def to_json(self):
+        return {"edges": self.edges.round(6).tolist(), "accuracy": self.accuracy.round(6).tolist()}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["edges"], data["accuracy"])
+
+def expected_calibration_error(proba, correct, bins=10):
+    # mean |confidence - accuracy| over equal-width confidence bins, weighted by their share of samples
+    top = np.asarray(proba).max(axis=1)
+    which = np.minimum((top * bins).astype(int), bins - 1)
+    error = 0.0
+    for b in np.unique(which):
+        mask = which == b
+        error += mask.mean() * abs(top[mask].mean() - np.mean(np.asarray(correct)[mask]))
+    return float(error)
+
+def _tree_source(name, root, feature, threshold, first_child):
+    # a function returning the leaf x ends on in the tree at root, as nested if/else on the
+    # (float32 valued) features; leaves point to themselves
+    lines = [f"def {name}(x):"]
+    stack = [(root, 1)]
+    while stack:
+        node, depth = stack.pop()
+        indent = "    " * depth
+        if isinstance(node, str):
+            lines.append(indent + node)
+            continue
+        left = first_child[node]
+        if left == node:
+            lines.append(f"{indent}return {node}")
+            continue
+        # popped in reverse: the right branch, then "else:", then the left branch
+        stack += [(left, depth + 1), ("else:", depth), (left + 1, depth + 1)]
+        lines.append(f"{indent}if x[{feature[node]}] > {threshold[node]!r}:")
+    return "\n".join(lines)
+
+# Python refuses more than 100 levels of indentation, deeper trees keep the loop walk
+MAX_GENERATED_DEPTH = 90
+
+def compile_trees(forest):
+    # -> one Python function per tree, taking a list of features and returning the leaf's node index
+    namespace = {}
+    arrays = forest.feature.tolist(), forest.threshold.tolist(), forest.first_child.tolist()
+    source = "\n".join(_tree_source(f"tree_{i}", root, *arrays) for i, root in enumerate(forest.roots.tolist()))
+    exec(compile(source, "<compiled forest>", "exec"), namespace)
+    return [namespace[f"tree_{i}"] for i in range(forest.n_trees)]
+
+class CalibratedForest:
+    # the full forest with calibrated confidence and REJECT_LABEL, same interface as CompiledForest
+    # (classes, predict_proba, predict) so it drops into the recognizer
+    def __init__(self, forest, calibration=None, reject_below=0.0):
+        self.forest = forest
+        self.classes = forest.classes
+        self.calibration = calibration      # Calibration, or None to return the averaged votes as they are
+        self.reject_below = reject_below    # calibrated confidence below which predict() says REJECT_LABEL
+
+    @property
+    def n_trees(self):
+        return self.forest.n_trees
+
+    def votes(self, X):
+        # -> (N, classes) averaged votes, and (N,) the trees each hand needed
+        return self.forest.predict_proba(X), np.full(len(X), self.n_trees)
+
+    def predict_proba(self, X):
+        proba, _ = self.votes(X)
+        return proba if self.calibration is None else self.calibration.apply(proba)
+
+    def predict(self, X):
+        # most probable mudra of each hand, REJECT_LABEL where the calibrated confidence is too low
+        proba = self.predict_proba(X)
+        labels = self.classes[np.argmax(proba, axis=1)].astype(object)
+        labels[proba.max(axis=1) < self.reject_below] = REJECT_LABEL
+        return labels
+
+class CascadeForest(CalibratedForest):
+    def __init__(self, forest, calibration=None, delta=DEFAULT_DELTA, first_stage=10, reject_below=0.0):
+        super().__init__(forest, calibration, reject_below)
+        self.delta = delta                  # accepted chance that stopping early changes the mudra, 0 for exact
+        self._bound = 2 * math.log(1 / delta) if delta else math.inf
+        self.stages = []                    # (first tree, end) of each stage
+        start, size = 0, first_stage
+        while start < forest.n_trees:
+            end = min(start + size, forest.n_trees)
+            # the lead after end trees is at most end, so no hand can settle before end > n_trees - end
+            # or end > bound (with delta 0 nothing stops before half the trees): such a stage is merged
+            # into the next one
+            if self.stages and not self._can_settle(self.stages[-1][1]):
+                self.stages[-1] = (self.stages[-1][0], end)
+            else:
+                self.stages.append((start, end))
+            start, size = start + size, max(size, start + size)
+        self._trees = None                  # compile_trees(forest), generated on the first single hand
+        self.trees_evaluated = 0            # running totals, for the average trees per hand
+        self.hands = 0
+
+    @property
+    def average_trees(self):
+        return self.trees_evaluated / max(self.hands, 1)
+
+    def _can_settle(self, end):
+        return end > self.n_trees - end or end > self._bound
+
+    def _settled(self, lead, end):
+        # lead of the leading mudra's summed votes over the runner-up's after end trees
+        return (lead > self.n_trees - end) | (lead * lead > self._bound * end)
+
+    def _single_hand_trees(self):
+        if self._trees is None:
+            if self.forest.max_depth <= MAX_GENERATED_DEPTH:
+                self._trees = compile_trees(self.forest)
+            else:
+                first_child = self.forest.first_child.tolist()
+                feature, threshold = self.forest.feature.tolist(), self.forest.threshold.tolist()
+
+                def walk(x, node):
+                    while first_child[node] != node:
+                        node = first_child[node] + (x[feature[node]] > threshold[node])
+                    return node
+                self._trees = [lambda x, root=root: walk(x, root) for root in self.forest.roots.tolist()]
+        return self._trees
+
+    def _votes_one(self, x):
+        # single hand: (classes,) summed votes and the trees walked; float32 features compare against
+        # float64 thresholds like in CompiledForest._leaves
+        x = np.asarray(x, dtype=np.float32).tolist()
+        trees, value, n_trees, bound = self._single_hand_trees(), self.forest.value, self.n_trees, self._bound
+        sums = np.zeros(value.shape[1])
+        for start, end in self.stages:
+            # take and a sorted list are a few microseconds cheaper than fancy indexing and partition
+            sums += np.add.reduce(value.take([tree(x) for tree in trees[start:end]], axis=0))
+            if len(sums) < 2:
+                break
+            second, first = sorted(sums.tolist())[-2:]
+            lead = first - second
+            # same test as _settled, on Python floats
+            if lead > n_trees - end or lead * lead > bound * end:
+                break
+        return sums, end
+
+    def _stage_votes(self, X, start, end):
+        # (N, features) -> (N, classes) summed leaf probabilities of trees start..end
+        f = self.forest
+        roots = f.roots[start:end]
+        flat = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(roots, (len(X), len(roots)))
+        for _ in range(f.max_depth):
+            nodes = f.first_child[nodes] + (flat[row_offsets + f.feature[nodes]] > f.threshold[nodes])
+        return f.value[nodes].sum(axis=1)
+
+    def votes(self, X):
+        # -> (N, classes) averaged votes of the trees each hand needed, and (N,) how many that was
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) == 1:
+            # the common live case, walked with the generated trees
+            sums, end = self._votes_one(X[0])
+            self.trees_evaluated += end
+            self.hands += 1
+            return (sums / end)[None], np.array([end])
+        sums = np.zeros((len(X), len(self.classes)))
+        trees = np.zeros(len(X), dtype=int)
+        active = np.arange(len(X))
+        for start, end in self.stages:
+            sums[active] += self._stage_votes(X[active], start, end)
+            trees[active] = end
+            if len(self.classes) < 2:
+                break
+            top2 = np.partition(sums[active], -2, axis=1)[:, -2:]
+            active = active[~self._settled(top2[:, 1] - top2[:, 0], end)]
+            if not len(active):
+                break
+        self.trees_evaluated += int(trees.sum())
+        self.hands += len(X)
+        return sums / trees[:, None], trees
+
+def delta_key(delta):
+    # how a delta is written among model.json's "cascade_calibration" keys
+    return f"{delta:g}"
+
+def load_calibration(path=DEFAULT_MODEL, delta=None):
+    # the model's stored Calibration of the full forest, or of the cascade at delta; None for a .pkl
+    # or a model exported without one
+    if not os.path.isfile(os.path.join(path, "model.json")):
+        return None
+    meta = read_model_meta(path)
+    data = meta.get("calibration") if delta is None else meta.get("cascade_calibration", {}).get(delta_key(delta))
+    return Calibration.from_json(data) if data else None
+
+def add_cascade_arguments(parser):
+    parser.add_argument("--cascade", action="store_true",
+                        help="evaluate trees in stages and stop once the mudra is settled, with calibrated confidence")
+    parser.add_argument("--delta", type=float, default=DEFAULT_DELTA,
+                        help=f"with --cascade, accepted chance that stopping early changes the mudra, 0 for exact (default: {DEFAULT_DELTA})")
+    parser.add_argument("--reject", type=float, default=0.0, metavar="P",
+                        help=f"label hands whose calibrated confidence stays below P as '{REJECT_LABEL}' (default: off)")
+
+def cascade_from_args(forest, path, args):
+    # the forest itself, a CascadeForest over it with --cascade, or with --reject alone the full
+    # forest with calibrated confidence
+    if not args.cascade and not args.reject:
+        return forest
+    calibration = load_calibration(path, args.delta if args.cascade else None)
+    if calibration is None and args.cascade and load_calibration(path) is not None:
+        print(f"Warning: '{path}' has no calibration for the cascade at delta {args.delta:g} (run "
+              f"'mudra_cascade.py calibrate --deltas {args.delta:g}'), using the full forest's")
+        calibration = load_calibration(path)
+    elif calibration is None:
+        print(f"Warning: '{path}' has no confidence calibration (run 'mudra_cascade.py calibrate'), using the raw votes")
+    if not args.cascade:
+        return CalibratedForest(forest, calibration, reject_below=args.reject)
+    return CascadeForest(forest, calibration, args.delta, reject_below=args.reject)
+
+def estimator_json(clf):
+    # the estimator's class and parameters, stored in model.json so calibrate refits the same forest
+    return {"class": type(clf).__name__, "params": clf.get_params()}
+
+def estimator_from_meta(meta):
+    # an unfitted sklearn.ensemble estimator configured like the one the model was exported from
+    import sklearn.ensemble
+    estimator = meta.get("estimator")
+    if estimator is None:
+        print(f"Warning: model.json doesn't record the estimator it was trained with, assuming a "
+              f"RandomForestClassifier with {meta['n_trees']} trees")
+        return sklearn.ensemble.RandomForestClassifier(n_estimators=meta["n_trees"], random_state=42)
+    return getattr(sklearn.ensemble, estimator["class"])(**estimator["params"])
+
+def held_out_proba(clf, X, y, folds=5, groups=None, deltas=(None,)):
+    # out-of-fold probabilities of a forest configured like clf, and whether each top class was right,
+    # for every entry of deltas: None for the full forest, a delta for the cascade at that delta (its
+    # averages over the trees it evaluated); with groups, all rows of a group (windows of one sample
+    # or recording) stay on one side of a split
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedGroupKFold, StratifiedKFold
+    from mudra_forest import compile_forest
+    if groups is None:
+        cv = StratifiedKFold(folds, shuffle=True, random_state=42)
+    else:
+        cv = StratifiedGroupKFold(folds, shuffle=True, random_state=42)
+    X, y = np.asarray(X, dtype=np.float32), np.asarray(y)
+    classes = np.unique(y)
+    probas = [np.zeros((len(X), len(classes))) for _ in deltas]
+    for train, test in cv.split(X, y, groups):
+        forest = compile_forest(clone(clf).fit(X[train], y[train]))
+        # a fold may miss a rare class, its column stays 0
+        columns = np.searchsorted(classes, forest.classes)
+        for delta, proba in zip(deltas, probas):
+            predictor = forest if delta is None else CascadeForest(forest, delta=delta)
+            proba[np.ix_(test, columns)] = predictor.predict_proba(X[test])
+    return [(proba, classes[np.argmax(proba, axis=1)] == y) for proba in probas]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate an exported model's confidence for the cascade")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    calibrate_parser = subparsers.add_parser("calibrate", help="fit the confidence calibration and store it in model.json")
+    calibrate_parser.add_argument("model", nargs="?", default=DEFAULT_MODEL, help=f"exported model directory (default: {DEFAULT_MODEL})")
+    calibrate_parser.add_argument("--data", default=None, help="mudra_data folder or packed dataset (default: mudra_data.pack if present, else mudra_data)")
+    calibrate_parser.add_argument("--sequences", default=None,
+                                  help="for the temporal model, folder of <label>/*.mseq recordings (default: mudra_sequences)")
+    calibrate_parser.add_argument("--bins", type=int, default=10, help="confidence bins (default: 10)")
+    calibrate_parser.add_argument("--deltas", type=float, nargs="*", default=[DEFAULT_DELTA],
+                                  help=f"cascade deltas to calibrate as well, besides the full forest (default: {DEFAULT_DELTA})")
+    args = parser.parse_args(argv)
+
+    from mudra_temporal import WINDOW_FEATURE_NAMES
+    from train_gesture_classifier import load_dataset, load_landmarks
+    meta = read_model_meta(args.model)
+    groups = None
+    if meta["feature_names"] == WINDOW_FEATURE_NAMES:
+        from mudra_dataset import default_data
+        from mudra_sequence import DEFAULT_SEQUENCE_DIR
+        from train_temporal_classifier import build_windows, sequence_paths
+        # models exported before "holds" was recorded were trained on 4 synthetic holds per sample
+        holds = meta.get("holds", 4)
+        landmarks, labels = load_landmarks(args.data or default_data()) if holds else (None, None)
+        X, y, groups, _ = build_windows(landmarks, labels, sequence_paths(args.sequences or DEFAULT_SEQUENCE_DIR),
+                                        meta["window"], holds)
+    else:
+        from mudra_features import FeatureSet
+        X, y = load_dataset(args.data, None, FeatureSet.from_names(meta["feature_names"]))
+    # forests configured like the exported one, each scoring the samples it wasn't trained on, in full
+    # and through the cascade at every delta
+    deltas = [None, *args.deltas]
+    cascade_calibration = meta.get("cascade_calibration", {})
+    for delta, (proba, correct) in zip(deltas, held_out_proba(estimator_from_meta(meta), X, y, groups=groups, deltas=deltas)):
+        calibration = Calibration.fit(proba, correct, args.bins)
+        if delta is None:
+            meta["calibration"] = calibration.to_json()
+        else:
+            cascade_calibration[delta_key(delta)] = calibration.to_json()
+        name = "full forest" if delta is None else f"cascade at delta {delta:g}"
+        print(f"{name}: expected calibration error {expected_calibration_error(proba, correct):.3f} -> "
+              f"{expected_calibration_error(calibration.apply(proba), correct):.3f}")
+    if cascade_calibration:
+        meta["cascade_calibration"] = cascade_calibration
+    with open(os.path.join(args.model, "model.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Calibrated '{args.model}' on {len(X)} held-out predictions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# Packed on-disk dataset format: all samples in a few contiguous, memory-mappable arrays
+#
+# A pack is a directory containing:
+#   meta.json       format version, sample count and class names
+#   landmarks.f32   float32 (N, 21, 3) landmarks
+#   labels.i16      int16 (N,) index into the class names
+#   indices.i32     int32 (N,) sample number within its label (the ### in <label>_###.npy)
+#   timestamps.f64  float64 (N,) recording time in seconds since the epoch
+#
+# Samples are appended to the array files first and only become visible once meta.json is
+# rewritten with the new count, so an interrupted append never leaves a half-written sample.
+import argparse
+import json
+import os
+import re
+import time
+import numpy as np
+
+PACK_VERSION = 1
+DEFAULT_PACK = "mudra_data.pack"
+
+# name -> (file name, dtype, per-sample shape)
+ARRAYS = {
+    "landmarks": ("landmarks.f32", np.float32, (21, 3)),
+    "labels": ("labels.i16", np.int16, ()),
+    "indices": ("indices.i32", np.int32, ()),
+    "timestamps": ("timestamps.f64", np.float64, ()),
+}
+
+class PackedDataset:
+    def __init__(self, path):
+        self.path = path
+        self.refresh()
+
+    def refresh(self):
+        # (re)maps the array files, the returned arrays are read-only views straight onto disk
+        with open(os.path.join(self.path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != PACK_VERSION:
+            raise ValueError(f"Unsupported pack version {meta['version']} in '{self.path}'")
+        self.classes = meta["classes"]
+        self.count = meta["count"]
+        for name, (filename, dtype, shape) in ARRAYS.items():
+            if self.count == 0:
+                array = np.empty((0,) + shape, dtype=dtype)
+            else:
+                array = np.memmap(os.path.join(self.path, filename), dtype=dtype, mode="r",
+                                  shape=(self.count,) + shape)
+            setattr(self, name, array)
+
+    def __len__(self):
+        return self.count
+
+    def label_names(self):
+        return np.array(self.classes)[self.labels]
+
+    def label_count(self, label):
+        if label not in self.classes:
+            return 0
+        return int(np.count_nonzero(self.labels == self.classes.index(label)))
+
+    def next_index(self, label):
+        # next free sample number within the label, after the highest one (numbers may have gaps)
+        if label not in self.classes:
+            return 0
+        indices = self.indices[self.labels == self.classes.index(label)]
+        return int(indices.max()) + 1 if len(indices) else 0
+
+    def append(self, label, landmarks, index=None, timestamp=None):
+        # appends one (21, 3) sample and returns its sample number within the label
+        if index is None:
+            index = self.next_index(label)
+        self.append_many([label], np.asarray(landmarks)[None], [index],
+                         [time.time() if timestamp is None else timestamp])
+        return index
+
+    def append_many(self, labels, landmarks, indices, timestamps):
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, 21, 3)
+        classes = list(self.classes)
+        for label in labels:
+            if label not in classes:
+                classes.append(label)
+        columns = {
+            "landmarks": landmarks,
+            "labels": np.array([classes.index(label) for label in labels], dtype=np.int16),
+            "indices": np.asarray(indices, dtype=np.int32),
+            "timestamps": np.asarray(timestamps, dtype=np.float64),
+        }
+        for name, (filename, dtype, shape) in ARRAYS.items():
+            with open(os.path.join(self.path, filename), "r+b") as f:
+                # drop anything left over from an interrupted append before writing
+                f.truncate(self.count * np.dtype(dtype).itemsize * int(np.prod(shape)))
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        _write_meta(self.path, classes, self.count + len(landmarks))
+        self.refresh()
+
+def _write_meta(path, classes, count):
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": PACK_VERSION, "count": count, "classes": classes}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+def is_pack(path):
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+def create_pack(path=DEFAULT_PACK):
+    os.makedirs(path, exist_ok=True)
+    for filename, _, _ in ARRAYS.values():
+        open(os.path.join(path, filename), "wb").close()
+    _write_meta(path, [], 0)
+    return PackedDataset(path)
+
+def open_pack(path=DEFAULT_PACK, create=False):
+    if not is_pack(path):
+        if not create:
+            raise FileNotFoundError(f"No packed dataset at '{path}'")
+        return create_pack(path)
+    return PackedDataset(path)
+
+# walks mudra_data/<label>/*.npy in the same order as the training script
+def iter_tree(data_dir="mudra_data"):
+    for gesture in sorted(os.listdir(data_dir)):
+        gesture_path = os.path.join(data_dir, gesture)
+        if not os.path.isdir(gesture_path):
+            continue
+        for filename in sorted(os.listdir(gesture_path)):
+            if filename.endswith(".npy"):
+                yield gesture, os.path.join(gesture_path, filename)
+
+def default_data(data_dir="mudra_data", pack=DEFAULT_PACK):
+    # the dataset the tools read when none is given: the pack once it exists, otherwise the .npy tree.
+    # A label folder changed after the pack's last update (a sample saved without record_mudra.py
+    # --pack, or removed) means the pack is missing something, which is pointed out instead of
+    # silently ignored. Only the folders are looked at, not every sample file.
+    if not is_pack(pack):
+        return data_dir
+    updated = os.path.getmtime(os.path.join(pack, "meta.json"))
+    if os.path.isdir(data_dir):
+        changed = [entry.name for entry in os.scandir(data_dir) if entry.is_dir() and entry.stat().st_mtime > updated]
+        if changed:
+            print(f"Warning: {', '.join(sorted(changed))} in '{data_dir}' changed after '{pack}' was last updated, "
+                  f"the pack doesn't have those changes (read '{data_dir}' directly, or re-pack it with "
+                  f"'python mudra_dataset.py import')")
+    return pack
+
+def import_tree(data_dir="mudra_data", path=DEFAULT_PACK):
+    # builds a fresh pack from the per-file layout
+    labels, landmarks, indices, timestamps = [], [], [], []
+    for gesture, file_path in iter_tree(data_dir):
+        match = re.search(r"_(\d+)\.npy$", file_path)
+        labels.append(gesture)
+        landmarks.append(np.load(file_path))
+        indices.append(int(match.group(1)) if match else len(indices))
+        timestamps.append(os.path.getmtime(file_path))
+    dataset = create_pack(path)
+    if labels:
+        dataset.append_many(labels, np.array(landmarks), indices, timestamps)
+    return dataset
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the packed mudra dataset")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="pack a mudra_data/<label>/*.npy tree")
+    import_parser.add_argument("data_dir", nargs="?", default="mudra_data")
+    import_parser.add_argument("pack", nargs="?", default=DEFAULT_PACK)
+    info_parser = subparsers.add_parser("info", help="print sample counts per label")
+    info_parser.add_argument("pack", nargs="?", default=DEFAULT_PACK)
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        dataset = import_tree(args.data_dir, args.pack)
+        print(f"Packed {len(dataset)} samples from '{args.data_dir}' into '{args.pack}'")
+    else:
+        dataset = open_pack(args.pack)
+        print(f"=== {args.pack}: {len(dataset)} samples ===")
+        for label in dataset.classes:
+            print(f"  {label}: {dataset.label_count(label)}")
+
+if __name__ == "__main__":
+    main()
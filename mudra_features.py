@@ -0,0 +1,183 @@
+# Shared feature extraction for training and live recognition (vectorized over batches of hands)
+#
+# extract_features_batch computes the basic set (four PIP angles and the thumb angle). FeatureSet
+# computes any combination of FEATURE_GROUPS, an extended set that also covers the MCP and DIP
+# joints, finger spread, fingertip distances and palm orientation. Distances are divided by the palm
+# size and angles don't depend on scale or rotation; only palm_normal keeps the hand's orientation.
+import numpy as np
+
+# MediaPipe's hand landmark reference:
+# 0: wrist
+# 1–4: thumb (tip is 4)
+# 5–8: index (tip is 8)
+# 9–12: middle (tip is 12)
+# 13–16: ring (tip is 16)
+# 17–20: pinky (tip is 20)
+
+FEATURE_NAMES = ["index_pip", "middle_pip", "ring_pip", "pinky_pip", "thumb"]
+
+# each feature is the angle between (B - A) and (D - C)
+# PIP angles: mcp -> pip and tip -> pip, thumb angle: wrist -> base and base -> tip
+_A = np.array([5, 9, 13, 17, 0])
+_B = np.array([6, 10, 14, 18, 2])
+_C = np.array([8, 12, 16, 20, 2])
+_D = np.array([6, 10, 14, 18, 4])
+
+def _dot(v1, v2):
+    # matmul over the last axis keeps the same summation as np.dot on a single pair,
+    # so batched output is bit-identical to the old per-hand computation
+    return np.matmul(v1[..., None, :], v2[..., :, None])[..., 0, 0]
+
+def _vector_angles(v1, v2):
+    # (..., 3) vector pairs -> (...) angles in degrees
+    cos_angle = _dot(v1, v2) / (np.sqrt(_dot(v1, v1)) * np.sqrt(_dot(v2, v2)))
+    cos_angle = np.clip(cos_angle.astype(np.float64), -1.0, 1.0)
+    return np.degrees(np.arccos(cos_angle))
+
+def joint_angles(landmarks, a, b, c, d):
+    # (N, 21, 3) landmarks -> (N, K) angles in degrees between (b - a) and (d - c) for K joint index arrays
+    landmarks = np.asarray(landmarks)
+    return _vector_angles(landmarks[:, b] - landmarks[:, a], landmarks[:, d] - landmarks[:, c])
+
+def extract_features_batch(landmarks):
+    # (N, 21, 3) landmarks -> (N, 5) angles in degrees
+    return joint_angles(landmarks, _A, _B, _C, _D)
+
+def _norm(v):
+    return np.sqrt((v * v).sum(axis=-1, keepdims=True))
+
+def _unit_normal(a, b):
+    # (N, 3) vectors -> (N, 3) unit vector perpendicular to both (np.cross is slow on small inputs)
+    a, b = a.T, b.T
+    normal = np.stack([a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]], axis=1)
+    return normal / _norm(normal)
+
+def palm_size(landmarks):
+    # (N, 21, 3) landmarks -> (N, 1) wrist to middle finger knuckle distance
+    return _norm(landmarks[:, 9] - landmarks[:, 0])
+
+def palm_normal(landmarks):
+    # (N, 21, 3) landmarks -> (N, 3) unit normal of the palm, from the index and pinky knuckles
+    return _unit_normal(landmarks[:, 5] - landmarks[:, 0], landmarks[:, 17] - landmarks[:, 0])
+
+_FINGERS = ["thumb", "index", "middle", "ring", "pinky"]
+_TIPS = [4, 8, 12, 16, 20]
+_PALM_CENTER = -1       # stands for the mean of the wrist and the four knuckles
+
+# angle groups as (names, A, B, C, D) index tables, see joint_angles
+# MCP/DIP angles are 0 for a straight joint, unlike the PIP angles which are 180
+_ANGLE_GROUPS = {
+    "pip": (FEATURE_NAMES, _A, _B, _C, _D),
+    "mcp": (["thumb_mcp", "index_mcp", "middle_mcp", "ring_mcp", "pinky_mcp"],
+            [1, 0, 0, 0, 0], [2, 5, 9, 13, 17], [2, 5, 9, 13, 17], [3, 6, 10, 14, 18]),
+    "dip": (["thumb_ip", "index_dip", "middle_dip", "ring_dip", "pinky_dip"],
+            [2, 6, 10, 14, 18], [3, 7, 11, 15, 19], [3, 7, 11, 15, 19], [4, 8, 12, 16, 20]),
+    # angles between neighbouring fingers' first segments (the thumb's whole length)
+    "spread": (["spread_thumb_index", "spread_index_middle", "spread_middle_ring", "spread_ring_pinky"],
+               [2, 5, 9, 13], [4, 6, 10, 14], [5, 9, 13, 17], [6, 10, 14, 18]),
+}
+# distance groups as (names, from, to) index tables, divided by palm_size
+_DISTANCE_GROUPS = {
+    "tip_distances": ([f"tip_{_FINGERS[i]}_{_FINGERS[j]}" for i in range(5) for j in range(i + 1, 5)],
+                      [_TIPS[i] for i in range(5) for j in range(i + 1, 5)],
+                      [_TIPS[j] for i in range(5) for j in range(i + 1, 5)]),
+    "tip_palm": ([f"tip_palm_{finger}" for finger in _FINGERS], [_PALM_CENTER] * 5, _TIPS),
+}
+
+# group name -> feature names, in the order a FeatureSet lays out its columns
+FEATURE_GROUPS = {name: list(group[0]) for name, group in {**_ANGLE_GROUPS, **_DISTANCE_GROUPS}.items()}
+FEATURE_GROUPS["palm_normal"] = ["palm_normal_x", "palm_normal_y", "palm_normal_z"]
+FEATURE_PRESETS = {"basic": ["pip"], "extended": list(FEATURE_GROUPS)}
+
+def _difference_rows(start, end):
+    # (K, 21) matrix whose product with (21, 3) landmarks gives the K vectors landmarks[end] - landmarks[start]
+    rows = np.zeros((len(start), 21))
+    for row, (a, b) in enumerate(zip(start, end)):
+        if a == _PALM_CENTER:
+            rows[row, [0, 5, 9, 13, 17]] -= 0.2
+        else:
+            rows[row, a] -= 1.0
+        rows[row, b] += 1.0
+    return rows
+
+class FeatureSet:
+    # a selection of FEATURE_GROUPS, precomputed as one difference matrix: a single matmul turns the
+    # landmarks into every vector the selection needs (both sides of every angle, every distance, the
+    # palm size and the palm normal's two edges), so the cost barely depends on how many groups are used
+    def __init__(self, groups=("pip",)):
+        unknown = [group for group in groups if group not in FEATURE_GROUPS]
+        if not groups:
+            raise ValueError("No feature groups given")
+        if unknown:
+            raise ValueError(f"Unknown feature groups {unknown}, expected some of {list(FEATURE_GROUPS)}")
+        self.groups = [group for group in FEATURE_GROUPS if group in groups]
+        self.names = [name for group in self.groups for name in FEATURE_GROUPS[group]]
+        angles = [_ANGLE_GROUPS[group][1:] for group in self.groups if group in _ANGLE_GROUPS]
+        a, b, c, d = [np.concatenate(table) for table in zip(*angles)] if angles else [[]] * 4
+        distances = [_DISTANCE_GROUPS[group][1:] for group in self.groups if group in _DISTANCE_GROUPS]
+        start, end = [np.concatenate(table) for table in zip(*distances)] if distances else [[]] * 2
+        self._angles = len(a)
+        self._distances = len(start)
+        self._palm_normal = "palm_normal" in self.groups
+        # rows: angle first vectors, angle second vectors, distances, palm size, palm normal edges
+        rows = [_difference_rows(a, b), _difference_rows(c, d), _difference_rows(start, end)]
+        if self._distances:
+            rows.append(_difference_rows([0], [9]))
+        if self._palm_normal:
+            rows.append(_difference_rows([0, 0], [5, 17]))
+        self._matrix = np.vstack(rows)
+        self._matrices = {}     # the matrix in each landmark dtype seen so far
+
+    @classmethod
+    def parse(cls, spec):
+        # "basic", "extended" or a comma-separated list of group names
+        return cls(FEATURE_PRESETS.get(spec) or [group.strip() for group in spec.split(",") if group.strip()])
+
+    @classmethod
+    def from_names(cls, names):
+        # the feature set a model's feature names came from (None, for an old model, means basic)
+        if names is None:
+            return cls()
+        feature_set = cls([group for group, group_names in FEATURE_GROUPS.items() if group_names[0] in names])
+        if feature_set.names != list(names):
+            raise ValueError(f"Features {list(names)} don't match any combination of feature groups")
+        return feature_set
+
+    def extract_batch(self, landmarks):
+        # (N, 21, 3) landmarks -> (N, len(self.names)) features
+        landmarks = np.asarray(landmarks)
+        # with +-1 coefficients the products are exact, so the vectors equal plain landmark differences
+        matrix = self._matrices.get(landmarks.dtype)
+        if matrix is None:
+            matrix = self._matrices[landmarks.dtype] = self._matrix.astype(landmarks.dtype)
+        vectors = matrix @ landmarks
+        columns = []
+        k = self._angles
+        if k:
+            columns.append(_vector_angles(vectors[:, :k], vectors[:, k:2 * k]))
+        if self._distances:
+            distances = vectors[:, 2 * k:2 * k + self._distances + 1]
+            lengths = _norm(distances)[..., 0]
+            columns.append(lengths[:, :-1] / lengths[:, -1:])
+        if self._palm_normal:
+            columns.append(_unit_normal(vectors[:, -2], vectors[:, -1]))
+        return columns[0] if len(columns) == 1 else np.concatenate(columns, axis=1)
+
+    def extract(self, landmarks):
+        # single hand: (21, 3) landmarks -> (len(self.names),) features
+        return self.extract_batch(np.asarray(landmarks)[None])[0]
+
+# hand the training samples in mudra_data were recorded with; landmarks of the other hand are
+# mirrored before feature extraction so both hands of a dancer map onto the same mudras
+CANONICAL_HAND = "Right"
+
+def normalize_handedness(landmarks, handedness):
+    # (N, 21, 3) landmarks and N "Left"/"Right" labels -> copy with every non-canonical hand mirrored in x
+    landmarks = np.array(landmarks, copy=True)
+    flip = np.array([hand != CANONICAL_HAND for hand in handedness], dtype=bool)
+    landmarks[flip, :, 0] = 1.0 - landmarks[flip, :, 0]
+    return landmarks
+
+def extract_features(landmarks):
+    # single hand: (21, 3) landmarks -> (5,) angles in degrees
+    return extract_features_batch(np.asarray(landmarks)[None])[0]
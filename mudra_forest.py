@@ -0,0 +1,175 @@
+# Compiles a trained RandomForestClassifier into flat NumPy arrays for fast prediction without sklearn
+#
+# A compiled forest can be exported as a model directory that loads with NumPy alone:
+#   model.json         format version, feature names, class names and tree depth
+#   <array>.npy        one typed array per CompiledForest field, memory-mapped on load
+import argparse
+import json
+import os
+import numpy as np
+
+MODEL_VERSION = 1
+DEFAULT_MODEL = "gesture_classifier.model"
+ARRAYS = ["feature", "threshold", "first_child", "value", "roots"]
+
+class CompiledForest:
+    # all trees' nodes live in one set of flat arrays, indexed globally
+    # nodes are laid out so an internal node's right child directly follows its left child,
+    # and leaves point to themselves with an infinite threshold, so walking max_depth steps
+    # of "first_child + (x > threshold)" from the roots always ends on a leaf
+    def __init__(self, classes, feature, threshold, first_child, value, roots, max_depth):
+        self.classes = np.asarray(classes)
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.first_child = np.asarray(first_child)
+        self.value = np.asarray(value)
+        self.roots = np.asarray(roots)
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _leaves(self, X):
+        # (N, features) -> (N, trees) leaf node index of every sample in every tree
+        # sklearn compares float32 features against float64 thresholds, so the same is done here
+        X = np.asarray(X, dtype=np.float32)
+        flat = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            go_right = flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.first_child[nodes] + go_right
+        return nodes
+
+    def predict_proba(self, X):
+        # reducing over the (non-contiguous) tree axis adds trees one by one in order,
+        # which matches sklearn's accumulation exactly
+        if len(X) == 1:
+            # a single frame with a single hand is the common live case
+            return self.predict_one_proba(X[0])[None]
+        return self.value[self._leaves(X)].sum(axis=1) / self.n_trees
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_one_proba(self, features):
+        # single-sample fast path: walks all trees at once over a (trees,) node vector
+        x = np.asarray(features, dtype=np.float32)
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            nodes = self.first_child[nodes] + (x[self.feature[nodes]] > self.threshold[nodes])
+        return self.value[nodes].sum(axis=0) / self.n_trees
+
+    def predict_one(self, features):
+        return self.classes[np.argmax(self.predict_one_proba(features))]
+
+def _breadth_first_order(tree):
+    # orders nodes so the two children of every internal node are adjacent
+    order = [0]
+    for node in order:
+        if tree.children_left[node] != -1:
+            order.extend([tree.children_left[node], tree.children_right[node]])
+    return np.array(order)
+
+def compile_forest(clf):
+    feature, threshold, first_child, value, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in clf.estimators_:
+        tree = estimator.tree_
+        order = _breadth_first_order(tree)
+        new_index = np.empty(len(order), dtype=np.int64)
+        new_index[order] = np.arange(len(order)) + offset
+        is_leaf = tree.children_left[order] == -1
+        feature.append(np.where(is_leaf, 0, tree.feature[order]))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold[order]))
+        first_child.append(np.where(is_leaf, new_index[order], new_index[tree.children_left[order]]))
+        # class probabilities of each leaf as DecisionTreeClassifier.predict_proba returns them: sklearn
+        # 1.4+ stores them already (dividing again by their sum would change the last bit), older
+        # versions store (weighted) counts and normalize them
+        counts = tree.value[order, 0, :]
+        totals = counts.sum(axis=1, keepdims=True)
+        value.append(counts if np.allclose(totals, 1.0) else counts / totals)
+        roots.append(offset)
+        offset += len(order)
+        max_depth = max(max_depth, tree.max_depth)
+    return CompiledForest(
+        classes=clf.classes_,
+        feature=np.concatenate(feature).astype(np.intp),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        first_child=np.concatenate(first_child).astype(np.intp),
+        value=np.concatenate(value).astype(np.float64),
+        roots=np.array(roots, dtype=np.intp),
+        max_depth=max_depth,
+    )
+
+def save_forest(forest, path=DEFAULT_MODEL, feature_names=None, extra=None):
+    # extra: additional JSON-serializable settings stored in model.json (see read_model_meta)
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(path, f"{name}.npy"), getattr(forest, name))
+    meta = {
+        "version": MODEL_VERSION,
+        "model": "forest",
+        "feature_names": list(feature_names) if feature_names is not None else None,
+        "classes": [str(label) for label in forest.classes],
+        "max_depth": forest.max_depth,
+        "n_trees": forest.n_trees,
+        **(extra or {}),
+    }
+    with open(os.path.join(path, "model.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+def is_model_dir(path):
+    return os.path.isfile(os.path.join(path, "model.json"))
+
+def read_model_meta(path=DEFAULT_MODEL):
+    with open(os.path.join(path, "model.json")) as f:
+        return json.load(f)
+
+def load_forest(path=DEFAULT_MODEL, feature_names=None, mmap=True):
+    # feature_names, if given, must match what the model was trained on
+    meta = read_model_meta(path)
+    if meta["version"] != MODEL_VERSION:
+        raise ValueError(f"Unsupported model version {meta['version']} in '{path}'")
+    if feature_names is not None and meta["feature_names"] is not None and meta["feature_names"] != list(feature_names):
+        raise ValueError(f"Model '{path}' expects features {meta['feature_names']}, got {list(feature_names)}")
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None) for name in ARRAYS}
+    return CompiledForest(classes=np.array(meta["classes"]), max_depth=meta["max_depth"], **arrays)
+
+def load_model(path, feature_names=None):
+    # exported model directory (NumPy only), or a joblib pickle that gets compiled (needs sklearn)
+    if is_model_dir(path):
+        return load_forest(path, feature_names)
+    import joblib
+    return compile_forest(joblib.load(path))
+
+def load_model_and_features(path):
+    # the model plus the mudra_features.FeatureSet it was trained on, read from its feature names
+    # (a .pkl doesn't record them and must use the basic set)
+    from mudra_features import FeatureSet
+    if is_model_dir(path):
+        feature_set = FeatureSet.from_names(read_model_meta(path)["feature_names"])
+        return load_forest(path, feature_set.names), feature_set
+    import joblib
+    clf = joblib.load(path)
+    feature_set = FeatureSet()
+    if clf.n_features_in_ != len(feature_set.names):
+        raise ValueError(f"'{path}' was trained on {clf.n_features_in_} features, export it with "
+                         f"'python mudra_forest.py {path} <model dir> --features ...' and use the model directory")
+    return compile_forest(clf), feature_set
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a trained forest as a NumPy-only model directory")
+    parser.add_argument("pickle", nargs="?", default="gesture_classifier.pkl")
+    parser.add_argument("output", nargs="?", default=DEFAULT_MODEL)
+    parser.add_argument("--features", default="basic", help="feature groups the model was trained with (default: basic)")
+    args = parser.parse_args(argv)
+
+    from mudra_features import FeatureSet
+    save_forest(load_model(args.pickle), args.output, FeatureSet.parse(args.features).names)
+    print(f"Exported '{args.pickle}' to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
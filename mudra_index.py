@@ -0,0 +1,239 @@
+# Nearest-neighbour index over the dataset: closest training samples to a pose, and near-duplicate reports
+#
+# Every sample is reduced to a pose vector: its landmarks relative to the wrist, rotated in the image
+# plane so the wrist -> middle knuckle direction points up, divided by the palm size and flattened
+# (63 values). Hand position, size and in-plane tilt therefore don't count, only the shape of the hand.
+# A KD-tree (scipy's cKDTree) over these vectors answers k-nearest-neighbour queries in microseconds
+# and finds all pairs within a radius for the duplicate report. The index is stored next to the
+# dataset, as <dataset>.index/:
+#   meta.json     format version, dataset path and fingerprint, sample count and class names
+#   vectors.f32   float32 (N, 63) pose vectors
+#   labels.i16    int16 (N,) index into the class names
+#   indices.i32   int32 (N,) sample number within its label
+# The KD-tree itself is rebuilt from vectors.f32 on load (well under a second even for 100k samples), so the
+# index holds no pickles. The fingerprint hashes the name, size and modification time of every sample
+# file (or of the pack's files), and an index whose fingerprint no longer matches is rebuilt: adding,
+# deleting, relabelling or overwriting a sample all change it.
+import argparse
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from mudra_dataset import ARRAYS as PACK_ARRAYS, create_pack, default_data, is_pack, iter_tree, open_pack
+
+INDEX_VERSION = 2
+DUPLICATE_RADIUS = 0.15         # pose vector distance below which two samples count as near-duplicates
+
+ARRAYS = {
+    "vectors": ("vectors.f32", np.float32, (63,)),
+    "labels": ("labels.i16", np.int16, ()),
+    "indices": ("indices.i32", np.int32, ()),
+}
+
+def pose_vectors(landmarks):
+    # (N, 21, 3) landmarks -> (N, 63) position-, scale- and in-plane-rotation-normalized poses
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    points = landmarks - landmarks[:, :1]
+    up = points[:, 9]
+    direction = up[:, :2] / np.linalg.norm(up[:, :2], axis=1, keepdims=True)
+    dx, dy = direction[:, :1], direction[:, 1:]
+    x, y = points[..., 0], points[..., 1]
+    # rotation taking (dx, dy) to (0, -1), image y grows downwards
+    rotated = np.stack([-dy * x + dx * y, -dx * x - dy * y, points[..., 2]], axis=-1)
+    rotated /= np.linalg.norm(up, axis=1)[:, None, None]
+    return rotated.reshape(len(landmarks), -1).astype(np.float32)
+
+def default_index_path(data):
+    return data.rstrip("/\\") + ".index"
+
+def load_dataset_samples(data):
+    # (landmarks, class names, label per sample, sample number per sample) from a pack or a .npy tree
+    if is_pack(data):
+        dataset = open_pack(data)
+        return dataset.landmarks, list(dataset.classes), np.asarray(dataset.labels), np.asarray(dataset.indices)
+    classes, landmarks, labels, indices = [], [], [], []
+    for gesture, path in iter_tree(data):
+        if gesture not in classes:
+            classes.append(gesture)
+        match = re.search(r"_(\d+)\.npy$", path)
+        landmarks.append(np.load(path))
+        labels.append(classes.index(gesture))
+        indices.append(int(match.group(1)) if match else len(indices))
+    return np.array(landmarks).reshape(-1, 21, 3), classes, np.array(labels), np.array(indices)
+
+class NeighborIndex:
+    def __init__(self, path, meta, vectors, labels, indices, tree):
+        self.path = path
+        self.meta = meta
+        self.classes = meta["classes"]
+        self.vectors = vectors
+        self.labels = labels
+        self.indices = indices
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def sample_name(self, row):
+        return f"{self.classes[self.labels[row]]}_{self.indices[row]:03d}"
+
+    def query(self, landmarks, k=5):
+        # (N, 21, 3) landmarks (already mirrored to the canonical hand) -> (N, k) distances and rows
+        k = min(k, len(self))
+        distances, rows = self.tree.query(pose_vectors(landmarks), k=k)
+        return distances.reshape(-1, k), rows.reshape(-1, k)
+
+    def nearest(self, landmarks, k=5):
+        # single hand -> [(sample name, label, distance)] of its k closest samples
+        distances, rows = self.query(np.asarray(landmarks)[None], k)
+        return [(self.sample_name(row), self.classes[self.labels[row]], float(d)) for d, row in zip(distances[0], rows[0])]
+
+    def duplicate_groups(self, radius=DUPLICATE_RADIUS):
+        # groups (lists of rows) of samples linked by pairs closer than radius, largest first
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        pairs = self.tree.query_pairs(radius, output_type="ndarray")
+        graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(self), len(self)))
+        _, component = connected_components(graph, directed=False)
+        sizes = np.bincount(component)
+        rows = np.flatnonzero(sizes[component] > 1)
+        groups = {}
+        for row in rows:
+            groups.setdefault(component[row], []).append(int(row))
+        return sorted(groups.values(), key=lambda group: (-len(group), group[0]))
+
+def dataset_fingerprint(data):
+    # hash of the name, size and modification time (ns) of every file the dataset's samples live in
+    if is_pack(data):
+        paths = [os.path.join(data, "meta.json")] + [os.path.join(data, filename) for filename, _, _ in PACK_ARRAYS.values()]
+    else:
+        paths = [path for _, path in iter_tree(data)]
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.relpath(path, data)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+def _kd_tree(vectors, leafsize=16):
+    import scipy.spatial
+    return scipy.spatial.cKDTree(vectors, leafsize=leafsize)
+
+def build_index(data, path=None, leafsize=16):
+    path = path or default_index_path(data)
+    # taken before reading the samples, so a sample saved while building makes the index stale
+    fingerprint = dataset_fingerprint(data)
+    landmarks, classes, labels, indices = load_dataset_samples(data)
+    vectors = pose_vectors(landmarks)
+    tree = _kd_tree(vectors, leafsize)
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        os.remove(os.path.join(path, "meta.json"))
+    columns = {"vectors": vectors, "labels": labels, "indices": indices}
+    for name, (filename, dtype, _) in ARRAYS.items():
+        np.ascontiguousarray(columns[name], dtype=dtype).tofile(os.path.join(path, filename))
+    if os.path.exists(os.path.join(path, "tree.pkl")):
+        # left behind by the first index version
+        os.remove(os.path.join(path, "tree.pkl"))
+    meta = {"version": INDEX_VERSION, "data": data, "fingerprint": fingerprint, "count": len(vectors), "classes": classes}
+    # meta.json goes last, so an interrupted build is never mistaken for a complete index
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return NeighborIndex(path, meta, vectors, np.asarray(labels, dtype=np.int16), np.asarray(indices, dtype=np.int32), tree)
+
+def read_index_meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+def load_index(path, meta=None):
+    meta = meta or read_index_meta(path)
+    if meta["version"] != INDEX_VERSION:
+        raise ValueError(f"Unsupported index version {meta['version']} in '{path}'")
+    arrays = {name: np.fromfile(os.path.join(path, filename), dtype=dtype).reshape((-1,) + shape)
+              for name, (filename, dtype, shape) in ARRAYS.items()}
+    return NeighborIndex(path, meta, tree=_kd_tree(arrays["vectors"]), **arrays)
+
+def open_index(data=None, path=None):
+    # the dataset's index, (re)built when missing, of another version or out of date
+    data = data or default_data()
+    path = path or default_index_path(data)
+    if os.path.isfile(os.path.join(path, "meta.json")):
+        meta = read_index_meta(path)
+        if meta["version"] == INDEX_VERSION and meta["fingerprint"] == dataset_fingerprint(data):
+            return load_index(path, meta)
+    return build_index(data, path)
+
+def write_pruned_pack(index, data, groups, output):
+    # copies the dataset without the redundant samples: the first sample of each mudra in every duplicate
+    # group stays (samples of different mudras are never dropped for each other, their labels need a look)
+    if os.path.exists(output):
+        raise FileExistsError(f"'{output}' already exists")
+    drop = np.zeros(len(index), dtype=bool)
+    for group in groups:
+        seen = set()
+        for row in group:
+            drop[row] = index.labels[row] in seen
+            seen.add(index.labels[row])
+    keep = ~drop
+    landmarks, classes, labels, indices = load_dataset_samples(data)
+    pack = create_pack(output)
+    timestamps = open_pack(data).timestamps[keep] if is_pack(data) else np.zeros(int(keep.sum()))
+    pack.append_many(np.array(classes)[labels[keep]], landmarks[keep], indices[keep], timestamps)
+    return int(drop.sum())
+
+def print_duplicates(index, groups, radius, limit):
+    redundant = sum(len(group) - 1 for group in groups)
+    print(f"{len(groups)} groups of near-duplicates (pose distance < {radius:g}), "
+          f"{redundant} of {len(index)} samples redundant")
+    mixed = [group for group in groups if len({int(index.labels[row]) for row in group}) > 1]
+    if mixed:
+        print(f"{len(mixed)} groups mix different mudras, check their labels")
+    for group in groups[:limit]:
+        names = [index.sample_name(row) for row in group]
+        flag = "  (mixed labels)" if group in mixed else ""
+        print(f"  {len(group):>3}: {', '.join(names[:8])}{' ...' if len(names) > 8 else ''}{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nearest-neighbour index over the mudra dataset")
+    parser.add_argument("--data", default=None, help="mudra_data folder or packed dataset (default: mudra_data.pack if present, else mudra_data)")
+    parser.add_argument("--index", default=None, help="index directory (default: <data>.index)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="build or rebuild the index")
+    query_parser = subparsers.add_parser("query", help="closest samples to a sample or a .npy file")
+    query_parser.add_argument("sample", help="<label>_### of a dataset sample, or a path to a (21, 3) .npy file")
+    query_parser.add_argument("-k", type=int, default=5, help="neighbours to list (default: 5)")
+    duplicates_parser = subparsers.add_parser("duplicates", help="report near-duplicate samples")
+    duplicates_parser.add_argument("--radius", type=float, default=DUPLICATE_RADIUS,
+                                   help=f"pose distance below which samples are duplicates (default: {DUPLICATE_RADIUS})")
+    duplicates_parser.add_argument("--limit", type=int, default=20, help="groups to list (default: 20)")
+    duplicates_parser.add_argument("--write-pack", default=None, metavar="PACK",
+                                   help="write a copy of the dataset that keeps one sample per group")
+    args = parser.parse_args(argv)
+
+    data = args.data or default_data()
+    if args.command == "build":
+        index = build_index(data, args.index)
+        print(f"Indexed {len(index)} samples of '{data}' in '{index.path}'")
+        return
+    index = open_index(data, args.index)
+    if args.command == "query":
+        if os.path.isfile(args.sample):
+            landmarks = np.load(args.sample)
+        else:
+            names = [index.sample_name(row) for row in range(len(index))]
+            if args.sample not in names:
+                parser.error(f"no sample '{args.sample}' in '{data}'")
+            landmarks = load_dataset_samples(data)[0][names.index(args.sample)]
+        for name, label, distance in index.nearest(landmarks, args.k):
+            print(f"  {name:<24} {label:<16} {distance:.4f}")
+    else:
+        groups = index.duplicate_groups(args.radius)
+        print_duplicates(index, groups, args.radius, args.limit)
+        if args.write_pack:
+            if os.path.exists(args.write_pack):
+                parser.error(f"'{args.write_pack}' already exists")
+            dropped = write_pruned_pack(index, data, groups, args.write_pack)
+            print(f"Wrote '{args.write_pack}' without {dropped} redundant samples")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# Per-stage latency instrumentation for the recognizer loops
+#
+# Every stage (capture, colour conversion, hands.process, features, prediction, rendering, ...) is
+# timed with the monotonic perf_counter clock and recorded into a fixed-size ring buffer, so
+# recording a span is O(1) and allocation-free. Percentiles (p50/p95/p99 over the most recent
+# samples) are only computed when someone asks for them: the on-screen overlay, the exit summary,
+# or an exporter writing Prometheus text to a file or serving it on a local /metrics endpoint.
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class StageTimes:
+    # running average and rolling percentiles of each stage's time, shared by all pipeline threads
+    def __init__(self, smoothing=0.1, window=1024):
+        self.smoothing = smoothing
+        self.window = window                # samples per stage the percentiles are computed over
+        self.averages = {}                  # stage -> exponential moving average in milliseconds
+        self.counts = {}
+        self.totals = {}                    # stage -> total seconds, for Prometheus _sum
+        self._samples = {}                  # stage -> (window,) ring buffer of seconds
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        ms = seconds * 1000.0
+        with self._lock:
+            previous = self.averages.get(stage)
+            self.averages[stage] = ms if previous is None else previous + self.smoothing * (ms - previous)
+            count = self.counts.get(stage, 0)
+            if count == 0:
+                self._samples[stage] = np.zeros(self.window)
+                self.totals[stage] = 0.0
+            self._samples[stage][count % self.window] = seconds
+            self.counts[stage] = count + 1
+            self.totals[stage] += seconds
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def summary(self):
+        with self._lock:
+            return " | ".join(f"{stage} {ms:.1f}ms" for stage, ms in self.averages.items())
+
+    def snapshot(self):
+        # stage -> count, total seconds and p50/p95/p99 in seconds over the last `window` samples
+        with self._lock:
+            recent = {stage: samples[:min(self.counts[stage], self.window)].copy()
+                      for stage, samples in self._samples.items()}
+            counts, totals = dict(self.counts), dict(self.totals)
+        return {stage: {"count": counts[stage], "sum": totals[stage],
+                        "quantiles": dict(zip(QUANTILES, np.quantile(samples, QUANTILES).tolist()))}
+                for stage, samples in recent.items()}
+
+    def percentile_lines(self):
+        # one "stage  p50 / p95 / p99" line per stage, for the overlay and the exit summary
+        return [f"{stage:<18} p50 {q[0.5] * 1000:6.1f}  p95 {q[0.95] * 1000:6.1f}  p99 {q[0.99] * 1000:6.1f} ms"
+                for stage, q in ((stage, s["quantiles"]) for stage, s in self.snapshot().items())]
+
+    def prometheus_text(self, prefix="mudra"):
+        name = f"{prefix}_stage_latency_seconds"
+        lines = [f"# HELP {name} Time spent in each recognizer stage, quantiles over the most recent frames.",
+                 f"# TYPE {name} summary"]
+        for stage, s in self.snapshot().items():
+            label = stage.replace("\\", "\\\\").replace('"', '\\"')
+            for quantile, value in s["quantiles"].items():
+                lines.append(f'{name}{{stage="{label}",quantile="{quantile}"}} {value:.6g}')
+            lines.append(f'{name}_sum{{stage="{label}"}} {s["sum"]:.6g}')
+            lines.append(f'{name}_count{{stage="{label}"}} {s["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Prometheus text, or JSON for a .json path; replaced atomically so readers never see half a file
+        if path.endswith(".json"):
+            content = json.dumps({stage: {"count": s["count"], "sum": s["sum"],
+                                          "quantiles": {str(q): v for q, v in s["quantiles"].items()}}
+                                  for stage, s in self.snapshot().items()}, indent=2)
+        else:
+            content = self.prometheus_text()
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+class MetricsExporter:
+    # writes the metrics file every `interval` seconds and/or serves them at http://<host>:<port>/metrics
+    def __init__(self, times, path=None, port=None, interval=5.0, host="127.0.0.1"):
+        self.times = times
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.host = host
+        self._server = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.path is not None:
+            self._threads.append(threading.Thread(target=self._write_loop, daemon=True))
+        if self.port is not None:
+            times = self.times
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = times.prometheus_text().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self._threads.append(threading.Thread(target=self._server.serve_forever, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self.times.write(self.path)
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        # the final numbers always make it to the file
+        if self.path is not None:
+            self.times.write(self.path)
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-file", default=None,
+                        help="write per-stage latency percentiles to this file every few seconds (Prometheus text, or JSON for *.json)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve per-stage latency percentiles at http://127.0.0.1:PORT/metrics")
+
+def start_exporter(times, args):
+    # returns a started MetricsExporter, or None when neither export option was given
+    if args.metrics_file is None and args.metrics_port is None:
+        return None
+    return MetricsExporter(times, args.metrics_file, args.metrics_port).start()
@@ -0,0 +1,65 @@
+# Motion gating: reuse the last detection/prediction while the hand holds still
+#
+# Dancers hold a mudra for many frames. The gate compares each new frame (downscaled to a tiny
+# grayscale thumbnail) and each new set of landmarks against the last one that was actually
+# processed, and reports whether the expensive step needs to run again. A forced refresh every
+# few frames keeps slow drift from being ignored forever.
+import cv2
+import numpy as np
+
+class MotionGate:
+    def __init__(self, frame_threshold=3.0, landmark_threshold=0.01, refresh_interval=15, thumbnail_size=(32, 24)):
+        self.frame_threshold = frame_threshold          # mean absolute thumbnail difference (0-255 scale)
+        self.landmark_threshold = landmark_threshold    # largest landmark displacement (normalized image units)
+        self.refresh_interval = refresh_interval        # frames after which a step always runs again
+        self.thumbnail_size = thumbnail_size
+        self._thumbnail = None
+        # scratch thumbnails reused every frame (cv2 fills a dst of the right size instead of allocating)
+        self._small = None
+        self._gray = None
+        self._diff = None
+        self._landmarks = None
+        self._detect_age = 0
+        self._classify_age = 0
+        self.frames = 0
+        self.detections_skipped = 0
+        self.classifications = 0
+        self.classifications_skipped = 0
+
+    def should_detect(self, frame):
+        # True when the frame differs enough from the last detected one to rerun hand detection
+        self.frames += 1
+        self._small = cv2.resize(frame, self.thumbnail_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        gray = self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        self._detect_age += 1
+        if self._thumbnail is not None and self._detect_age < self.refresh_interval:
+            self._diff = cv2.absdiff(gray, self._thumbnail, dst=self._diff)
+            if self._diff.mean() < self.frame_threshold:
+                self.detections_skipped += 1
+                return False
+        # the new thumbnail is kept, the old one becomes the next frame's scratch
+        self._thumbnail, self._gray = gray, self._thumbnail
+        self._detect_age = 0
+        return True
+
+    def should_classify(self, landmarks):
+        # True when the hands have moved enough since the last classified landmarks
+        # (a (21, 3) array for one hand or (N, 21, 3) for several, a change in hand count always counts)
+        self.classifications += 1
+        self._classify_age += 1
+        if (self._landmarks is not None and self._classify_age < self.refresh_interval
+                and np.shape(landmarks) == self._landmarks.shape
+                and np.abs(landmarks - self._landmarks).max() < self.landmark_threshold):
+            self.classifications_skipped += 1
+            return False
+        self._landmarks = np.array(landmarks, copy=True)
+        self._classify_age = 0
+        return True
+
+    def reset_landmarks(self):
+        # forget the last classified hand, e.g. after it left the frame
+        self._landmarks = None
+
+    def summary(self):
+        return (f"detection skipped on {self.detections_skipped}/{self.frames} frames, "
+                f"classification skipped on {self.classifications_skipped}/{self.classifications} hands")
@@ -0,0 +1,255 @@
+# Threaded capture -> detection -> classification pipeline for the live recognizer
+#
+# The capture thread reads frames, the detection thread runs MediaPipe Hands on them and the
+# caller's thread classifies and renders the results. Stages are connected by small queues that
+# drop the oldest item when full, so a slow stage always picks up the freshest frame instead of
+# working through a backlog.
+#
+# Frames stay unmirrored until they are rendered: the detection stage reports landmarks already
+# mirrored (see mudra_roi.HandDetector) and render_frame flips the image in place for display.
+#
+# With a mudra_scheduler.FrameScheduler, the detection stage reports each frame's processing time to
+# it and follows its current level: detection on every n-th frame only (the others reuse the last
+# hands, like with the motion gate), a smaller search width and hand region, and MediaPipe's lite
+# model. A camera that fails to deliver frames is retried with growing waits (CaptureBackoff) and
+# given up on after a few seconds instead of being polled in a busy loop.
+#
+# Frames are read into a mudra_buffers.FramePool and landmarks written into a ring of preallocated
+# arrays, so a packet's frame and landmarks are only valid until the next packet is taken from
+# results(); copy them to keep them longer.
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+import cv2
+import mediapipe as mp
+import numpy as np
+from mudra_buffers import FramePool
+from mudra_metrics import StageTimes
+from mudra_roi import HandDetector
+from mudra_scheduler import CaptureBackoff
+
+mp_hands = mp.solutions.hands
+
+class LatestQueue:
+    # bounded queue with a drop-oldest policy
+    def __init__(self, maxsize=1, on_drop=None):
+        self._queue = queue.Queue(maxsize)
+        self.on_drop = on_drop          # called with each dropped item, e.g. to recycle its buffers
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    dropped = self._queue.get_nowait()
+                    self.dropped += 1
+                    if self.on_drop is not None and dropped is not None:
+                        self.on_drop(dropped)
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+@dataclass
+class FramePacket:
+    index: int
+    timestamp: float
+    frame: np.ndarray
+    captured_at: float = 0.0                             # perf_counter() when the frame was read, for end-to-end latency
+    # filled in by the detection stage
+    landmarks: list = field(default_factory=list)        # (21, 3) mirrored frame-normalized float32 arrays, one per hand
+    handedness: list = field(default_factory=list)       # "Left"/"Right" for each entry in landmarks
+    reused: bool = False                                 # detection was skipped and copied from the last frame
+
+def draw_landmarks(frame, landmarks):
+    # draws one hand's (21, 3) normalized landmarks onto the (already mirrored) frame
+    height, width = frame.shape[:2]
+    points = [(int(x * width), int(y * height)) for x, y, _ in landmarks]
+    for start, end in mp_hands.HAND_CONNECTIONS:
+        cv2.line(frame, points[start], points[end], (255, 255, 255), 2)
+    for point in points:
+        cv2.circle(frame, point, 4, (0, 0, 255), -1)
+
+def mirror_frame(frame):
+    # selfie view for display, flipped in place so no extra full-frame copy is made
+    return cv2.flip(frame, 1, dst=frame)
+
+def open_source(source):
+    # camera index (int or digit string) or path to a video file
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source), not isinstance(source, int)
+
+class RecognizerPipeline:
+    def __init__(self, source=1, max_num_hands=1, queue_size=1, pace_files=True,
+                 min_detection_confidence=0.7, min_tracking_confidence=0.7, motion_gate=None,
+                 use_roi=True, roi_size=256, search_width=640, scheduler=None):
+        self.cap, self.is_file = open_source(source)
+        # optional MotionGate, detection is skipped on frames it considers unchanged
+        self.motion_gate = motion_gate
+        # optional FrameScheduler, adapts detection frequency, resolution and model to the CPU budget
+        self.scheduler = scheduler
+        self.backoff = CaptureBackoff()
+        self.capture_failed = False     # the camera stopped delivering frames
+        self.hands_options = dict(max_num_hands=max_num_hands, model_complexity=1,
+                                  min_detection_confidence=min_detection_confidence,
+                                  min_tracking_confidence=min_tracking_confidence)
+        self.detector_options = dict(use_roi=use_roi, roi_size=roi_size, search_width=search_width)
+        self.detector = None
+        self.hands_init_time = None     # seconds spent creating mp_hands.Hands, once the thread has started
+        # video files are played back at their own frame rate so they behave like a camera
+        self.frame_interval = 0.0
+        if self.is_file and pace_files:
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            self.frame_interval = 1.0 / fps if fps > 0 else 0.0
+        # frames in flight: one per queue slot, plus the one each stage is working on and the one
+        # being read; the landmark ring has a (max hands, 21, 3) array for each of them
+        in_flight = 2 * queue_size + 4
+        self.frame_pool = FramePool(in_flight)
+        self._landmark_ring = np.empty((in_flight, max_num_hands, 21, 3), dtype=np.float32)
+        self.captured = LatestQueue(queue_size, on_drop=self.release)
+        self.detected = LatestQueue(queue_size, on_drop=self.release)
+        self.times = StageTimes()
+        self.frames_captured = 0
+        self.frames_detected = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                         threading.Thread(target=self._detect_loop, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self.cap.release()
+
+    def release(self, packet):
+        # the packet's frame goes back to the pool
+        self.frame_pool.release(packet.frame)
+
+    def results(self):
+        # yields detected frames in the caller's thread until the source ends or stop() is called;
+        # each packet is released when the next one is requested
+        previous = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    packet = self.detected.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if previous is not None:
+                    self.release(previous)
+                    previous = None
+                if packet is None:
+                    return
+                yield packet
+                previous = packet
+        finally:
+            if previous is not None:
+                self.release(previous)
+
+    def _capture_loop(self):
+        index = 0
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            # read into a free pooled frame; OpenCV allocates a new one when there is none or the size changed
+            buffer = self.frame_pool.acquire()
+            ret, frame = self.cap.read(buffer) if buffer is not None else self.cap.read()
+            if not ret:
+                if buffer is not None:
+                    self.frame_pool.release(buffer)
+                if self.is_file:
+                    break
+                if not self.backoff.failed():
+                    self.capture_failed = True
+                    break
+                continue
+            self.backoff.succeeded()
+            if frame is not buffer:
+                self.frame_pool.adopt(frame)
+                if buffer is not None:
+                    self.frame_pool.release(buffer)
+            self.times.add("capture", time.perf_counter() - start)
+            self.captured.put(FramePacket(index, time.time(), frame, start))
+            self.frames_captured += 1
+            index += 1
+            if self.frame_interval:
+                next_time += self.frame_interval
+                time.sleep(max(0.0, next_time - time.perf_counter()))
+        self.captured.put(None)
+
+    def _detect_loop(self):
+        # the Hands graph lives in this thread for its whole lifetime
+        start = time.perf_counter()
+        hands = mp_hands.Hands(**self.hands_options)
+        self.hands_init_time = time.perf_counter() - start
+        self.detector = HandDetector(hands, times=self.times, max_hands=self.hands_options["max_num_hands"],
+                                     **self.detector_options)
+        last = None
+        level = None
+        slot = 0
+        try:
+            while not self._stop.is_set():
+                try:
+                    packet = self.captured.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if packet is None:
+                    break
+                if self.scheduler is not None and self.scheduler.level != level:
+                    level = self.scheduler.level
+                    self._apply_level(level)
+                start = time.perf_counter()
+                out = self._landmark_ring[slot]
+                slot = (slot + 1) % len(self._landmark_ring)
+                skip = self.scheduler is not None and not self.scheduler.should_detect()
+                if not skip and self.motion_gate is not None:
+                    skip = not self.motion_gate.should_detect(packet.frame)
+                if skip and last is not None:
+                    # last's ring slot is reused further on while this packet may still be shown, so its hands are copied
+                    count = len(last.landmarks)
+                    out[:count] = last_out[:count]
+                    packet.landmarks, packet.handedness, packet.reused = list(out[:count]), last.handedness, True
+                    self._detected(packet, "detect (skipped)", start)
+                    continue
+                packet.landmarks = self.detector.detect(packet.frame, out)
+                packet.handedness = self.detector.handedness
+                last, last_out = packet, out
+                self._detected(packet, "detect", start)
+                self.frames_detected += 1
+        finally:
+            self.detector.hands.close()
+            self.detected.put(None)
+
+    def _detected(self, packet, stage, start):
+        elapsed = time.perf_counter() - start
+        self.times.add(stage, elapsed)
+        if self.scheduler is not None:
+            self.scheduler.record(elapsed)
+        self.detected.put(packet)
+
+    def _apply_level(self, level):
+        # the search width and hand region shrink with the level's scale, and the Hands graph is
+        # rebuilt when its model changes (not counted as frame processing time)
+        search_width, roi_size = self.detector_options["search_width"], self.detector_options["roi_size"]
+        self.detector.search_width = None if search_width is None else round(search_width * level.scale)
+        self.detector.roi_size = round(roi_size * level.scale)
+        if level.model_complexity != self.hands_options["model_complexity"]:
+            self.hands_options["model_complexity"] = level.model_complexity
+            self.detector.hands.close()
+            self.detector.hands = mp_hands.Hands(**self.hands_options)
+            self.detector.reset()
@@ -0,0 +1,82 @@
+# Everything the live recognizer does with a frame's hands after detection: hand tracking, feature
+# extraction, the classifier and label smoothing
+#
+# live_mudra_recognizer.py feeds it the pipeline's packets, replay_mudra.py feeds it stored
+# landmarks, so what is measured offline is exactly what runs live.
+from dataclasses import dataclass
+import numpy as np
+from mudra_cascade import REJECT_LABEL
+from mudra_features import normalize_handedness
+from mudra_metrics import StageTimes
+from mudra_smoothing import HandStabilizers
+from mudra_temporal import TemporalWindow, frame_features_batch
+
+@dataclass
+class FrameResult:
+    track_ids: list         # stabilizer track of each hand
+    proba: object           # (hands, classes) class probabilities, None without hands
+    labels: list            # smoothed label of each hand, None while it is still undecided, REJECT_LABEL when unsure
+    closed: list            # (track id, Segment) for every mudra that stopped being held this frame
+
+class FrameRecognizer:
+    def __init__(self, forest, feature_set=None, temporal_window=None, motion_gate=None, times=None,
+                 **stabilizer_options):
+        self.forest = forest
+        self.feature_set = feature_set              # mudra_features.FeatureSet of a per-frame model
+        self.temporal_window = temporal_window      # frames per window of a temporal model, instead of feature_set
+        self.motion_gate = motion_gate              # optional MotionGate, predictions are reused while hands hold still
+        self.times = times if times is not None else StageTimes()
+        # with a CascadeForest, hands whose averaged (calibrated) confidence is below its reject_below
+        # are labelled REJECT_LABEL instead of their leading mudra
+        self.reject_below = getattr(forest, "reject_below", 0.0)
+        self.stabilizer_options = stabilizer_options
+        self.reset()
+
+    def reset(self):
+        # forgets every hand, e.g. between unrelated recordings
+        # (smooths each hand's per-frame probabilities so its label doesn't flicker between similar mudras)
+        self.stabilizers = HandStabilizers(self.forest.classes, **self.stabilizer_options)
+        self._windows = {}          # track id -> TemporalWindow of that hand's recent frames
+        self._proba = None
+
+    def process(self, landmarks, handedness, timestamp):
+        # one frame's (21, 3) mirrored hands with their "Left"/"Right" labels -> FrameResult
+        track_ids = self.stabilizers.assign(landmarks, handedness)
+        if not len(landmarks):
+            self._proba = None
+            if self.motion_gate is not None:
+                self.motion_gate.reset_landmarks()
+        elif self.temporal_window:
+            # every frame extends each hand's window, and the window features are updated in O(1)
+            with self.times.span("features"):
+                frame_features = frame_features_batch(normalize_handedness(np.array(landmarks), handedness))
+                features = np.array([self._windows.setdefault(track_id, TemporalWindow(self.temporal_window)).push(f, timestamp)
+                                     for track_id, f in zip(track_ids, frame_features)])
+            with self.times.span("predict"):
+                self._proba = self.forest.predict_proba(features)
+        else:
+            landmarks = np.array(landmarks)
+            # with a motion gate the previous predictions are reused while the hands hold still
+            if self.motion_gate is None or self._proba is None or self.motion_gate.should_classify(landmarks):
+                # left hands are mirrored onto the right hand the samples were recorded with, then
+                # every hand in the frame goes through feature extraction and the classifier at once
+                with self.times.span("features"):
+                    features = self.feature_set.extract_batch(normalize_handedness(landmarks, handedness))
+                with self.times.span("predict"):
+                    self._proba = self.forest.predict_proba(features)
+        closed = self.stabilizers.update_tracks(track_ids, self._proba, timestamp)
+        if self.temporal_window:
+            for track_id in [t for t in self._windows if t not in self.stabilizers.tracks]:
+                del self._windows[track_id]
+        labels = [self.label(track_id) for track_id in track_ids]
+        return FrameResult(track_ids, self._proba, labels, closed)
+
+    def label(self, track_id):
+        stabilizer = self.stabilizers.tracks[track_id][0]
+        if stabilizer.label is not None and stabilizer.average.max() < self.reject_below:
+            return REJECT_LABEL
+        return stabilizer.label
+
+    def flush(self):
+        # closes every open segment, e.g. when the stream ends
+        return self.stabilizers.flush()
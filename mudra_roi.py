@@ -0,0 +1,115 @@
+# Region-of-interest tracking and resolution control in front of MediaPipe Hands
+#
+# After the first detection only a square crop around the previous hand (plus a margin) is
+# downscaled and handed to MediaPipe. Landmarks are mapped back to full-frame coordinates, and the
+# selfie-view mirroring is applied to the landmark x coordinates instead of flipping every frame.
+# When the hand is lost in the crop, the same frame is searched again at full view.
+#
+# MediaPipe labels handedness assuming a mirrored (selfie) image. Frames here are never flipped, so
+# with mirror set (landmarks reported as if the frame was flipped) the label is swapped to match the
+# mirrored landmarks, like recording from a flipped frame does. Without mirror, landmarks stay as the
+# camera saw them and MediaPipe's label already describes them, so it is kept. Either way
+# mudra_features.normalize_handedness brings the hand to the same canonical pose.
+#
+# The resized crop and its RGB conversion are written into a reused scratch buffer, and landmarks go
+# straight into one float32 (max hands, 21, 3) array, so a frame allocates nothing frame-sized.
+import time
+import cv2
+import numpy as np
+from mudra_buffers import ScratchBuffer
+
+class HandDetector:
+    def __init__(self, hands, mirror=True, use_roi=True, margin=0.3, roi_size=256, search_width=640,
+                 full_search_interval=30, times=None, max_hands=2):
+        self.hands = hands                              # a mp_hands.Hands instance
+        self.max_hands = max_hands                      # its max_num_hands, the rows of the landmark array
+        self.mirror = mirror                            # report landmarks as if the frame was flipped horizontally
+        self.use_roi = use_roi
+        self.margin = margin                            # extra space around the hand, as a fraction of its size
+        self.roi_size = roi_size                        # longest side of the crop handed to MediaPipe
+        self.search_width = search_width                # width full frames are downscaled to (None keeps them as is)
+        self.full_search_interval = full_search_interval  # look at the full frame now and then for new hands
+        self.times = times                              # optional mudra_metrics.StageTimes for the steps below
+        self.bbox = None                                # (x0, y0, x1, y1) around the last hands, unmirrored pixels
+        self.handedness = []                            # "Left"/"Right" for each hand returned by the last detect()
+        self._roi_streak = 0
+        self._resized = ScratchBuffer()
+        self._rgb = ScratchBuffer()
+        self.roi_frames = 0
+        self.full_frames = 0
+
+    def reset(self):
+        self.bbox = None
+        self._roi_streak = 0
+
+    def _roi(self, width, height):
+        x0, y0, x1, y1 = self.bbox
+        size = max(x1 - x0, y1 - y0) * (1 + 2 * self.margin)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        return (max(0, int(cx - size / 2)), max(0, int(cy - size / 2)),
+                min(width, int(cx + size / 2) + 1), min(height, int(cy + size / 2) + 1))
+
+    def _process(self, frame, region, limit, out):
+        # limit is the longest side the region may have when handed to MediaPipe; the hands found are
+        # written to out, returns their count and handedness
+        x0, y0, x1, y1 = region
+        crop = frame[y0:y1, x0:x1]
+        scale = 1.0 if limit is None else min(1.0, limit / max(crop.shape[:2]))
+        start = time.perf_counter()
+        if scale < 1.0:
+            size = (max(1, round(crop.shape[1] * scale)), max(1, round(crop.shape[0] * scale)))
+            crop = cv2.resize(crop, size, dst=self._resized.view((size[1], size[0], 3)), interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=self._rgb.view(crop.shape))
+        converted = time.perf_counter()
+        results = self.hands.process(rgb)
+        if self.times is not None:
+            self.times.add("resize + convert", converted - start)
+            self.times.add("hands.process", time.perf_counter() - converted)
+        handedness = []
+        for hand_landmarks, classification in zip(results.multi_hand_landmarks or [], results.multi_handedness or []):
+            if len(handedness) == len(out):
+                break
+            out[len(handedness)] = [(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark]
+            label = classification.classification[0].label
+            handedness.append(("Right" if label == "Left" else "Left") if self.mirror else label)
+        count = len(handedness)
+        if count:
+            # crop-normalized -> frame-normalized, in place; z follows the x scale in MediaPipe
+            height, width = frame.shape[:2]
+            hands = out[:count]
+            hands[..., 0] *= (x1 - x0) / width
+            hands[..., 0] += x0 / width
+            hands[..., 1] *= (y1 - y0) / height
+            hands[..., 1] += y0 / height
+            hands[..., 2] *= (x1 - x0) / width
+        return count, handedness
+
+    def detect(self, frame, out=None):
+        # frame is the unmirrored BGR camera image, returns a list of (21, 3) frame-normalized landmarks;
+        # they are views into out, a float32 (max hands, 21, 3) array (a new one per call when not given)
+        if out is None:
+            out = np.empty((self.max_hands, 21, 3), dtype=np.float32)
+        height, width = frame.shape[:2]
+        count, handedness = 0, []
+        tracking = (self.use_roi and self.bbox is not None
+                    and self._roi_streak < self.full_search_interval)
+        if tracking:
+            count, handedness = self._process(frame, self._roi(width, height), self.roi_size, out)
+            self.roi_frames += 1
+            self._roi_streak += 1
+        if not count:
+            limit = None if self.search_width is None else self.search_width * max(width, height) / width
+            count, handedness = self._process(frame, (0, 0, width, height), limit, out)
+            self.full_frames += 1
+            self._roi_streak = 0
+
+        hands = out[:count]
+        if count:
+            self.bbox = (hands[..., 0].min() * width, hands[..., 1].min() * height,
+                         hands[..., 0].max() * width, hands[..., 1].max() * height)
+        else:
+            self.bbox = None
+        if self.mirror:
+            np.subtract(1.0, hands[..., 0], out=hands[..., 0])
+        self.handedness = handedness
+        return list(hands)
@@ -1,5 +1,7 @@
 # Outlines rules for identifying each gesture (rule-based classification approach)
+from functools import lru_cache
 import numpy as np
+from mudra_features import joint_angles
 
 # MediaPipe’s hand landmark reference:
 # 0: wrist
@@ -9,151 +11,153 @@ import numpy as np
 # 13–16: ring (tip is 16)
 # 17–20: pinky (tip is 20)
 
+# every angle the rules need, as the angle between (B - A) and (D - C)
+# "straight" compares the finger segment with the wrist direction, "bend" is the angle at the PIP joint
+ANGLES = {
+    "index_straight": (6, 0, 8, 6),
+    "middle_straight": (10, 0, 12, 10),
+    "ring_straight": (14, 0, 16, 14),
+    "pinky_straight": (18, 0, 20, 18),
+    "index_bend": (6, 5, 8, 6),
+    "middle_bend": (10, 9, 12, 10),
+    "ring_bend": (14, 13, 16, 14),
+    "pinky_bend": (18, 17, 20, 18),
+    "thumb": (0, 2, 2, 4),
+}
+
+# z-depth of a tip relative to its PIP joint (negative means the tip is more inward)
+DEPTHS = {
+    "ring_tip_depth": (16, 14),
+}
+
+# a rule is a list of clauses that must all hold, a clause is a tuple of (quantity, op, threshold)
+# conditions of which at least one must hold
+# "<=" and ">=" are evaluated as "not >" and "not <" so they behave like the original "fail if" checks
+def _pataka_rule(angle_thresh=25):
+    return [
+        (("index_straight", "<=", angle_thresh),),
+        (("middle_straight", "<=", angle_thresh),),
+        (("ring_straight", "<=", angle_thresh),),
+        (("pinky_straight", "<=", angle_thresh),),
+        # ensure thumb is not sticking out
+        (("thumb", ">", 20),),
+        (("thumb", "<", 80),),
+    ]
+
+RULES = {
+    "pataka": _pataka_rule(),
+    "tripataka": [
+        # ring finger bent at the PIP joint or its tip pushed inward
+        (("ring_bend", ">=", 10), ("ring_tip_depth", "<", -0.01)),
+        # since it's kind of similar to pataka gesture, the rest matches a looser pataka
+        (("index_straight", "<=", 35),),
+        (("middle_straight", "<=", 35),),
+        (("pinky_straight", "<=", 35),),
+        (("thumb", ">", 20),),
+        (("thumb", "<", 80),),
+    ],
+    "ardhapataka": [
+        # index and middle fingers should be straight
+        (("index_straight", "<=", 25),),
+        (("middle_straight", "<=", 25),),
+        # ring and pinky fingers should be bent
+        (("ring_bend", ">=", 25),),
+        (("pinky_bend", ">=", 25),),
+        # thumb should be slightly bent
+        (("thumb", ">", 20),),
+        (("thumb", "<", 60),),
+    ],
+    "mushti": [
+        # basically a fist so all fingers should be bent
+        (("index_bend", ">", 40),),
+        (("middle_bend", ">", 40),),
+        (("ring_bend", ">", 40),),
+        (("pinky_bend", ">", 40),),
+        (("thumb", ">", 40),),
+        (("thumb", "<", 100),),
+    ],
+}
+
+# (compare with "<" instead of ">", negate result) for each op
+_OPS = {"<": (True, False), ">": (False, False), "<=": (False, True), ">=": (True, True)}
+
+class RuleEngine:
+    # compiles the rules into flat predicate arrays so all mudras are checked with a fixed number of numpy calls
+    def __init__(self, rules=RULES):
+        self.names = list(rules)
+        used = {q for rule in rules.values() for clause in rule for q, _, _ in clause}
+        self.angle_names = [name for name in ANGLES if name in used]
+        self.depth_names = [name for name in DEPTHS if name in used]
+        unknown = used - set(self.angle_names) - set(self.depth_names)
+        if unknown:
+            raise ValueError(f"Unknown rule quantities: {sorted(unknown)}")
+
+        joints = np.array([ANGLES[name] for name in self.angle_names], dtype=int).reshape(-1, 4)
+        self._a, self._b, self._c, self._d = joints.T
+        depths = np.array([DEPTHS[name] for name in self.depth_names], dtype=int).reshape(-1, 2)
+        self._tips, self._pips = depths.T
+        row = {name: i for i, name in enumerate(self.angle_names + self.depth_names)}
+
+        quantity, threshold, use_lt, negate, clause_starts, rule_starts = [], [], [], [], [], []
+        for rule in rules.values():
+            rule_starts.append(len(clause_starts))
+            for clause in rule:
+                clause_starts.append(len(quantity))
+                for q, op, value in clause:
+                    quantity.append(row[q])
+                    threshold.append(value)
+                    use_lt.append(_OPS[op][0])
+                    negate.append(_OPS[op][1])
+
+        self._quantity = np.array(quantity, dtype=int)
+        self._threshold = np.array(threshold, dtype=np.float64)[:, None]
+        self._use_lt = np.array(use_lt)[:, None]
+        self._negate = np.array(negate)[:, None]
+        self._clause_starts = np.array(clause_starts, dtype=int)
+        self._rule_starts = np.array(rule_starts, dtype=int)
+
+    def quantities(self, landmarks):
+        # (N, 21, 3) landmarks -> (Q, N) table with every angle and depth the rules use, computed once
+        landmarks = np.asarray(landmarks)
+        angles = joint_angles(landmarks, self._a, self._b, self._c, self._d).T
+        depths = (landmarks[:, self._tips, 2] - landmarks[:, self._pips, 2]).T
+        return np.concatenate([angles, depths.astype(np.float64)])
+
+    def evaluate(self, landmarks):
+        # (N, 21, 3) -> (mudras, N) boolean matrix, a single (21, 3) hand -> (mudras,) boolean vector
+        landmarks = np.asarray(landmarks)
+        single = landmarks.ndim == 2
+        if single:
+            landmarks = landmarks[None]
+        values = self.quantities(landmarks)[self._quantity]
+        passed = np.where(self._use_lt, values < self._threshold, values > self._threshold) ^ self._negate
+        clauses = np.logical_or.reduceat(passed, self._clause_starts, axis=0)
+        result = np.logical_and.reduceat(clauses, self._rule_starts, axis=0)
+        return result[:, 0] if single else result
+
+    def check(self, name, landmarks):
+        return bool(self.evaluate(landmarks)[self.names.index(name)])
+
+ENGINE = RuleEngine()
+
+def evaluate_mudras(landmarks):
+    # returns {mudra: bool} for one hand, or {mudra: (N,) bool array} for a batch
+    return dict(zip(ENGINE.names, ENGINE.evaluate(landmarks)))
+
+@lru_cache(maxsize=None)
+def _pataka_engine(angle_thresh):
+    return RuleEngine({"pataka": _pataka_rule(angle_thresh)})
+
 def is_pataka(landmarks: np.ndarray, angle_thresh=25) -> bool:
-    def vector(a, b):
-        return np.array(b) - np.array(a)
-
-    def angle_between(v1, v2):
-        cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-        cos_angle = np.clip(cos_angle, -1.0, 1.0)
-        return np.degrees(np.arccos(cos_angle))
-
-    wrist = landmarks[0]
-    straight_fingers = True
-
-    for tip_idx, base_idx in [(8, 6), (12, 10), (16, 14), (20, 18)]:
-        v1 = vector(landmarks[base_idx], wrist)
-        v2 = vector(landmarks[tip_idx], landmarks[base_idx])
-        angle = angle_between(v1, v2)
-        if angle > angle_thresh:
-            straight_fingers = False
-            break
-
-    # ensure thumb is not sticking out
-    thumb_tip = landmarks[4]
-    thumb_base = landmarks[2]
-    thumb_angle = angle_between(vector(wrist, thumb_base), vector(thumb_base, thumb_tip))
-    print(f"Thumb angle = {thumb_angle:.2f}")
-
-    # return straight_fingers and (30 < thumb_angle < 80)
-    return straight_fingers and (20 < thumb_angle < 80)
+    if angle_thresh == 25:
+        return ENGINE.check("pataka", landmarks)
+    return _pataka_engine(angle_thresh).check("pataka", landmarks)
 
 def is_tripataka(landmarks: np.ndarray) -> bool:
-    def vector(a, b):
-        return np.array(b) - np.array(a)
-
-    def angle_between(v1, v2):
-        cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-        cos_angle = np.clip(cos_angle, -1.0, 1.0)
-        return np.degrees(np.arccos(cos_angle))
-
-    wrist = landmarks[0]
-
-    # ensure ring finger is bent
-    ring_mcp = landmarks[13]
-    ring_pip = landmarks[14]
-    ring_tip = landmarks[16]
-
-    # check angle at PIP joint
-    v1 = vector(ring_pip, ring_mcp)
-    v2 = vector(ring_tip, ring_pip)
-    ring_angle = angle_between(v1, v2)
-
-    # ring tip should be more inward
-    z_depth_bent = ring_tip[2] < ring_pip[2] - 0.01
-
-    print(f"Thumb angle = {angle_between(vector(wrist, landmarks[2]), vector(landmarks[2], landmarks[4])):.2f}")
-    print(f"Ring finger angle = {ring_angle:.2f} | Z-depth check = {z_depth_bent}")
-
-    if ring_angle < 10 and not z_depth_bent: # if ring finger too straight and not bent inward, return false
-        return False
-
-    # since it's kind of similar to pataka gesture, check for similar conditions
-    def is_partial_pataka_base(landmarks, finger_thresh=35, thumb_range=(20, 80)) -> bool:
-        for tip_idx, base_idx in [(8, 6), (12, 10), (20, 18)]:
-            v1 = vector(landmarks[base_idx], wrist)
-            v2 = vector(landmarks[tip_idx], landmarks[base_idx])
-            angle = angle_between(v1, v2)
-            if angle > finger_thresh:
-                return False
-
-        thumb_tip = landmarks[4]
-        thumb_base = landmarks[2]
-        thumb_angle = angle_between(vector(wrist, thumb_base), vector(thumb_base, thumb_tip))
-        return thumb_range[0] < thumb_angle < thumb_range[1]
-
-    return is_partial_pataka_base(landmarks)
+    return ENGINE.check("tripataka", landmarks)
 
 def is_ardhapataka(landmarks: np.ndarray) -> bool:
-    def vector(a, b):
-        return np.array(b) - np.array(a)
-
-    def angle_between(v1, v2):
-        cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-        cos_angle = np.clip(cos_angle, -1.0, 1.0)
-        return np.degrees(np.arccos(cos_angle))
-
-    wrist = landmarks[0]
-    passed = True
-
-    # index and middle fingers should be straight
-    for label, (tip, pip) in zip(["Index", "Middle"], [(8, 6), (12, 10)]):
-        v1 = vector(landmarks[pip], wrist)
-        v2 = vector(landmarks[tip], landmarks[pip])
-        angle = angle_between(v1, v2)
-        print(f"{label} finger angle = {angle:.2f}")
-        if angle > 25:
-            passed = False
-
-    # ring and pinky fingers should be bent
-    for label, (tip, pip) in zip(["Ring", "Pinky"], [(16, 14), (20, 18)]):
-        v1 = vector(landmarks[pip], landmarks[pip - 1])
-        v2 = vector(landmarks[tip], landmarks[pip])
-        angle = angle_between(v1, v2)
-        print(f"{label} finger angle = {angle:.2f}")
-        if angle < 25:
-            passed = False
-
-    # thumb should be slightly bent
-    thumb_base = landmarks[2]
-    thumb_tip = landmarks[4]
-    thumb_angle = angle_between(vector(wrist, thumb_base), vector(thumb_base, thumb_tip))
-    print(f"Thumb angle = {thumb_angle:.2f}")
-    if not (20 < thumb_angle < 60):
-        passed = False
-
-    return passed
+    return ENGINE.check("ardhapataka", landmarks)
 
 def is_mushti(landmarks: np.ndarray) -> bool:
-    def vector(a, b):
-        return np.array(b) - np.array(a)
-
-    def angle_between(v1, v2):
-        cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-        cos_angle = np.clip(cos_angle, -1.0, 1.0)
-        return np.degrees(np.arccos(cos_angle))
-
-    finger_names = ["Index", "Middle", "Ring", "Pinky"]
-    finger_tips = [8, 12, 16, 20]
-    finger_pips = [6, 10, 14, 18]
-
-    # basically a fist so all fingers should be bent
-    bent_fingers = 0
-    for name, tip, pip in zip(finger_names, finger_tips, finger_pips):
-        v1 = vector(landmarks[pip], landmarks[pip - 1])
-        v2 = vector(landmarks[tip], landmarks[pip])
-        angle = angle_between(v1, v2)
-        print(f"{name} finger bend angle = {angle:.2f}")
-        if angle > 40:
-            bent_fingers += 1
-
-    if bent_fingers < 4:
-        return False
-
-    wrist = landmarks[0]
-    thumb_base = landmarks[2]
-    thumb_tip = landmarks[4]
-    thumb_angle = angle_between(vector(wrist, thumb_base), vector(thumb_base, thumb_tip))
-    print(f"Thumb bend angle = {thumb_angle:.2f}")
-
-    return 40 < thumb_angle < 100
\ No newline at end of file
+    return ENGINE.check("mushti", landmarks)
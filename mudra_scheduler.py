@@ -0,0 +1,182 @@
+# Adaptive frame scheduling: detection frequency, input resolution and model complexity follow a
+# frame-rate target and CPU budget, and failed camera reads back off instead of spinning
+#
+# FrameScheduler walks a ladder of QualityLevels, from full quality (MediaPipe's full model on every
+# frame at full search resolution) down to the lite model at half resolution on every 4th frame. The
+# caller reports each frame's processing time with record(). Once per window (1 s), the average
+# time per frame times the target frame rate gives the share of a core the detection needs:
+#   above cpu_budget   one level down
+#   well below it      one level up, if that level's predicted cost still leaves some headroom
+#                      (estimated from this level's, with the cost ratio between the two levels as
+#                      measured around the last change between them)
+# A level that had to be left again right after stepping up to it isn't retried for a while, and
+# that wait doubles each time (up to a minute), so the scheduler doesn't oscillate between two levels.
+#
+# CaptureBackoff replaces "if not ret: continue": failed reads wait 5 ms, 10 ms, ... up to 0.5 s
+# before trying again, and after a few seconds without a frame the caller gives up.
+#
+# Both take the clock (and CaptureBackoff the sleep function) to use, so they can be driven by a
+# SimulatedClock in a test or simulation (see benchmark_scheduler.py) instead of real time.
+import math
+import time
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class QualityLevel:
+    detect_every: int           # hand detection runs on every n-th frame, the others reuse its hands
+    scale: float                # share of the full search width and hand region size handed to MediaPipe
+    model_complexity: int       # MediaPipe Hands model: 1 full, 0 lite
+
+    @property
+    def cost(self):
+        # rough detection cost per frame relative to full quality, until a level's cost has been measured
+        return (0.3 + 0.7 * self.scale ** 2) * (1.0 if self.model_complexity else 0.6) / self.detect_every
+
+    def describe(self):
+        return f"detect every {self.detect_every} frame(s) at {self.scale:.0%} size, model complexity {self.model_complexity}"
+
+LEVELS = [
+    QualityLevel(1, 1.0, 1),
+    QualityLevel(1, 1.0, 0),
+    QualityLevel(1, 0.75, 0),
+    QualityLevel(2, 0.75, 0),
+    QualityLevel(2, 0.5, 0),
+    QualityLevel(3, 0.5, 0),
+    QualityLevel(4, 0.5, 0),
+]
+
+class SimulatedClock:
+    # stands in for time.perf_counter and time.sleep: time only moves when something sleeps or advances it
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+    advance = sleep
+
+class CaptureBackoff:
+    def __init__(self, initial=0.005, maximum=0.5, give_up=5.0, clock=time.perf_counter, sleep=time.sleep):
+        self.initial = initial          # first wait after a failed read, in seconds
+        self.maximum = maximum          # longest wait between two attempts
+        self.give_up = give_up          # seconds of failed reads in a row after which failed() returns False, None never
+        self.clock = clock
+        self.sleep = sleep
+        self.failures = 0               # failed reads in total
+        self._delay = initial
+        self._failing_since = None
+
+    def failed(self):
+        # call after a failed read: waits before the next attempt, False once it's time to give up
+        now = self.clock()
+        if self._failing_since is None:
+            self._failing_since, self._delay = now, self.initial
+        self.failures += 1
+        if self.give_up is not None and now - self._failing_since >= self.give_up:
+            return False
+        self.sleep(self._delay)
+        self._delay = min(self._delay * 2, self.maximum)
+        return True
+
+    def succeeded(self):
+        self._failing_since = None
+
+class FrameScheduler:
+    def __init__(self, target_fps=30.0, cpu_budget=1.0, levels=LEVELS, start_level=0, window=1.0, headroom=0.75,
+                 clock=time.perf_counter):
+        self.target_fps = target_fps        # frames per second the processing should keep up with
+        self.cpu_budget = cpu_budget        # share of one core the processing may take at that rate
+        self.levels = levels
+        self.level_index = start_level
+        self.window = window                # seconds of measurements behind each decision
+        self.headroom = headroom            # a better level is only tried if it's predicted below headroom * budget
+        self.clock = clock
+        self.changes = []                   # (time, level index) of every change
+        self.frames = 0
+        self.detections = 0
+        self.load = 0.0                     # share of a core the last window needed at target_fps
+        # measured cost ratio (better level / worse level) of adjacent levels, from the windows just
+        # before and after a change, which replaces the rough QualityLevel.cost estimate for that pair
+        self._ratios = {}
+        self._previous = None               # (level index, busy seconds per frame) of the window before the last change
+        self._busy = 0.0
+        self._window_frames = 0
+        self._window_start = clock()
+        self._raised_at = None              # when the current level was reached by stepping up
+        self._hold = window
+        self._hold_until = -math.inf
+        self._since_detect = math.inf
+
+    @property
+    def level(self):
+        return self.levels[self.level_index]
+
+    def should_detect(self):
+        # call once per frame: True when this frame should run hand detection at the current level
+        self._since_detect += 1
+        if self._since_detect < self.level.detect_every:
+            return False
+        self._since_detect = 0
+        self.detections += 1
+        return True
+
+    def record(self, busy):
+        # one frame's processing time in seconds, whether it ran detection or reused the last one
+        self._busy += busy
+        self._window_frames += 1
+        self.frames += 1
+        now = self.clock()
+        if now - self._window_start >= self.window:
+            self._decide(now)
+
+    def _decide(self, now):
+        current = self.level_index
+        per_frame = self._busy / self._window_frames
+        self._busy, self._window_frames, self._window_start = 0.0, 0, now
+        self.load = per_frame * self.target_fps
+        if self._previous is not None:
+            index, cost = self._previous
+            better_cost, worse_cost = (cost, per_frame) if index < current else (per_frame, cost)
+            if worse_cost > 0:
+                self._ratios[min(index, current), max(index, current)] = better_cost / worse_cost
+            self._previous = None
+        if self.load > self.cpu_budget and current + 1 < len(self.levels):
+            if self._raised_at is not None and now - self._raised_at <= 3 * self.window:
+                # the level stepped up to didn't fit after all, wait longer before trying it again
+                self._hold = min(2 * self._hold, 60.0)
+                self._hold_until = now + self._hold
+            else:
+                self._hold = self.window
+            self._change(current + 1, now, per_frame, raised=False)
+        elif current > 0 and now >= self._hold_until:
+            better = current - 1
+            ratio = self._ratios.get((better, current), self.levels[better].cost / self.levels[current].cost)
+            if per_frame * ratio * self.target_fps < self.headroom * self.cpu_budget:
+                self._change(better, now, per_frame, raised=True)
+
+    def _change(self, index, now, per_frame, raised):
+        self._previous = (self.level_index, per_frame)
+        self.level_index = index
+        self._raised_at = now if raised else None
+        self._since_detect = math.inf
+        self.changes.append((now, index))
+
+    def summary(self):
+        return (f"level {self.level_index} ({self.level.describe()}), {len(self.changes)} changes, "
+                f"detection on {self.detections}/{self.frames} frames, last load {self.load:.0%} of a core "
+                f"at {self.target_fps:g} fps (budget {self.cpu_budget:.0%})")
+
+def add_scheduler_arguments(parser):
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="adapt detection frequency, resolution and model to keep up with this frame rate")
+    parser.add_argument("--cpu-budget", type=float, default=None,
+                        help="share of one core detection may take at the target frame rate, e.g. 0.5 (default: 1.0 when adapting)")
+
+def scheduler_from_args(args, default_fps=30.0):
+    # a FrameScheduler when --target-fps or --cpu-budget was given, otherwise None (fixed quality)
+    if args.target_fps is None and args.cpu_budget is None:
+        return None
+    return FrameScheduler(args.target_fps or default_fps, args.cpu_budget if args.cpu_budget is not None else 1.0)
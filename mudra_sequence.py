@@ -0,0 +1,207 @@
+# Continuous landmark-sequence recordings: an append-only chunked file written by a background thread
+#
+# A recording (.mseq) is one file:
+#   header   b"MSEQ" + uint32 version + uint32 length + JSON (label, start time, source, ...)
+#   chunks   b"CHNK" + uint32 row count + uint32 crc32 of the rows + rows as FRAME_DTYPE records
+#
+# Every row is one detected hand in one frame (timestamp, frame number, hand slot, handedness,
+# detection confidence and (21, 3) landmarks). The capture loop only puts rows on a queue; the writer
+# thread batches them into chunks and flushes + fsyncs each chunk, so a crash loses at most the
+# rows that were not yet written. Readers stop at the first incomplete or corrupt chunk.
+import argparse
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+SEQUENCE_VERSION = 1
+DEFAULT_SEQUENCE_DIR = "mudra_sequences"
+FILE_MAGIC = b"MSEQ"
+CHUNK_MAGIC = b"CHNK"
+_HEADER = struct.Struct("<4sII")     # magic, version, JSON length
+_CHUNK = struct.Struct("<4sII")      # magic, row count, crc32
+
+HANDEDNESS = ["Left", "Right"]
+UNKNOWN_HANDEDNESS = "Right"         # hands of unknown side are taken as they are (the canonical hand), not mirrored
+FRAME_DTYPE = np.dtype([
+    ("timestamp", "<f8"),            # seconds since the epoch
+    ("frame", "<i4"),                # frame number within the recording
+    ("hand", "<i1"),                 # hand slot within the frame
+    ("handedness", "<i1"),           # index into HANDEDNESS, -1 when unknown
+    ("score", "<f4"),                # detection confidence
+    ("landmarks", "<f4", (21, 3)),
+])
+
+def handedness_names(sides):
+    # stored handedness indices -> "Left"/"Right", the same for training and replay
+    return [HANDEDNESS[side] if side >= 0 else UNKNOWN_HANDEDNESS for side in sides]
+
+class SequenceWriter:
+    def __init__(self, path, label=None, chunk_rows=256, flush_interval=1.0, **meta):
+        self.path = path
+        self.chunk_rows = chunk_rows            # rows per chunk when frames arrive quickly
+        self.flush_interval = flush_interval    # seconds after which a partial chunk is written anyway
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.frames = 0
+        self._queue = queue.SimpleQueue()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        header = json.dumps({"label": label, "start": time.time(), **meta}).encode()
+        self._file = open(path, "xb")
+        self._file.write(_HEADER.pack(FILE_MAGIC, SEQUENCE_VERSION, len(header)) + header)
+        self._sync()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, timestamp, landmarks, handedness=None, scores=None):
+        # queues one frame's hands, never blocks on disk; frames without hands only advance the frame number
+        frame = self.frames
+        self.frames += 1
+        for hand, hand_landmarks in enumerate(landmarks):
+            side = handedness[hand] if handedness is not None else None
+            self._queue.put((timestamp, frame, hand, HANDEDNESS.index(side) if side in HANDEDNESS else -1,
+                             scores[hand] if scores is not None else np.nan, hand_landmarks))
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_chunk(self, rows, count):
+        payload = rows[:count].tobytes()
+        self._file.write(_CHUNK.pack(CHUNK_MAGIC, count, zlib.crc32(payload)) + payload)
+        self._sync()
+        self.rows_written += count
+        self.chunks_written += 1
+
+    def _write_loop(self):
+        rows = np.zeros(self.chunk_rows, dtype=FRAME_DTYPE)
+        count = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                rows[count] = item
+                count += 1
+            if count == self.chunk_rows or (count and time.monotonic() >= deadline):
+                self._write_chunk(rows, count)
+                count = 0
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        if count:
+            self._write_chunk(rows, count)
+
+    def close(self):
+        # writes everything still queued and closes the file
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def new_sequence(label, directory=DEFAULT_SEQUENCE_DIR, **meta):
+    # a SequenceWriter on <directory>/<label>/<label>_<date-time>.mseq; a take started within the same
+    # second as the last one gets -2, -3, ... instead of failing on the existing file
+    stem = os.path.join(directory, label, f"{label}_{time.strftime('%Y%m%d-%H%M%S')}")
+    take = 1
+    while True:
+        try:
+            return SequenceWriter(f"{stem}.mseq" if take == 1 else f"{stem}-{take}.mseq", label, **meta)
+        except FileExistsError:
+            take += 1
+
+class SequenceReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = _HEADER.unpack_from(self._map, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError(f"'{path}' is not a landmark sequence recording")
+        if version != SEQUENCE_VERSION:
+            raise ValueError(f"Unsupported sequence version {version} in '{path}'")
+        self.meta = json.loads(self._map[_HEADER.size:_HEADER.size + length])
+        self.label = self.meta.get("label")
+        self._chunks = []               # (offset of the first row, row count) of every complete chunk
+        self.truncated = False          # trailing bytes that are not a complete, valid chunk
+        offset = _HEADER.size + length
+        while offset + _CHUNK.size <= len(self._map):
+            magic, count, crc = _CHUNK.unpack_from(self._map, offset)
+            start, end = offset + _CHUNK.size, offset + _CHUNK.size + count * FRAME_DTYPE.itemsize
+            if magic != CHUNK_MAGIC or end > len(self._map) or zlib.crc32(self._map[start:end]) != crc:
+                break
+            self._chunks.append((start, count))
+            offset = end
+        self.truncated = offset != len(self._map)
+
+    def __len__(self):
+        return sum(count for _, count in self._chunks)
+
+    @property
+    def chunk_count(self):
+        return len(self._chunks)
+
+    def chunks(self):
+        # yields each chunk as a read-only FRAME_DTYPE view straight onto the memory-mapped file
+        for start, count in self._chunks:
+            yield np.frombuffer(self._map, dtype=FRAME_DTYPE, count=count, offset=start)
+
+    def rows(self):
+        # every row in one contiguous array (copied out of the chunks)
+        chunks = list(self.chunks())
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=FRAME_DTYPE)
+
+    def iter_frames(self):
+        # yields (frame number, timestamp, rows of that frame's hands), frames without hands are skipped
+        rows = self.rows()
+        if not len(rows):
+            return
+        boundaries = np.flatnonzero(np.diff(rows["frame"])) + 1
+        for frame_rows in np.split(rows, boundaries):
+            yield int(frame_rows["frame"][0]), float(frame_rows["timestamp"][0]), frame_rows
+
+    def close(self):
+        # views returned by chunks() must be released before the file can be unmapped
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect landmark sequence recordings")
+    parser.add_argument("paths", nargs="+", help=".mseq recordings")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        with SequenceReader(path) as reader:
+            rows = reader.rows()
+            frames = len(np.unique(rows["frame"]))
+            duration = float(rows["timestamp"][-1] - rows["timestamp"][0]) if len(rows) else 0.0
+            print(f"=== {path}: {reader.label} ===")
+            print(f"  {len(rows)} hands in {frames} frames over {duration:.1f}s "
+                  f"({frames / duration if duration else 0:.1f} frames/s), {reader.chunk_count} chunks")
+            for i, side in enumerate(HANDEDNESS):
+                print(f"  {side} hands: {int(np.count_nonzero(rows['handedness'] == i))}")
+            if len(rows):
+                print(f"  mean detection confidence: {np.nanmean(rows['score']):.2f}")
+            if reader.truncated:
+                print("  incomplete chunk at the end (recording was interrupted)")
+
+if __name__ == "__main__":
+    main()
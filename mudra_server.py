@@ -0,0 +1,289 @@
+# Local recognition server: HTTP on localhost, with concurrent requests micro-batched into one classifier call
+#
+# Endpoints (JSON responses):
+#   POST /predict   {"landmarks": one (21, 3) hand or a list of them, "handedness": ["Left"/"Right", ...]}
+#   POST /frame     an encoded image (JPEG/PNG) as the body, hands are detected with MediaPipe first
+#                   (only with --frames)
+#   GET  /health    model classes, batching settings and how many batches/hands were classified
+#   GET  /metrics   per-stage latency percentiles as Prometheus text, like the live recognizer's exporter
+#
+# Requests only queue their hands. The batcher takes the first queued request, waits at most
+# --max-wait-ms for more (or until --max-batch hands are queued), then runs feature extraction and the
+# forest once over all of them and hands every request its own rows. Connections are kept alive, and
+# only the standard library's asyncio is used, so the server needs nothing beyond the live recognizer.
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from mudra_features import normalize_handedness
+from mudra_forest import DEFAULT_MODEL, load_model_and_features
+from mudra_metrics import StageTimes
+from mudra_startup import StartupProfiler, add_profile_argument
+
+MAX_BODY = 16 * 1024 * 1024
+HANDEDNESS = ("Left", "Right")
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+class MicroBatcher:
+    # collects hands from concurrent requests and classifies them together
+    def __init__(self, forest, feature_set, max_batch=64, max_wait=0.002, times=None):
+        self.forest = forest
+        self.feature_set = feature_set
+        self.max_batch = max_batch      # hands per classifier call
+        self.max_wait = max_wait        # seconds the first queued request may wait for company
+        self.times = times or StageTimes()
+        self.batches = 0
+        self.hands = 0
+        # connections that may still add a request; each has at most one in flight, so once they all
+        # have one in the batch nobody else can join and the wait ends early
+        self.connections = None
+        self._queue = asyncio.Queue()
+
+    async def predict(self, landmarks, handedness):
+        # (N, 21, 3) landmarks and N handedness labels -> (N, classes) probabilities
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((landmarks, handedness, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            count = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while count < self.max_batch:
+                if self.connections is not None and len(batch) >= self.connections and self._queue.empty():
+                    break
+                # whatever is already queued joins without waiting
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                batch.append(item)
+                count += len(item[0])
+            self._classify(batch)
+
+    def _classify(self, batch):
+        # runs on the event loop: one extraction and one forest call take less time than handing them to a thread
+        start = time.perf_counter()
+        for _, _, _, queued in batch:
+            self.times.add("queue wait", start - queued)
+        try:
+            landmarks = np.concatenate([item[0] for item in batch])
+            handedness = [side for item in batch for side in item[1]]
+            with self.times.span("features"):
+                features = self.feature_set.extract_batch(normalize_handedness(landmarks, handedness))
+            with self.times.span("predict"):
+                proba = self.forest.predict_proba(features)
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.hands += len(landmarks)
+        self.times.add("batch", time.perf_counter() - start)
+        row = 0
+        for item_landmarks, _, future, _ in batch:
+            if not future.done():
+                future.set_result(proba[row:row + len(item_landmarks)])
+            row += len(item_landmarks)
+
+class RecognitionServer:
+    def __init__(self, batcher, detector=None):
+        self.batcher = batcher
+        self.detector = detector        # mudra_roi.HandDetector for /frame, None to disable it
+        self.times = batcher.times
+        # MediaPipe is neither thread-safe nor async, so detection runs on one worker thread
+        self._detect_thread = ThreadPoolExecutor(max_workers=1) if detector is not None else None
+
+    def _hands_json(self, proba, handedness, landmarks=None):
+        classes = [str(label) for label in self.batcher.forest.classes]
+        hands = []
+        for i, p in enumerate(proba):
+            best = int(np.argmax(p))
+            hand = {"label": classes[best], "confidence": round(float(p[best]), 4), "handedness": handedness[i],
+                    "probabilities": dict(zip(classes, np.round(p, 4).tolist()))}
+            if landmarks is not None:
+                hand["landmarks"] = np.round(landmarks[i], 5).tolist()
+            hands.append(hand)
+        return {"hands": hands}
+
+    async def predict_landmarks(self, body):
+        request = json.loads(body)
+        landmarks = np.asarray(request["landmarks"], dtype=np.float32)
+        if not landmarks.size:
+            return {"hands": []}
+        if landmarks.shape == (21, 3):
+            landmarks = landmarks[None]
+        if landmarks.ndim != 3 or landmarks.shape[1:] != (21, 3):
+            raise ValueError(f"landmarks must be (21, 3) or (N, 21, 3), got {landmarks.shape}")
+        handedness = request.get("handedness") or ["Right"] * len(landmarks)
+        if isinstance(handedness, str):
+            handedness = [handedness]
+        if not isinstance(handedness, list) or len(handedness) != len(landmarks):
+            raise ValueError(f"{len(landmarks)} hands need a list of {len(landmarks)} handedness labels")
+        for side in handedness:
+            if side not in HANDEDNESS:
+                raise ValueError(f"handedness must be \"Left\" or \"Right\", got {json.dumps(side)}")
+        return self._hands_json(await self.batcher.predict(landmarks, handedness), handedness)
+
+    def _detect(self, body):
+        import cv2
+        with self.times.span("decode"):
+            frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("body is not an image OpenCV can decode")
+        self.detector.reset()
+        hands = self.detector.detect(frame)
+        return np.array(hands, dtype=np.float32).reshape(-1, 21, 3), list(self.detector.handedness)
+
+    async def predict_frame(self, body):
+        landmarks, handedness = await asyncio.get_running_loop().run_in_executor(self._detect_thread, self._detect, body)
+        if not len(landmarks):
+            return {"hands": []}
+        return self._hands_json(await self.batcher.predict(landmarks, handedness), handedness, landmarks)
+
+    def health(self):
+        return {"classes": [str(label) for label in self.batcher.forest.classes],
+                "features": self.batcher.feature_set.groups, "frames": self.detector is not None,
+                "max_batch": self.batcher.max_batch, "max_wait_ms": self.batcher.max_wait * 1000,
+                "batches": self.batcher.batches, "hands": self.batcher.hands}
+
+    async def route(self, method, path, body):
+        # -> (status, content type, body bytes)
+        if path == "/health" and method == "GET":
+            return 200, "application/json", json.dumps(self.health()).encode()
+        if path == "/metrics" and method == "GET":
+            return 200, "text/plain; version=0.0.4", self.times.prometheus_text().encode()
+        handlers = {"/predict": self.predict_landmarks}
+        if self.detector is not None:
+            handlers["/frame"] = self.predict_frame
+        if path not in handlers:
+            return 404, "application/json", json.dumps({"error": f"no endpoint {path}"}).encode()
+        if method != "POST":
+            return 405, "application/json", json.dumps({"error": f"{path} expects POST"}).encode()
+        try:
+            result = await handlers[path](body)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, "application/json", json.dumps({"error": str(e)}).encode()
+        return 200, "application/json", json.dumps(result).encode()
+
+    async def handle_connection(self, reader, writer):
+        # minimal HTTP/1.1 with keep-alive: one request after another on each connection
+        self.batcher.connections = (self.batcher.connections or 0) + 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                start = time.perf_counter()
+                method, path = request_line.decode("latin-1").split()[:2]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0")
+                # without a usable length the body can't be told apart from the next request, so the
+                # connection is closed after the error
+                if not (length.isascii() and length.isdigit()):
+                    status, content_type, payload = 400, "application/json", b'{"error": "invalid Content-Length"}'
+                    headers["connection"] = "close"
+                elif int(length) > MAX_BODY:
+                    status, content_type, payload = 413, "application/json", b'{"error": "body too large"}'
+                    headers["connection"] = "close"
+                else:
+                    body = await reader.readexactly(int(length))
+                    try:
+                        status, content_type, payload = await self.route(method, path.split("?")[0], body)
+                    except Exception as e:
+                        status, content_type, payload = 500, "application/json", json.dumps({"error": str(e)}).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                              f"Content-Length: {len(payload)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if path.startswith("/predict") or path.startswith("/frame"):
+                    self.times.add("request", time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.batcher.connections -= 1
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, ready=None):
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serve mudra recognition over HTTP on localhost, batching concurrent requests")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="exported model directory or .pkl")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("--max-batch", type=int, default=64, help="max hands per classifier call (default: 64)")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="max time a request waits for others to batch with, in milliseconds (default: 2)")
+    parser.add_argument("--frames", action="store_true", help="also accept encoded images at /frame (loads MediaPipe)")
+    parser.add_argument("--max-hands", type=int, default=2, help="max hands detected per /frame image (default: 2)")
+    parser.add_argument("--no-flip", action="store_true", help="don't mirror /frame images (training data was recorded mirrored)")
+    add_profile_argument(parser)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("load model"):
+        forest, feature_set = load_model_and_features(args.model)
+    detector = None
+    if args.frames:
+        with profiler.step("import mediapipe"):
+            import mediapipe as mp
+            from mudra_roi import HandDetector
+        with profiler.step("mp_hands.Hands()"):
+            hands = mp.solutions.hands.Hands(static_image_mode=True, max_num_hands=args.max_hands,
+                                             min_detection_confidence=0.7)
+            detector = HandDetector(hands, mirror=not args.no_flip, use_roi=False, max_hands=args.max_hands)
+    profiler.report()
+
+    async def run():
+        batcher = MicroBatcher(forest, feature_set, args.max_batch, args.max_wait_ms / 1000)
+        server = RecognitionServer(batcher, detector)
+        print(f"Serving {len(forest.classes)} mudras on http://{args.host}:{args.port} "
+              f"(batches of up to {args.max_batch} hands, waiting at most {args.max_wait_ms:g}ms)")
+        try:
+            await server.serve(args.host, args.port)
+        finally:
+            if batcher.batches:
+                print(f"{batcher.hands} hands in {batcher.batches} batches "
+                      f"({batcher.hands / batcher.batches:.1f} hands per classifier call)")
+                print("\n".join(server.times.percentile_lines()))
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
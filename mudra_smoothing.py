@@ -0,0 +1,175 @@
+# Temporal smoothing and hysteresis for per-frame mudra predictions
+#
+# Per-frame probabilities are averaged over a fixed-size ring buffer, and the reported label only
+# changes once a different mudra has led the average for a few consecutive frames. Every time the
+# stable label changes a segment ("mudra held from t0 to t1") is closed and reported. All state is
+# preallocated, so each update costs the same no matter how long the stabilizer runs.
+# HandStabilizers keeps one stabilizer per tracked hand when several hands are in view.
+from collections import deque
+from dataclasses import dataclass
+import numpy as np
+
+@dataclass
+class Segment:
+    label: str
+    start: float
+    end: float
+    frames: int
+
+class PredictionStabilizer:
+    def __init__(self, classes, window=8, switch_threshold=0.5, switch_frames=3, release_frames=5, history=256):
+        self.classes = np.asarray(classes)
+        self.window = window
+        self.switch_threshold = switch_threshold   # average probability a new mudra needs before it can take over
+        self.switch_frames = switch_frames         # consecutive frames it must lead for
+        self.release_frames = release_frames       # frames without a hand before the current segment ends
+        self._buffer = np.zeros((window, len(self.classes)))
+        self._sum = np.zeros(len(self.classes))
+        self._filled = 0
+        self._next = 0
+        self._updates = 0
+        self.label = None
+        self.average = np.zeros(len(self.classes))
+        self._candidate = None
+        self._candidate_frames = 0
+        self._missing_frames = 0
+        self._segment_start = None
+        self._segment_frames = 0
+        self._last_time = None
+        self.segments = deque(maxlen=history)      # most recent closed segments
+
+    def _push(self, proba):
+        self._sum -= self._buffer[self._next]
+        self._buffer[self._next] = proba
+        self._sum += proba
+        self._next = (self._next + 1) % self.window
+        self._filled = min(self._filled + 1, self.window)
+        self._updates += 1
+        # the running sum slowly picks up rounding error, so it is rebuilt from the buffer now and then
+        if self._updates % (64 * self.window) == 0:
+            self._sum = self._buffer.sum(axis=0)
+
+    def _reset_window(self):
+        self._buffer[:] = 0.0
+        self._sum[:] = 0.0
+        self._filled = 0
+        self._next = 0
+
+    def _close(self, timestamp):
+        # ends the current segment and returns it, if there is one
+        if self.label is None:
+            return None
+        segment = Segment(str(self.label), self._segment_start, timestamp, self._segment_frames)
+        self.segments.append(segment)
+        self.label = None
+        return segment
+
+    def update(self, proba, timestamp):
+        # proba is the classifier's class probabilities for this frame, or None when no hand was detected
+        # returns the segment that was closed by this frame, if any
+        closed = None
+        if proba is None:
+            self._missing_frames += 1
+            if self._missing_frames >= self.release_frames:
+                closed = self._close(self._last_time if self._last_time is not None else timestamp)
+                self._reset_window()
+                self._candidate, self._candidate_frames = None, 0
+            return closed
+
+        self._missing_frames = 0
+        self._last_time = timestamp
+        self._push(proba)
+        self.average = self._sum / self._filled
+        best = self.classes[np.argmax(self.average)]
+
+        if best == self.label:
+            self._candidate, self._candidate_frames = None, 0
+        elif self.average.max() >= self.switch_threshold:
+            if best == self._candidate:
+                self._candidate_frames += 1
+            else:
+                self._candidate, self._candidate_frames = best, 1
+            if self._candidate_frames >= self.switch_frames:
+                closed = self._close(timestamp)
+                self.label = best
+                self._segment_start = timestamp
+                self._segment_frames = 0
+                self._candidate, self._candidate_frames = None, 0
+        if self.label is not None:
+            self._segment_frames += 1
+        return closed
+
+    def flush(self, timestamp=None):
+        # closes the open segment, e.g. when the stream ends
+        return self._close(self._last_time if timestamp is None else timestamp)
+
+class HandStabilizers:
+    # one PredictionStabilizer per tracked hand, for frames with several hands (both hands of a dancer,
+    # or several dancers). Hands are matched to the previous frame's tracks by the closest wrist
+    # position (handedness flickers too often to rely on), and a track is dropped once its hand has
+    # been missing for release_frames.
+    def __init__(self, classes, max_distance=0.2, **stabilizer_options):
+        self.classes = classes
+        self.max_distance = max_distance           # furthest a wrist may move between frames (normalized image units)
+        self.stabilizer_options = stabilizer_options
+        self.tracks = {}                           # track id -> [stabilizer, handedness, wrist (x, y)]
+        self._next_id = 0
+
+    def _match(self, wrists):
+        # greedy closest-first matching of this frame's hands to existing tracks
+        pairs = []
+        for track_id, (_, _, track_wrist) in self.tracks.items():
+            for i, wrist in enumerate(wrists):
+                distance = float(np.hypot(*(wrist - track_wrist)))
+                if distance <= self.max_distance:
+                    pairs.append((distance, track_id, i))
+        assigned = [None] * len(wrists)
+        used = set()
+        for _, track_id, i in sorted(pairs):
+            if assigned[i] is None and track_id not in used:
+                assigned[i] = track_id
+                used.add(track_id)
+        return assigned
+
+    def assign(self, landmarks, handedness):
+        # matches this frame's hands to tracks (starting new ones as needed) and returns their track ids
+        wrists = [np.asarray(hand)[0, :2] for hand in landmarks]
+        track_ids = self._match(wrists)
+        for i, track_id in enumerate(track_ids):
+            if track_id is None:
+                track_id = track_ids[i] = self._next_id
+                self._next_id += 1
+                self.tracks[track_id] = [PredictionStabilizer(self.classes, **self.stabilizer_options), handedness[i], wrists[i]]
+            self.tracks[track_id][1:] = [handedness[i], wrists[i]]
+        return track_ids
+
+    def update_tracks(self, track_ids, proba, timestamp):
+        # feeds proba[i] to track_ids[i] and ages every track that has no hand this frame
+        # returns the (track id, segment) pairs closed by this frame
+        closed = []
+        for track_id, hand_proba in zip(track_ids, proba if proba is not None else []):
+            segment = self.tracks[track_id][0].update(hand_proba, timestamp)
+            if segment is not None:
+                closed.append((track_id, segment))
+        for track_id in [t for t in self.tracks if t not in track_ids]:
+            stabilizer = self.tracks[track_id][0]
+            segment = stabilizer.update(None, timestamp)
+            if segment is not None:
+                closed.append((track_id, segment))
+            if stabilizer._missing_frames >= stabilizer.release_frames:
+                del self.tracks[track_id]
+        return closed
+
+    def update(self, landmarks, handedness, proba, timestamp):
+        # landmarks: (N, 21, 3), handedness: N labels, proba: (N, n_classes) class probabilities
+        # returns the track id of each hand and the (track id, segment) pairs closed by this frame
+        track_ids = self.assign(landmarks, handedness)
+        return track_ids, self.update_tracks(track_ids, proba, timestamp)
+
+    def label(self, track_id):
+        return self.tracks[track_id][0].label
+
+    def flush(self):
+        # closes every open segment, e.g. when the stream ends
+        closed = [(track_id, track[0].flush()) for track_id, track in self.tracks.items()]
+        return [(track_id, segment) for track_id, segment in closed if segment is not None]
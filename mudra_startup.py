@@ -0,0 +1,38 @@
+# Lazy imports and startup profiling shared by the entry-point scripts
+#
+# Scripts parse their arguments before touching cv2/mediapipe and import heavy modules inside
+# StartupProfiler steps, so --help and dataset-only commands stay fast. With --profile-startup the time
+# spent importing each module and in each initialization step is printed once startup is done.
+import time
+from contextlib import contextmanager
+
+_PROCESS_START = time.perf_counter()
+
+def add_profile_argument(parser):
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each import and initialization step took")
+
+class StartupProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.steps = []
+        self.reported = False
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        yield
+        self.steps.append((name, time.perf_counter() - start))
+
+    def add(self, name, seconds):
+        self.steps.append((name, seconds))
+
+    def report(self):
+        # prints the report once, if enabled
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        print("=== Startup profile ===")
+        for name, seconds in self.steps:
+            print(f"  {name:<40} {seconds * 1000:>8.1f}ms")
+        print(f"  {'total since script start':<40} {(time.perf_counter() - _PROCESS_START) * 1000:>8.1f}ms")
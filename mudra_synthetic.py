@@ -0,0 +1,47 @@
+# Deterministic synthetic landmarks and frames for benchmarks (no camera needed)
+#
+# Landmarks are real mudra_data samples with a little Gaussian jitter, frames are the bundled
+# test_frame.png panned sideways with sensor-like noise. The same seed always produces the same
+# data, so benchmark results from different commits or machines can be compared.
+import numpy as np
+from mudra_dataset import iter_tree
+
+def load_samples(data_dir="mudra_data"):
+    # every sample in mudra_data as (N, 21, 3) float32 landmarks and N labels
+    labels, landmarks = [], []
+    for gesture, path in iter_tree(data_dir):
+        labels.append(gesture)
+        landmarks.append(np.load(path))
+    return np.stack(landmarks).astype(np.float32), np.array(labels)
+
+def jittered_hands(n, seed=0, sigma=0.005, data_dir="mudra_data"):
+    # n hands drawn from the real samples, each moved by N(0, sigma) per coordinate
+    samples, labels = load_samples(data_dir)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(samples), n)
+    hands = samples[picks] + rng.normal(0, sigma, (n, 21, 3)).astype(np.float32)
+    return hands, labels[picks]
+
+def synthetic_frames(n, size=(640, 480), seed=0, image="test_frame.png", pan=4, noise=2.0):
+    # yields n BGR frames: the image resized to size, panned pan pixels per frame, plus Gaussian noise
+    import cv2
+    base = cv2.resize(cv2.imread(image), size, interpolation=cv2.INTER_AREA).astype(np.int16)
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        frame = np.roll(base, i * pan, axis=1)
+        if noise:
+            frame = frame + rng.normal(0, noise, frame.shape).astype(np.int16)
+        yield np.clip(frame, 0, 255).astype(np.uint8)
+
+def write_clip(path, frames, fps=30):
+    # writes frames to an MJPG .avi that OpenCV can read back on any platform
+    import cv2
+    writer = None
+    for frame in frames:
+        if writer is None:
+            height, width = frame.shape[:2]
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+        writer.write(frame)
+    if writer is not None:
+        writer.release()
+    return path
@@ -0,0 +1,111 @@
+# Temporal features over a sliding window of landmark frames, for motion-aware recognition
+#
+# Each frame is reduced to FRAME_FEATURE_NAMES: the five joint angles from mudra_features,
+# fingertip distances (relative to palm size) and the hand's orientation. A window then adds, for
+# every frame feature, its mean over the window, its net velocity (change per second from the oldest
+# to the newest frame) and its motion (summed absolute change per second). TemporalWindow keeps
+# running sums over a preallocated ring buffer, so each new frame costs the same whatever the window
+# length. window_features_batch computes the same features for a whole recorded sequence at once.
+import numpy as np
+from mudra_features import FEATURE_NAMES, extract_features_batch, palm_normal, palm_size
+
+TEMPORAL_MODEL = "gesture_temporal.model"
+DEFAULT_WINDOW = 16
+
+# thumb tip to the other fingertips, and index tip to middle tip
+_TIP_PAIRS = np.array([(4, 8), (4, 12), (4, 16), (4, 20), (8, 12)])
+
+FRAME_FEATURE_NAMES = (FEATURE_NAMES
+                       + [f"tip_distance_{a}_{b}" for a, b in _TIP_PAIRS]
+                       + ["palm_normal_x", "palm_normal_y", "palm_normal_z", "direction_x", "direction_y"])
+WINDOW_FEATURE_NAMES = [f"{kind}_{name}" for kind in ("current", "mean", "velocity", "motion")
+                        for name in FRAME_FEATURE_NAMES]
+
+def _norm(v):
+    return np.sqrt((v * v).sum(axis=-1, keepdims=True))
+
+def frame_features_batch(landmarks):
+    # (N, 21, 3) landmarks -> (N, len(FRAME_FEATURE_NAMES)) per-frame features
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    wrist = landmarks[:, 0]
+    tips = _norm(landmarks[:, _TIP_PAIRS[:, 0]] - landmarks[:, _TIP_PAIRS[:, 1]])[..., 0] / palm_size(landmarks)
+    normal = palm_normal(landmarks)
+    direction = (landmarks[:, 9] - wrist)[:, :2]
+    direction = direction / _norm(direction)
+    return np.hstack([extract_features_batch(landmarks), tips, normal, direction])
+
+def window_features_batch(frame_features, timestamps, window=DEFAULT_WINDOW):
+    # (T, F) features of one sequence and its (T,) timestamps -> (T, 4F) window features at every frame,
+    # the first window - 1 frames use the frames seen so far (like a TemporalWindow filling up)
+    frame_features = np.asarray(frame_features, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    count = len(frame_features)
+    end = np.arange(count)
+    start = np.maximum(0, end - window + 1)
+    sums = np.vstack([np.zeros(frame_features.shape[1]), np.cumsum(frame_features, axis=0)])
+    diffs = np.vstack([np.zeros(frame_features.shape[1]), np.abs(np.diff(frame_features, axis=0))])
+    diff_sums = np.vstack([np.zeros(frame_features.shape[1]), np.cumsum(diffs, axis=0)])
+    mean = (sums[end + 1] - sums[start]) / (end - start + 1)[:, None]
+    span = (timestamps[end] - timestamps[start])[:, None]
+    safe_span = np.where(span > 0, span, 1.0)
+    velocity = np.where(span > 0, (frame_features[end] - frame_features[start]) / safe_span, 0.0)
+    motion = np.where(span > 0, (diff_sums[end + 1] - diff_sums[start + 1]) / safe_span, 0.0)
+    return np.hstack([frame_features, mean, velocity, motion])
+
+class TemporalWindow:
+    # ring buffer of the last `window` frames of one hand, updated in O(1) per frame
+    def __init__(self, window=DEFAULT_WINDOW):
+        size = len(FRAME_FEATURE_NAMES)
+        self.window = window
+        self._features = np.zeros((window, size))
+        self._diffs = np.zeros((window, size))     # |change| from the previous frame, stored with each frame
+        self._times = np.zeros(window)
+        self._sum = np.zeros(size)
+        self._diff_sum = np.zeros(size)
+        self._filled = 0
+        self._next = 0
+        self._updates = 0
+
+    def reset(self):
+        self._features[:] = 0.0
+        self._diffs[:] = 0.0
+        self._sum[:] = 0.0
+        self._diff_sum[:] = 0.0
+        self._filled = 0
+        self._next = 0
+
+    def push(self, features, timestamp):
+        # features: this frame's FRAME_FEATURE_NAMES values; returns the window features after adding it
+        slot = self._next
+        newest = (slot - 1) % self.window
+        diff = np.abs(features - self._features[newest]) if self._filled else np.zeros_like(features)
+        # the slot about to be overwritten holds the oldest frame once the buffer is full
+        self._sum += features - self._features[slot]
+        self._diff_sum += diff - self._diffs[slot]
+        self._features[slot] = features
+        self._diffs[slot] = diff
+        self._times[slot] = timestamp
+        self._next = (slot + 1) % self.window
+        self._filled = min(self._filled + 1, self.window)
+        self._updates += 1
+        # running sums pick up rounding error, so they are rebuilt from the buffer now and then
+        if self._updates % (64 * self.window) == 0:
+            self._sum = self._features.sum(axis=0)
+            self._diff_sum = self._diffs.sum(axis=0)
+
+        oldest = (self._next - self._filled) % self.window
+        span = timestamp - self._times[oldest]
+        mean = self._sum / self._filled
+        if span > 0:
+            velocity = (features - self._features[oldest]) / span
+            # the oldest frame's diff points outside the window
+            motion = (self._diff_sum - self._diffs[oldest]) / span
+        else:
+            velocity = motion = np.zeros_like(features)
+        return np.concatenate([features, mean, velocity, motion])
+
+def hold_sequence(landmarks, rng, frames=48, fps=30.0, jitter=0.004, drift=0.002):
+    # synthesizes a held mudra from one static sample: per-frame jitter plus a slow random-walk drift
+    walk = np.cumsum(rng.normal(0, drift, (frames, 1, 3)), axis=0)
+    sequence = landmarks[None] + walk + rng.normal(0, jitter, (frames, 21, 3))
+    return sequence.astype(np.float32), np.arange(frames) / fps
@@ -1,24 +1,7 @@
 # Preview all samples in data folder for a specific mudra
+import argparse
 import os
-import numpy as np
-import cv2
-import sys
-
-# check if mudra name is provided
-if (len(sys.argv) < 2):
-    print("Usage: python preview_mudra_samples.py <MUDRA_LABEL>\n")
-    print("Please provide the name of the mudra you want to preview after the command.")
-    print("(Example: python preview_mudra_samples.py mushti)\n")
-    sys.exit(1)
-
-if (sys.argv[1]):
-    MUDRA_LABEL = sys.argv[1]
-else:
-    MUDRA_LABEL = "mushti" # default 
-
-# set folder
-MUDRA_FOLDER = "mudra_data/" + MUDRA_LABEL
-# MUDRA_FOLDER = "mudra_data/mushti"
+from mudra_startup import StartupProfiler, add_profile_argument
 
 # 2D hand skeleton
 HAND_CONNECTIONS = [
@@ -32,6 +15,7 @@ HAND_CONNECTIONS = [
 
 # to draw the hand outline
 def draw_hand(image, landmarks):
+    import cv2
     h, w = image.shape[:2]
     for i, (x, y, z) in enumerate(landmarks):
         cx, cy = int(x * w), int(y * h)
@@ -42,25 +26,50 @@ def draw_hand(image, landmarks):
         cv2.line(image, (x0, y0), (x1, y1), (255, 0, 0), 2)
     return image
 
-# load each sample fiile
-for filename in sorted(os.listdir(MUDRA_FOLDER)):
-    if not filename.endswith(".npy"):
-        continue
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Preview every saved sample of a mudra as a 2D hand skeleton, one per second. Press 'q' or ESC to quit.",
+        epilog="Example: python preview_mudra_samples.py mushti")
+    parser.add_argument("label", help="name of the mudra you want to preview")
+    add_profile_argument(parser)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # set folder
+    MUDRA_FOLDER = "mudra_data/" + args.label
+    # MUDRA_FOLDER = "mudra_data/mushti"
+
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("import numpy"):
+        import numpy as np
+    with profiler.step("import cv2"):
+        import cv2
+    profiler.report()
+
+    # load each sample fiile
+    for filename in sorted(os.listdir(MUDRA_FOLDER)):
+        if not filename.endswith(".npy"):
+            continue
+
+        filepath = os.path.join(MUDRA_FOLDER, filename)
+        landmarks = np.load(filepath)
 
-    filepath = os.path.join(MUDRA_FOLDER, filename)
-    landmarks = np.load(filepath)
+        # create canvas
+        canvas = np.ones((480, 480, 3), dtype=np.uint8) * 255
+        canvas = draw_hand(canvas, landmarks)
 
-    # create canvas
-    canvas = np.ones((480, 480, 3), dtype=np.uint8) * 255
-    canvas = draw_hand(canvas, landmarks)
+        cv2.putText(canvas, filename, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
 
-    cv2.putText(canvas, filename, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        cv2.imshow("Preview", canvas)
+        # key = cv2.waitKey(0) # manually press a key to transition for this
+        key = cv2.waitKey(1000)  # 1000 ms = 1 second per frame
+        if (key == ord('q') or key == 27):  # ESC or 'q' to quit
+            break
 
-    cv2.imshow("Preview", canvas)
-    # key = cv2.waitKey(0) # manually press a key to transition for this
-    key = cv2.waitKey(1000)  # 1000 ms = 1 second per frame
-    if (key == ord('q') or key == 27):  # ESC or 'q' to quit
-        break
+    # for exiting
+    cv2.destroyAllWindows()
 
-# for exiting
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
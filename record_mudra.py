@@ -1,82 +1,157 @@
 # Record mudra samples for sample data
-import cv2
-import mediapipe as mp
-import numpy as np
+import argparse
 import os
-import sys
-
-# check for mudra input parameter
-if len(sys.argv) < 2:
-    print("Usage: python record_mudra.py <MUDRA_LABEL>\n")
-    print("Please provide the name of the mudra you want to record samples for after the command.")
-    print("(Example: python record_mudra.py mushti)\n")
-    sys.exit(1)
-
-if (sys.argv[1]):
-    MUDRA_LABEL = sys.argv[1]
-else:
-    MUDRA_LABEL = "mushti"
-
-print(f"Recording gesture: {MUDRA_LABEL}")
-
-SAVE_DIR = f"mudra_data/{MUDRA_LABEL}"
-os.makedirs(SAVE_DIR, exist_ok=True)
-
-# set up MediaPipe
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-
-hands = mp_hands.Hands(static_image_mode=False, max_num_hands=1,
-                       min_detection_confidence=0.7, min_tracking_confidence=0.7)
-
-cap = cv2.VideoCapture(1) # you may need to switch out 1 for whatever camera input you have
-# cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
-if not cap.isOpened():
-    print("Webcam error")
-    exit()
-
-sample_count = len(os.listdir(SAVE_DIR))
-print(f"Recording for mudra: {MUDRA_LABEL}")
-print("Hold your hand in position, then press 's' to save, or 'q' to quit.")
-
-# record mudra samples
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        continue
-
-    frame = cv2.flip(frame, 1)
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = hands.process(rgb)
-
-    key = cv2.waitKey(1) & 0xFF
-
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            # draw landmarks
-            mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-
-            # convert landmarks to numpy array
-            landmark_array = np.array(
-                [[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark],
-                dtype=np.float32
-            )
-
-            # save when 's' is pressed
-            if key == ord('s'):
-                filename = f"{MUDRA_LABEL}_{sample_count:03d}.npy"
-                np.save(os.path.join(SAVE_DIR, filename), landmark_array)
-                print(f"Saved: {filename}")
-                sample_count += 1
-
-    cv2.putText(frame, f"Mudra: {MUDRA_LABEL} | Samples: {sample_count}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-    cv2.imshow("Record Mudra: Pataka", frame)
-
-    if key == ord('q') or key == 27:
-        break
-
-# for exiting
-cap.release()
-cv2.destroyAllWindows()
-hands.close()
-print("Done recording.")
+import re
+import time
+from mudra_scheduler import CaptureBackoff
+from mudra_startup import StartupProfiler, add_profile_argument
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Record (21, 3) landmark samples for a mudra. Press 's' to save a sample, 'q' to quit.",
+        epilog="Example: python record_mudra.py mushti")
+    parser.add_argument("label", help="name of the mudra you want to record samples for")
+    parser.add_argument("--pack", action="store_true",
+                        help="append samples to the packed dataset instead of writing one .npy file per sample")
+    # you may need to switch out 1 for whatever camera input you have
+    parser.add_argument("--camera", type=int, default=1, help="camera index (default: 1)")
+    parser.add_argument("--sequence", action="store_true",
+                        help="press 'r' to start/stop streaming every frame's landmarks to mudra_sequences/<label>/")
+    parser.add_argument("--max-hands", type=int, default=1, help="hands to detect, e.g. 2 for two-handed sequences (default: 1)")
+    add_profile_argument(parser)
+    return parser
+
+# next free ### in <label>_###.npy, so deleted samples never cause an existing file to be overwritten
+def next_sample_index(save_dir, label):
+    indices = [int(m.group(1)) for f in os.listdir(save_dir) if (m := re.fullmatch(rf"{re.escape(label)}_(\d+)\.npy", f))]
+    return max(indices, default=-1) + 1
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    MUDRA_LABEL = args.label
+    print(f"Recording gesture: {MUDRA_LABEL}")
+
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("import numpy"):
+        import numpy as np
+    with profiler.step("import mudra_dataset"):
+        from mudra_dataset import DEFAULT_PACK, import_tree, is_pack, open_pack
+        from mudra_sequence import new_sequence
+
+    SAVE_DIR = f"mudra_data/{MUDRA_LABEL}"
+    if args.pack:
+        # the first packed recording starts from everything already in mudra_data
+        with profiler.step("open packed dataset"):
+            if not is_pack(DEFAULT_PACK):
+                import_tree("mudra_data", DEFAULT_PACK)
+            dataset = open_pack(DEFAULT_PACK)
+    else:
+        if is_pack(DEFAULT_PACK):
+            # the tools read the pack once it exists, these files only count after re-packing
+            print(f"Note: training reads '{DEFAULT_PACK}', add --pack to record into it")
+        os.makedirs(SAVE_DIR, exist_ok=True)
+
+    with profiler.step("import cv2"):
+        import cv2
+    with profiler.step("import mediapipe"):
+        import mediapipe as mp
+
+    # set up MediaPipe
+    mp_hands = mp.solutions.hands
+    mp_drawing = mp.solutions.drawing_utils
+
+    with profiler.step("mp_hands.Hands()"):
+        hands = mp_hands.Hands(static_image_mode=False, max_num_hands=args.max_hands,
+                               min_detection_confidence=0.7, min_tracking_confidence=0.7)
+
+    with profiler.step("open camera"):
+        cap = cv2.VideoCapture(args.camera)
+        # cap = cv2.VideoCapture(0, cv2.CAP_AVFOUNDATION)
+    if not cap.isOpened():
+        print("Webcam error")
+        return
+    profiler.report()
+
+    sample_count = dataset.next_index(MUDRA_LABEL) if args.pack else next_sample_index(SAVE_DIR, MUDRA_LABEL)
+    print(f"Recording for mudra: {MUDRA_LABEL}")
+    print("Hold your hand in position, then press 's' to save, or 'q' to quit.")
+    if args.sequence:
+        print("Press 'r' to start or stop recording a continuous sequence.")
+    sequence = None
+    # failed reads are retried with growing waits instead of in a busy loop
+    backoff = CaptureBackoff()
+
+    # record mudra samples
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            if backoff.failed():
+                continue
+            print("Webcam stopped delivering frames")
+            break
+        backoff.succeeded()
+
+        frame = cv2.flip(frame, 1)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = hands.process(rgb)
+
+        key = cv2.waitKey(1) & 0xFF
+
+        if args.sequence and key == ord('r'):
+            if sequence is None:
+                sequence = new_sequence(MUDRA_LABEL, source=f"camera {args.camera}")
+                print(f"Recording sequence to {sequence.path}")
+            else:
+                sequence.close()
+                print(f"Saved sequence: {sequence.path} ({sequence.frames} frames, {sequence.rows_written} hands)")
+                sequence = None
+
+        if sequence is not None:
+            # every frame goes to the background writer, including frames without a hand
+            detected = results.multi_hand_landmarks or []
+            sequence.write(time.time(),
+                           [[[lm.x, lm.y, lm.z] for lm in hand.landmark] for hand in detected],
+                           [h.classification[0].label for h in results.multi_handedness or []],
+                           [h.classification[0].score for h in results.multi_handedness or []])
+
+        if results.multi_hand_landmarks:
+            for hand_landmarks in results.multi_hand_landmarks:
+                # draw landmarks
+                mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+
+                # convert landmarks to numpy array
+                landmark_array = np.array(
+                    [[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark],
+                    dtype=np.float32
+                )
+
+                # save when 's' is pressed
+                if key == ord('s'):
+                    if args.pack:
+                        dataset.append(MUDRA_LABEL, landmark_array, index=sample_count)
+                        print(f"Saved: {MUDRA_LABEL} #{sample_count} to {DEFAULT_PACK}")
+                    else:
+                        filename = f"{MUDRA_LABEL}_{sample_count:03d}.npy"
+                        np.save(os.path.join(SAVE_DIR, filename), landmark_array)
+                        print(f"Saved: {filename}")
+                    sample_count += 1
+
+        cv2.putText(frame, f"Mudra: {MUDRA_LABEL} | Samples: {sample_count}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        if sequence is not None:
+            cv2.putText(frame, f"REC {sequence.frames} frames", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        cv2.imshow(f"Record Mudra: {MUDRA_LABEL}", frame)
+
+        if key == ord('q') or key == 27:
+            break
+
+    # for exiting
+    if sequence is not None:
+        sequence.close()
+        print(f"Saved sequence: {sequence.path} ({sequence.frames} frames, {sequence.rows_written} hands)")
+    cap.release()
+    cv2.destroyAllWindows()
+    hands.close()
+    print("Done recording.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# Offline replay: stored landmarks through the live recognizer's classification path, as fast as possible
+#
+# Dataset samples (mudra_data or a pack) and .mseq sequence recordings are fed frame by frame to
+# mudra_recognition.FrameRecognizer, the tracking -> features -> classifier -> smoothing path the live
+# recognizer runs after MediaPipe, without a camera, window or frame pacing. Dataset samples are
+# replayed one mudra at a time, as if the dancer held it for that many frames; a recording is
+# replayed as recorded, its label being the truth for every frame. The recognizer is reset between
+# mudras and recordings. Everything is loaded before the clock starts.
+#
+# Confusion matrices (rows: true mudra, columns: prediction) are printed for
+#   classifier  the most probable mudra of each hand in each frame
+#   smoothed    the stabilized label the live recognizer shows ("-" while it is still undecided, and
+#               "unknown" with --reject when its confidence is too low)
+#   rules       mudra_rules' checks ("-" when no rule matches, "several" when more than one does)
+# with hands per second through the recognizer and the rules, and with --cascade the trees evaluated per hand. With --min-accuracy the exit status is 1
+# when the classifier's accuracy is below it, so a batch run can catch accuracy regressions.
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import numpy as np
+from mudra_cascade import REJECT_LABEL, add_cascade_arguments
+from mudra_dataset import default_data, is_pack
+from mudra_forest import DEFAULT_MODEL
+from mudra_startup import StartupProfiler, add_profile_argument
+from mudra_temporal import TEMPORAL_MODEL
+
+FRAME_RATE = 30.0           # timestamps given to dataset samples, one sample per frame
+UNDECIDED = "-"
+SEVERAL = "several"
+
+def sequence_paths(source):
+    # an .mseq file, or every .mseq below a folder (e.g. mudra_sequences/<label>/)
+    if os.path.isfile(source):
+        return [source]
+    return sorted(glob.glob(os.path.join(source, "**", "*.mseq"), recursive=True))
+
+def dataset_sessions(data):
+    # one session per mudra: its samples as consecutive single-hand frames, all moved so their wrists
+    # meet the first one's (features and rules don't depend on where the hand is, but hand tracking
+    # would start a new track for every sample recorded at a different spot)
+    from train_gesture_classifier import load_landmarks
+    landmarks, y = load_landmarks(data)
+    sessions = []
+    for label in dict.fromkeys(y.tolist()):
+        hands = np.array(landmarks[y == label], dtype=np.float64)
+        hands[..., :2] += hands[:1, :1, :2] - hands[:, :1, :2]
+        frames = [(i / FRAME_RATE, hand[None], ["Right"]) for i, hand in enumerate(hands)]
+        sessions.append((f"{data}:{label}", label, frames))
+    return sessions
+
+def sequence_sessions(paths):
+    # one session per recording, frames without hands are skipped like the recorder skipped them
+    from mudra_sequence import SequenceReader, handedness_names
+    sessions = []
+    for path in paths:
+        with SequenceReader(path) as reader:
+            frames = [(timestamp, np.array(rows["landmarks"]),
+                       handedness_names(rows["handedness"]))
+                      for _, timestamp, rows in reader.iter_frames()]
+            sessions.append((path, reader.label, frames))
+    return sessions
+
+def load_sessions(sources):
+    sessions = []
+    for source in sources:
+        paths = [] if is_pack(source) else sequence_paths(source)
+        if paths and (os.path.isfile(source) or not glob.glob(os.path.join(source, "*", "*.npy"))):
+            sessions += sequence_sessions(paths)
+        else:
+            sessions += dataset_sessions(source)
+    return sessions
+
+def replay(recognizer, sessions):
+    # -> (truth, classifier prediction, smoothed label) per hand and the seconds spent in the recognizer
+    classes = [str(label) for label in recognizer.forest.classes]
+    truth, predicted, smoothed = [], [], []
+    elapsed = 0.0
+    for _, label, frames in sessions:
+        recognizer.reset()
+        for timestamp, landmarks, handedness in frames:
+            start = time.perf_counter()
+            result = recognizer.process(landmarks, handedness, timestamp)
+            elapsed += time.perf_counter() - start
+            if result.proba is None:
+                continue
+            truth += [label] * len(landmarks)
+            predicted += [classes[i] for i in np.argmax(result.proba, axis=1)]
+            smoothed += [UNDECIDED if hand_label is None else str(hand_label) for hand_label in result.labels]
+        recognizer.flush()
+    return truth, predicted, smoothed, elapsed
+
+def replay_rules(sessions):
+    # mudra_rules on every frame's hands (mirrored onto the right hand like for the classifier)
+    from mudra_features import normalize_handedness
+    from mudra_rules import ENGINE
+    predicted = []
+    elapsed = 0.0
+    for _, _, frames in sessions:
+        for _, landmarks, handedness in frames:
+            start = time.perf_counter()
+            matches = ENGINE.evaluate(normalize_handedness(landmarks, handedness))
+            elapsed += time.perf_counter() - start
+            for hand in matches.T:
+                names = [name for name, match in zip(ENGINE.names, hand) if match]
+                predicted.append(names[0] if len(names) == 1 else SEVERAL if names else UNDECIDED)
+    return predicted, elapsed, ENGINE.names
+
+def confusion(truth, predicted, rows, columns):
+    matrix = np.zeros((len(rows), len(columns)), dtype=int)
+    row, column = {name: i for i, name in enumerate(rows)}, {name: i for i, name in enumerate(columns)}
+    for t, p in zip(truth, predicted):
+        matrix[row[t], column[p]] += 1
+    return matrix
+
+def report(name, truth, predicted, rows, columns, seconds, scored=None):
+    # prints the confusion matrix and returns its JSON summary; scored limits the accuracy to those true mudras
+    matrix = confusion(truth, predicted, rows, columns)
+    truth, predicted = np.array(truth), np.array(predicted)
+    mask = np.ones(len(truth), dtype=bool) if scored is None else np.isin(truth, scored)
+    accuracy = float(np.mean(truth[mask] == predicted[mask])) if mask.any() else float("nan")
+    width = max(7, max(len(c) for c in columns) if len(columns) < 8 else 7)
+    label_width = max(len(r) for r in rows)
+    print(f"\n=== {name}: accuracy {accuracy:.3f} over {int(mask.sum())} hands, {len(truth) / seconds:,.0f} hands/s ===")
+    print(" " * label_width + "".join(f" {c[:width]:>{width}}" for c in columns) + f" {'correct':>8}")
+    for r, counts in zip(rows, matrix):
+        total = counts.sum()
+        right = counts[columns.index(r)] if r in columns else 0
+        share = f"{right / total:.2f}" if total and (scored is None or r in scored) else "-"
+        print(f"{r:<{label_width}}" + "".join(f" {count or '.':>{width}}" for count in counts) + f" {share:>8}")
+    return {"accuracy": accuracy, "hands": int(mask.sum()), "hands_per_s": len(truth) / seconds,
+            "rows": rows, "columns": columns, "matrix": matrix.tolist()}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Replay stored landmarks through the recognizer: confusion matrices and throughput")
+    parser.add_argument("sources", nargs="*",
+                        help="mudra_data folders, packed datasets, .mseq recordings or folders of them "
+                             "(default: mudra_data.pack if present, else mudra_data)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"exported model directory or .pkl (default: {DEFAULT_MODEL})")
+    parser.add_argument("--temporal", nargs="?", const=TEMPORAL_MODEL, default=None, metavar="MODEL",
+                        help=f"replay through the temporal model instead (default: {TEMPORAL_MODEL})")
+    parser.add_argument("--window", type=int, default=8, help="frames of probabilities averaged before labelling (default: 8)")
+    parser.add_argument("--switch-frames", type=int, default=3, help="frames a new mudra must lead before the label changes (default: 3)")
+    add_cascade_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=1, help="replay everything this many times, for steadier throughput (default: 1)")
+    parser.add_argument("--no-rules", action="store_true", help="skip the mudra_rules confusion matrix")
+    parser.add_argument("--min-accuracy", type=float, default=None,
+                        help="exit with status 1 when the classifier's accuracy is below this (0-1)")
+    parser.add_argument("-o", "--output", default=None, help="also write the report as JSON")
+    add_profile_argument(parser)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sources = args.sources or [default_data()]
+
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("load model"):
+        from mudra_cascade import cascade_from_args
+        from mudra_forest import load_model, load_model_and_features, read_model_meta
+        from mudra_recognition import FrameRecognizer
+        from mudra_temporal import WINDOW_FEATURE_NAMES
+        feature_set, window = None, None
+        if args.temporal:
+            forest = load_model(args.temporal, WINDOW_FEATURE_NAMES)
+            window = read_model_meta(args.temporal)["window"]
+        else:
+            forest, feature_set = load_model_and_features(args.model)
+        forest = cascade_from_args(forest, args.temporal or args.model, args)
+    with profiler.step("load landmarks"):
+        sessions = load_sessions(sources)
+    profiler.report()
+    frames = sum(len(s[2]) for s in sessions)
+    hands = sum(len(f[1]) for s in sessions for f in s[2])
+    if not hands:
+        print(f"No hands to replay in {', '.join(sources)}")
+        sys.exit(1)
+    print(f"Replaying {hands} hands in {frames} frames from {len(sessions)} sessions "
+          f"through {args.temporal or args.model}" + (f" ({args.repeat}x)" if args.repeat > 1 else ""))
+
+    recognizer = FrameRecognizer(forest, feature_set, window, window=args.window, switch_frames=args.switch_frames)
+    elapsed = 0.0
+    for _ in range(args.repeat):
+        truth, predicted, smoothed, seconds = replay(recognizer, sessions)
+        elapsed += seconds
+    classes = [str(label) for label in forest.classes]
+    rows = list(dict.fromkeys(classes + sorted(set(truth) - set(classes))))
+    results = {"sources": sources, "model": args.temporal or args.model, "frames": frames,
+               "classifier": report("classifier", truth, predicted, rows, classes, elapsed / args.repeat),
+               "smoothed": report("smoothed", truth, smoothed, rows,
+                                  classes + [UNDECIDED] + ([REJECT_LABEL] if args.reject else []), elapsed / args.repeat)}
+    if hasattr(forest, "average_trees"):
+        results["average_trees"] = forest.average_trees
+        print(f"\nCascade: {forest.average_trees:.1f} of {forest.n_trees} trees per hand on average (delta {forest.delta})")
+    if not args.no_rules:
+        rules_elapsed = 0.0
+        for _ in range(args.repeat):
+            rule_predicted, seconds, rule_names = replay_rules(sessions)
+            rules_elapsed += seconds
+        results["rules"] = report("rules", truth, rule_predicted, rows, rule_names + [UNDECIDED, SEVERAL],
+                                  rules_elapsed / args.repeat, scored=rule_names)
+    print("\nRecognizer stages:")
+    for line in recognizer.times.percentile_lines():
+        print(f"  {line}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Report written to '{args.output}'")
+    if args.min_accuracy is not None and results["classifier"]["accuracy"] < args.min_accuracy:
+        print(f"Classifier accuracy {results['classifier']['accuracy']:.3f} is below {args.min_accuracy}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
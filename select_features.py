@@ -0,0 +1,132 @@
+# Feature-selection report: ranks the feature groups of mudra_features by accuracy gained per microsecond
+#
+# Starting from --base (the basic joint angles), every round tries adding each remaining group:
+# a forest is cross-validated on the selection, and one live frame for a single hand (feature
+# extraction + compiled forest prediction) is timed. The group with the most accuracy gained per
+# extra microsecond is kept, until no group improves accuracy or the next one would exceed --budget.
+# The chosen groups are printed as a --features argument for train_gesture_classifier.py.
+import argparse
+import json
+import time
+from mudra_dataset import default_data
+from mudra_features import FEATURE_GROUPS, FeatureSet
+from mudra_forest import compile_forest
+from mudra_startup import StartupProfiler, add_profile_argument
+from train_gesture_classifier import load_landmarks
+
+def frame_costs_us(models, hands, repeat=200, rounds=7):
+    # best-of-rounds time of what the live recognizer does per frame with one hand, for each
+    # (feature set, forest); the models are timed in turns so drifting machine load affects all alike
+    best = [float("inf")] * len(models)
+    for _ in range(rounds):
+        for m, (feature_set, forest) in enumerate(models):
+            start = time.perf_counter()
+            for i in range(repeat):
+                forest.predict_proba(feature_set.extract_batch(hands[i % len(hands)][None]))
+            best[m] = min(best[m], (time.perf_counter() - start) / repeat * 1e6)
+    return best
+
+def evaluate(groups, X, y, names, folds, trees):
+    # cross-validated accuracy of a forest trained on the given groups, plus the compiled forest
+    # trained on all samples (for timing)
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import StratifiedKFold, cross_val_score
+    feature_set = FeatureSet(groups)
+    columns = [names.index(name) for name in feature_set.names]
+    clf = RandomForestClassifier(n_estimators=trees, random_state=42, n_jobs=-1)
+    cv = StratifiedKFold(folds, shuffle=True, random_state=42)
+    accuracy = cross_val_score(clf, X[:, columns], y, cv=cv).mean()
+    forest = compile_forest(clf.fit(X[:, columns], y))
+    return {"groups": feature_set.groups, "features": len(columns), "accuracy": float(accuracy)}, (feature_set, forest)
+
+def forward_selection(X, y, names, landmarks, base, budget_us=None, folds=5, trees=50):
+    # greedy: each round keeps the candidate with the best accuracy gain per extra microsecond
+    current, current_model = evaluate(base, X, y, names, folds, trees)
+    current["cost_us"] = frame_costs_us([current_model], landmarks)[0]
+    rounds = [{"chosen": current, "candidates": []}]
+    remaining = [group for group in FEATURE_GROUPS if group not in current["groups"]]
+    while remaining:
+        candidates, models = [], []
+        for group in remaining:
+            candidate, model = evaluate(current["groups"] + [group], X, y, names, folds, trees)
+            candidate["added"] = group
+            candidates.append(candidate)
+            models.append(model)
+        # the current selection is timed again alongside its candidates, so extra_us compares like with like
+        *costs, current_cost = frame_costs_us(models + [current_model], landmarks)
+        for candidate, model, cost in zip(candidates, models, costs):
+            candidate["cost_us"] = cost
+            candidate["gain"] = candidate["accuracy"] - current["accuracy"]
+            candidate["extra_us"] = cost - current_cost
+            # a group can even make the frame cheaper (shallower trees), so the cost is floored at 1us
+            candidate["gain_per_us"] = candidate["gain"] / max(candidate["extra_us"], 1.0)
+            candidate["_model"] = model
+        candidates.sort(key=lambda c: -c["gain_per_us"])
+        affordable = [c for c in candidates if budget_us is None or c["cost_us"] <= budget_us]
+        chosen = affordable[0] if affordable and affordable[0]["gain"] > 0 else None
+        for candidate in candidates:
+            model = candidate.pop("_model")
+            if candidate is chosen:
+                current_model = model
+        rounds.append({"chosen": chosen, "candidates": candidates})
+        if chosen is None:
+            break
+        current = chosen
+        remaining.remove(chosen["added"])
+    return rounds, current
+
+def print_report(rounds, selected):
+    start = rounds[0]["chosen"]
+    print(f"Start: {', '.join(start['groups'])}: accuracy {start['accuracy']:.3f}, {start['cost_us']:.1f}us/frame")
+    for i, round_ in enumerate(rounds[1:], 1):
+        print(f"\n=== Round {i} ===")
+        print(f"{'group':>14} {'features':>9} {'accuracy':>9} {'gain':>7} {'us/frame':>9} {'extra us':>9} {'gain/us':>9}")
+        for c in round_["candidates"]:
+            mark = "*" if c is round_["chosen"] else " "
+            print(f"{c['added']:>13}{mark} {c['features']:>9} {c['accuracy']:>9.3f} {c['gain']:>+7.3f} "
+                  f"{c['cost_us']:>9.1f} {c['extra_us']:>+9.1f} {c['gain_per_us'] * 1000:>9.2f}")
+    print("\n(gain/us is accuracy gained per extra microsecond, x1000; * marks the group that was kept)")
+    print(f"\nSelected: {', '.join(selected['groups'])}: accuracy {selected['accuracy']:.3f}, "
+          f"{selected['cost_us']:.1f}us/frame")
+    print(f"  python train_gesture_classifier.py --features {','.join(selected['groups'])}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Rank feature groups by accuracy gained per microsecond of frame time")
+    parser.add_argument("--data", default=None, help="mudra_data folder or packed dataset (default: mudra_data.pack if present, else mudra_data)")
+    parser.add_argument("--base", default="basic", help="groups every selection starts from (default: basic)")
+    parser.add_argument("--budget", type=float, default=None, help="max per-frame cost in microseconds (features + prediction)")
+    parser.add_argument("--folds", type=int, default=5, help="cross-validation folds (default: 5)")
+    parser.add_argument("--trees", type=int, default=50, help="trees in each evaluated forest (default: 50)")
+    parser.add_argument("-o", "--output", default=None, help="also write the report as JSON")
+    add_profile_argument(parser)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        base = FeatureSet.parse(args.base).groups
+    except ValueError as e:
+        parser.error(str(e))
+
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("import sklearn"):
+        import sklearn.ensemble  # noqa: F401
+    with profiler.step("extract features"):
+        data = args.data or default_data()
+        landmarks, y = load_landmarks(data)
+        # every group is extracted once, each evaluation picks its columns
+        extended = FeatureSet(list(FEATURE_GROUPS))
+        X = extended.extract_batch(landmarks)
+    profiler.report()
+    print(f"{len(X)} samples, {len(extended.names)} features in {len(FEATURE_GROUPS)} groups\n")
+
+    rounds, selected = forward_selection(X, y, extended.names, landmarks, base, args.budget, args.folds, args.trees)
+    print_report(rounds, selected)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rounds": rounds, "selected": selected}, f, indent=2)
+        print(f"\nReport written to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
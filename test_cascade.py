@@ -0,0 +1,46 @@
+# Checks the cascade's single-hand walk against the compiled forest, and which predictor the flags pick
+#   python -m pytest test_cascade.py
+from argparse import Namespace
+import numpy as np
+import pytest
+from mudra_cascade import CalibratedForest, CascadeForest, cascade_from_args, compile_trees
+from mudra_forest import load_model_and_features
+from train_gesture_classifier import load_dataset
+
+MODEL = "gesture_classifier.model"
+
+@pytest.fixture(scope="module")
+def forest_and_X():
+    forest, feature_set = load_model_and_features(MODEL)
+    X, _ = load_dataset(None, None, feature_set)
+    return forest, X.astype(np.float32)
+
+def test_generated_trees_reach_the_same_leaves(forest_and_X):
+    forest, X = forest_and_X
+    trees = compile_trees(forest)
+    leaves = forest._leaves(X)
+    for x, row in zip(X, leaves):
+        assert [tree(x.tolist()) for tree in trees] == row.tolist()
+
+@pytest.mark.parametrize("delta", [0.0, 0.05])
+def test_single_hands_match_the_batch(forest_and_X, delta):
+    forest, X = forest_and_X
+    batch_proba, batch_trees = CascadeForest(forest, delta=delta).votes(X)
+    cascade = CascadeForest(forest, delta=delta)
+    for x, proba, trees in zip(X, batch_proba, batch_trees):
+        single_proba, single_trees = cascade.votes(x[None])
+        np.testing.assert_allclose(single_proba[0], proba)
+        assert single_trees[0] == trees
+
+def test_exact_cascade_picks_the_full_forests_mudra(forest_and_X):
+    forest, X = forest_and_X
+    cascade = CascadeForest(forest, delta=0.0)
+    np.testing.assert_array_equal(cascade.predict(X), forest.predict(X))
+    assert cascade.average_trees < forest.n_trees
+
+def test_reject_alone_evaluates_the_full_forest(forest_and_X):
+    forest, X = forest_and_X
+    predictor = cascade_from_args(forest, MODEL, Namespace(cascade=False, delta=0.05, reject=0.5))
+    assert type(predictor) is CalibratedForest
+    np.testing.assert_array_equal(predictor.votes(X)[0], forest.predict_proba(X))
+    assert isinstance(cascade_from_args(forest, MODEL, Namespace(cascade=True, delta=0.05, reject=0.5)), CascadeForest)
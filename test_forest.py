@@ -0,0 +1,33 @@
+# Checks that the compiled forest predicts exactly what the sklearn forest it came from predicts
+#   python -m pytest test_forest.py
+import numpy as np
+import pytest
+from mudra_forest import compile_forest, load_forest, save_forest
+from train_gesture_classifier import load_dataset
+
+sklearn_ensemble = pytest.importorskip("sklearn.ensemble")
+
+@pytest.fixture(scope="module")
+def dataset():
+    return load_dataset()
+
+@pytest.mark.parametrize("model, params", [
+    ("RandomForestClassifier", {"n_estimators": 50}),
+    ("RandomForestClassifier", {"n_estimators": 25, "max_depth": 4}),
+    ("ExtraTreesClassifier", {"n_estimators": 50}),
+])
+def test_predict_proba_matches_sklearn(dataset, model, params):
+    X, y = dataset
+    clf = getattr(sklearn_ensemble, model)(random_state=42, **params).fit(X, y)
+    forest = compile_forest(clf)
+    expected = clf.predict_proba(X)
+    np.testing.assert_array_equal(forest.predict_proba(X), expected)
+    np.testing.assert_array_equal(forest.predict(X), clf.predict(X))
+    for x, row in zip(X, expected):
+        np.testing.assert_array_equal(forest.predict_one_proba(x), row)
+
+def test_exported_model_matches_sklearn(dataset, tmp_path):
+    X, y = dataset
+    clf = sklearn_ensemble.RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    save_forest(compile_forest(clf), str(tmp_path / "model"))
+    np.testing.assert_array_equal(load_forest(str(tmp_path / "model")).predict_proba(X), clf.predict_proba(X))
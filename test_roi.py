@@ -0,0 +1,46 @@
+# Checks HandDetector's handedness labels with and without mirroring, on a stand-in for MediaPipe Hands
+#   python -m pytest test_roi.py
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from mudra_features import normalize_handedness
+from mudra_roi import HandDetector
+
+class FakeHands:
+    # returns the same hand for every image, labelled the way MediaPipe would
+    def __init__(self, landmarks, label):
+        landmark = [SimpleNamespace(x=float(x), y=float(y), z=float(z)) for x, y, z in landmarks]
+        classification = SimpleNamespace(label=label, score=0.9)
+        self.results = SimpleNamespace(multi_hand_landmarks=[SimpleNamespace(landmark=landmark)],
+                                       multi_handedness=[SimpleNamespace(classification=[classification])])
+
+    def process(self, rgb):
+        return self.results
+
+@pytest.fixture
+def hand():
+    return np.load("mudra_data/pataka/pataka_000.npy").astype(np.float32)
+
+def detect(hand, label, mirror):
+    detector = HandDetector(FakeHands(hand, label), mirror=mirror, use_roi=False, search_width=None, max_hands=1)
+    landmarks = detector.detect(np.zeros((480, 640, 3), dtype=np.uint8))
+    return np.array(landmarks), detector.handedness
+
+@pytest.mark.parametrize("label, swapped", [("Left", "Right"), ("Right", "Left")])
+def test_mirrored_landmarks_get_the_swapped_label(hand, label, swapped):
+    landmarks, handedness = detect(hand, label, mirror=True)
+    assert handedness == [swapped]
+    np.testing.assert_allclose(landmarks[0, :, 0], 1.0 - hand[:, 0], atol=1e-6)
+
+@pytest.mark.parametrize("label", ["Left", "Right"])
+def test_unmirrored_landmarks_keep_mediapipes_label(hand, label):
+    landmarks, handedness = detect(hand, label, mirror=False)
+    assert handedness == [label]
+    np.testing.assert_allclose(landmarks[0], hand, atol=1e-6)
+
+@pytest.mark.parametrize("label", ["Left", "Right"])
+def test_canonical_hand_is_the_same_either_way(hand, label):
+    # --no-flip must not change what the classifier sees
+    mirrored = normalize_handedness(*detect(hand, label, mirror=True))
+    unmirrored = normalize_handedness(*detect(hand, label, mirror=False))
+    np.testing.assert_allclose(mirrored, unmirrored, atol=1e-6)
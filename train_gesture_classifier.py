@@ -1,60 +1,214 @@
 # Trains RandomForestClassifier model on mudra data
+import argparse
+import hashlib
+import io
 import os
+import pickle
+import time
 import numpy as np
-import joblib
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
-
-def vector(a, b):
-    return np.array(b) - np.array(a)
-
-def angle_between(v1, v2):
-    cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-    cos_angle = np.clip(cos_angle, -1.0, 1.0)
-    return np.degrees(np.arccos(cos_angle))
-
-def extract_features(landmarks):
-    features = []
-    pip_pairs = [(6, 5, 8), (10, 9, 12), (14, 13, 16), (18, 17, 20)]
-    for pip, mcp, tip in pip_pairs:
-        v1 = vector(landmarks[mcp], landmarks[pip])
-        v2 = vector(landmarks[tip], landmarks[pip])
-        features.append(angle_between(v1, v2))
-    wrist = landmarks[0]
-    thumb_base = landmarks[2]
-    thumb_tip = landmarks[4]
-    v1 = vector(wrist, thumb_base)
-    v2 = vector(thumb_base, thumb_tip)
-    features.append(angle_between(v1, v2))
-    return features
-
-def load_dataset(data_dir="mudra_data"):
-    X, y = [], []
-    for gesture in sorted(os.listdir(data_dir)):
-        gesture_path = os.path.join(data_dir, gesture)
-        if not os.path.isdir(gesture_path):
-            continue
-        for filename in sorted(os.listdir(gesture_path)):
-            if not filename.endswith(".npy"):
-                continue
-            path = os.path.join(gesture_path, filename)
-            landmarks = np.load(path)
-            X.append(extract_features(landmarks))
+from mudra_features import FEATURE_PRESETS, FeatureSet
+from mudra_dataset import default_data, is_pack, iter_tree, open_pack
+from mudra_forest import DEFAULT_MODEL, compile_forest, save_forest
+from mudra_startup import StartupProfiler, add_profile_argument
+
+FEATURE_CACHE = "feature_cache.npz"
+
+# models tried by --search (sklearn.ensemble class names, imported on first use), all of them can be
+# compiled by mudra_forest for the live recognizer
+SEARCH_SPACE = [
+    ("RandomForestClassifier", {"n_estimators": [10, 25, 50, 100], "max_depth": [None, 6, 10]}),
+    ("ExtraTreesClassifier", {"n_estimators": [10, 25, 50, 100], "max_depth": [None, 6, 10]}),
+]
+
+# loads raw landmarks and labels from either a packed dataset or a mudra_data/<label>/*.npy tree
+def load_landmarks(data_dir="mudra_data"):
+    if is_pack(data_dir):
+        dataset = open_pack(data_dir)
+        return dataset.landmarks, dataset.label_names()
+    landmarks, y = [], []
+    for gesture, path in iter_tree(data_dir):
+        landmarks.append(np.load(path))
+        y.append(gesture)
+    return np.array(landmarks), np.array(y)
+
+# cached features are only reused while the feature definition stays the same
+def feature_schema(feature_set):
+    return ",".join(feature_set.names)
+
+def load_feature_cache(path, schema):
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as cache:
+        if str(cache["schema"]) != schema:
+            return {}
+        return dict(zip(cache["keys"].tolist(), cache["features"]))
+
+def save_feature_cache(path, cache, schema):
+    keys = sorted(cache)
+    features = np.array([cache[key] for key in keys]).reshape(len(keys), -1)
+    np.savez(path, schema=schema, keys=np.array(keys), features=features)
+
+# like load_landmarks + feature extraction, but samples whose content hash is already in the
+# cache skip feature extraction (and, for .npy trees, parsing the file)
+def load_cached_features(data_dir, cache_path, feature_set):
+    schema = feature_schema(feature_set)
+    cache = load_feature_cache(cache_path, schema)
+    keys, y, missing = [], [], {}
+    if is_pack(data_dir):
+        dataset = open_pack(data_dir)
+        for landmarks in dataset.landmarks:
+            key = hashlib.sha1(landmarks.tobytes()).hexdigest()
+            keys.append(key)
+            if key not in cache:
+                missing[key] = landmarks
+        y = dataset.label_names()
+    else:
+        for gesture, path in iter_tree(data_dir):
+            with open(path, "rb") as f:
+                content = f.read()
+            key = hashlib.sha1(content).hexdigest()
+            keys.append(key)
             y.append(gesture)
-    return np.array(X), np.array(y)
+            if key not in cache:
+                missing[key] = np.load(io.BytesIO(content))
+        y = np.array(y)
+    if missing:
+        features = feature_set.extract_batch(np.array(list(missing.values())))
+        cache.update(zip(missing, features))
+        save_feature_cache(cache_path, cache, schema)
+    print(f"Features: {len(keys) - len(missing)} cached, {len(missing)} extracted")
+    return np.array([cache[key] for key in keys]), y
+
+def load_dataset(data_dir=None, cache_path=None, feature_set=None):
+    if data_dir is None:
+        data_dir = default_data()
+    feature_set = feature_set or FeatureSet()
+    if cache_path is not None:
+        return load_cached_features(data_dir, cache_path, feature_set)
+    landmarks, y = load_landmarks(data_dir)
+    # extract features for every sample in one vectorized pass
+    X = feature_set.extract_batch(landmarks)
+    return X, y
+
+def single_sample_latency_us(clf, X, repeat=50, rounds=5):
+    # per-frame cost in the live recognizer, which predicts through the compiled forest
+    # (best of a few rounds, to keep other processes from skewing the comparison)
+    forest = compile_forest(clf)
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(repeat):
+            forest.predict_one(X[i % len(X)])
+        best = min(best, (time.perf_counter() - start) / repeat * 1e6)
+    return best
+
+# cross-validates every model in SEARCH_SPACE (folds in parallel), then measures latency and size of
+# each on the forest its first fold trained, so no candidate is fitted again on the full data
+def search_models(X, y, folds=5, n_jobs=-1):
+    import sklearn.ensemble
+    from sklearn.model_selection import ParameterGrid, StratifiedKFold, cross_validate
+    cv = StratifiedKFold(folds, shuffle=True, random_state=42)
+    candidates = []
+    for name, grid in SEARCH_SPACE:
+        model = getattr(sklearn.ensemble, name)
+        for params in ParameterGrid(grid):
+            scores = cross_validate(model(random_state=42, **params), X, y, cv=cv, n_jobs=n_jobs, return_estimator=True)
+            clf = scores["estimator"][0]
+            candidates.append({
+                "model": model.__name__,
+                "params": params,
+                "accuracy": scores["test_score"].mean(),
+                "latency_us": single_sample_latency_us(clf, X),
+                "size_kb": len(pickle.dumps(clf)) / 1024,
+                "estimator": model,
+            })
+    return candidates
+
+def pick_model(candidates, latency_budget_us=None):
+    # most accurate model within the latency budget, ties go to the faster one
+    within = [c for c in candidates if latency_budget_us is None or c["latency_us"] <= latency_budget_us]
+    if not within:
+        print(f"No model fits within {latency_budget_us:.0f}us, picking the fastest")
+        return min(candidates, key=lambda c: c["latency_us"])
+    return max(within, key=lambda c: (round(c["accuracy"], 4), -c["latency_us"]))
+
+def print_candidates(candidates):
+    print("=== Model Search (cross-validated) ===")
+    print(f"{'model':>24} {'trees':>6} {'depth':>6} {'accuracy':>9} {'us/sample':>10} {'size (KB)':>10}")
+    for c in sorted(candidates, key=lambda c: -c["accuracy"]):
+        params = c["params"]
+        print(f"{c['model']:>24} {params['n_estimators']:>6} {str(params['max_depth']):>6} "
+              f"{c['accuracy']:>9.3f} {c['latency_us']:>10.1f} {c['size_kb']:>10.1f}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Train the mudra classifier")
+    parser.add_argument("--data", default=None, help="mudra_data folder or packed dataset (default: mudra_data.pack if present, else mudra_data)")
+    parser.add_argument("--search", action="store_true", help="cross-validate forest sizes/depths in parallel and pick one")
+    parser.add_argument("--latency-budget", type=float, default=None, help="with --search, max per-sample prediction time in microseconds")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel jobs for --search (default: all cores)")
+    parser.add_argument("--features", default="basic",
+                        help=f"feature groups: {' or '.join(FEATURE_PRESETS)}, or a comma-separated list of groups "
+                             "(see select_features.py, default: basic)")
+    parser.add_argument("--no-cache", action="store_true", help=f"don't read or update {FEATURE_CACHE}")
+    add_profile_argument(parser)
+    return parser
 
 # prints out classification report for each gesture along with different parameters and model accuracy
-def main():
-    X, y = load_dataset()
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        feature_set = FeatureSet.parse(args.features)
+    except ValueError as e:
+        parser.error(str(e))
+
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("import sklearn"):
+        import joblib
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report
+    with profiler.step("load dataset"):
+        X, y = load_dataset(args.data, None if args.no_cache else FEATURE_CACHE, feature_set)
+    profiler.report()
+    print(f"Features: {len(feature_set.names)} ({', '.join(feature_set.groups)})")
+    if args.search:
+        candidates = search_models(X, y, n_jobs=args.jobs)
+        print_candidates(candidates)
+        best = pick_model(candidates, args.latency_budget)
+        print(f"\nPicked {best['model']} {best['params']}: accuracy {best['accuracy']:.3f}, "
+              f"{best['latency_us']:.1f}us/sample, {best['size_kb']:.1f} KB\n")
+        model, params = best["estimator"], best["params"]
+    else:
+        model, params = RandomForestClassifier, {"n_estimators": 100}
+
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    clf = RandomForestClassifier(n_estimators=100, random_state=42)
+    clf = model(random_state=42, **params)
     clf.fit(X_train, y_train)
     y_pred = clf.predict(X_test)
     print("=== Classification Report ===")
     print(classification_report(y_test, y_pred))
+    # maps the forest's averaged votes to how often they are right, fitted on out-of-fold predictions
+    # of the training split and checked on the test split (see mudra_cascade.py)
+    # the cascade (at its default delta) gets its own, fitted on its partial averages
+    from mudra_cascade import (DEFAULT_DELTA, Calibration, CascadeForest, delta_key, estimator_json,
+                               expected_calibration_error, held_out_proba)
+    full, cascade = held_out_proba(clf, X_train, y_train, deltas=(None, DEFAULT_DELTA))
+    calibration, cascade_calibration = Calibration.fit(*full), Calibration.fit(*cascade)
+    forest = compile_forest(clf)
+    for name, proba, fitted in [("forest", clf.predict_proba(X_test), calibration),
+                                ("cascade", CascadeForest(forest, delta=DEFAULT_DELTA).predict_proba(X_test), cascade_calibration)]:
+        correct = clf.classes_[np.argmax(proba, axis=1)] == y_test
+        print(f"Expected calibration error of the {name} on the test split: {expected_calibration_error(proba, correct):.3f} raw, "
+              f"{expected_calibration_error(fitted.apply(proba), correct):.3f} calibrated")
+    print()
     joblib.dump(clf, "gesture_classifier.pkl")
     print("Model saved as 'gesture_classifier.pkl'")
+    # compact NumPy-only copy that the live recognizer loads without sklearn
+    save_forest(forest, DEFAULT_MODEL, feature_set.names,
+                {"estimator": estimator_json(clf), "calibration": calibration.to_json(),
+                 "cascade_calibration": {delta_key(DEFAULT_DELTA): cascade_calibration.to_json()}})
+    print(f"Model exported to '{DEFAULT_MODEL}'")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,165 @@
+# Trains the sequence-aware (temporal) mudra classifier on sliding windows of landmark frames
+#
+# Training windows come from continuous recordings made with record_mudra.py --sequence under
+# mudra_sequences/<label>/*.mseq, so the model learns how mudras actually move and change into one
+# another. As a fallback while there are few or no recordings, --synthetic adds "held mudra"
+# sequences made from every mudra_data sample (jitter plus slow drift). Those are static poses
+# without real motion, so accuracy is reported separately for recorded and synthetic test windows,
+# and only the recorded figure says how the model does on real movement. The model is exported as a
+# NumPy-only forest directory that the live recognizer runs with --temporal, with its confidence
+# calibration (see mudra_cascade.py) fitted on windows of other samples and recordings than its own.
+import argparse
+import glob
+import os
+import time
+import numpy as np
+from mudra_dataset import default_data
+from mudra_features import normalize_handedness
+from mudra_forest import compile_forest, save_forest
+from mudra_sequence import DEFAULT_SEQUENCE_DIR, SequenceReader, handedness_names
+from mudra_startup import StartupProfiler, add_profile_argument
+from mudra_temporal import (DEFAULT_WINDOW, TEMPORAL_MODEL, WINDOW_FEATURE_NAMES, TemporalWindow,
+                            frame_features_batch, hold_sequence, window_features_batch)
+from train_gesture_classifier import load_landmarks
+
+# windows from synthetic holds of the static samples, grouped by the sample they came from
+def synthetic_windows(landmarks, labels, window, holds=4, seed=0):
+    rng = np.random.default_rng(seed)
+    X, y, groups = [], [], []
+    for i, (sample, label) in enumerate(zip(landmarks, labels)):
+        for _ in range(holds):
+            sequence, timestamps = hold_sequence(np.asarray(sample), rng)
+            X.append(window_features_batch(frame_features_batch(sequence), timestamps, window))
+            y.extend([label] * len(sequence))
+            groups.extend([i] * len(sequence))
+    return np.vstack(X), np.array(y), np.array(groups)
+
+# windows from recorded sequences (the first hand of every frame), grouped by recording
+def recorded_windows(paths, window, first_group):
+    X, y, groups = [], [], []
+    for group, path in enumerate(paths, first_group):
+        with SequenceReader(path) as reader:
+            rows = reader.rows()
+        rows = rows[rows["hand"] == 0]
+        if not len(rows) or reader.label is None:
+            continue
+        landmarks = normalize_handedness(rows["landmarks"], handedness_names(rows["handedness"]))
+        X.append(window_features_batch(frame_features_batch(landmarks), rows["timestamp"], window))
+        y.extend([reader.label] * len(rows))
+        groups.extend([group] * len(rows))
+    if not X:
+        return np.empty((0, len(WINDOW_FEATURE_NAMES))), np.array([]), np.array([], dtype=int)
+    return np.vstack(X), np.array(y), np.array(groups)
+
+def sequence_paths(sequences_dir=DEFAULT_SEQUENCE_DIR):
+    return sorted(glob.glob(os.path.join(sequences_dir, "*", "*.mseq")))
+
+# windows of the recordings, preceded by `holds` synthetic holds of every sample (none for 0, landmarks
+# and labels are then unused), and whether each window was recorded
+def build_windows(landmarks, labels, paths, window, holds=0):
+    if holds:
+        X, y, groups = synthetic_windows(landmarks, labels, window, holds)
+    else:
+        X, y, groups = np.empty((0, len(WINDOW_FEATURE_NAMES))), np.array([]), np.array([], dtype=int)
+    X_rec, y_rec, groups_rec = recorded_windows(paths, window, groups.max() + 1 if len(groups) else 0)
+    recorded = np.concatenate([np.zeros(len(X), dtype=bool), np.ones(len(X_rec), dtype=bool)])
+    return np.vstack([X, X_rec]), np.concatenate([y, y_rec]), np.concatenate([groups, groups_rec]), recorded
+
+def first_recorded_hand(paths):
+    for path in paths:
+        with SequenceReader(path) as reader:
+            rows = reader.rows()
+        if len(rows):
+            return np.array(rows["landmarks"][0])
+    return None
+
+def per_frame_latency_us(forest, sample, windows=(4, 8, 16, 32, 64), frames=300):
+    # cost of one live frame (frame features + ring buffer update + predict) for several window lengths
+    sequence, timestamps = hold_sequence(np.asarray(sample), np.random.default_rng(1), frames=frames)
+    latency = {}
+    for window in windows:
+        buffer = TemporalWindow(window)
+        start = time.perf_counter()
+        for landmarks, timestamp in zip(sequence, timestamps):
+            forest.predict_one_proba(buffer.push(frame_features_batch(landmarks[None])[0], timestamp))
+        latency[window] = (time.perf_counter() - start) / frames * 1e6
+    return latency
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Train the temporal (sliding-window) mudra classifier")
+    parser.add_argument("--data", default=None, help="mudra_data folder or packed dataset (default: mudra_data.pack if present, else mudra_data)")
+    parser.add_argument("--sequences", default=DEFAULT_SEQUENCE_DIR, help=f"folder of <label>/*.mseq recordings (default: {DEFAULT_SEQUENCE_DIR})")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help=f"frames per window (default: {DEFAULT_WINDOW})")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="also train on synthetic holds of the mudra_data samples (static poses without real motion), "
+                             "the fallback while there are few or no recordings")
+    parser.add_argument("--holds", type=int, default=4, help="with --synthetic, held sequences per mudra_data sample (default: 4)")
+    parser.add_argument("--output", default=TEMPORAL_MODEL, help=f"model directory (default: {TEMPORAL_MODEL})")
+    add_profile_argument(parser)
+    return parser
+
+def report(title, y_true, y_pred, classification_report):
+    if not len(y_true):
+        print(f"=== {title}: none in the test split ===\n")
+        return
+    print(f"=== {title}: accuracy {np.mean(y_true == y_pred):.3f} over {len(y_true)} windows ===")
+    print(classification_report(y_true, y_pred, zero_division=0))
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    paths = sequence_paths(args.sequences)
+    if not paths and not args.synthetic:
+        parser.error(f"no recordings in '{args.sequences}' (record some with 'record_mudra.py <label> --sequence'), "
+                     "or pass --synthetic to train on synthetic holds of the mudra_data samples, which can't teach motion")
+    holds = args.holds if args.synthetic else 0
+
+    profiler = StartupProfiler(args.profile_startup)
+    with profiler.step("import sklearn"):
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import classification_report
+        from sklearn.model_selection import GroupShuffleSplit
+    with profiler.step("build windows"):
+        landmarks, labels = load_landmarks(args.data or default_data()) if holds else (None, None)
+        X, y, groups, recorded = build_windows(landmarks, labels, paths, args.window, holds)
+    profiler.report()
+    print(f"{len(X)} windows of {args.window} frames: {recorded.sum()} from {len(paths)} recordings, "
+          f"{len(X) - recorded.sum()} synthetic")
+
+    # split by source sample/recording so near-identical windows never end up on both sides
+    train, test = next(GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42).split(X, y, groups))
+    # small, shallow forest: the live loop predicts once per hand per frame
+    clf = RandomForestClassifier(n_estimators=30, max_depth=12, random_state=42, n_jobs=-1)
+    clf.fit(X[train], y[train])
+    y_pred = clf.predict(X[test])
+    # real movement and synthetic holds are reported apart, the synthetic ones are much easier
+    report("Recorded windows", y[test][recorded[test]], y_pred[recorded[test]], classification_report)
+    if holds:
+        report("Synthetic hold windows", y[test][~recorded[test]], y_pred[~recorded[test]], classification_report)
+    # out-of-fold windows of the training split, grouped like the split itself, through the full forest
+    # and the cascade at its default delta
+    from mudra_cascade import (DEFAULT_DELTA, Calibration, CascadeForest, delta_key, estimator_json,
+                               expected_calibration_error, held_out_proba)
+    full, cascade = held_out_proba(clf, X[train], y[train], groups=groups[train], deltas=(None, DEFAULT_DELTA))
+    calibration, cascade_calibration = Calibration.fit(*full), Calibration.fit(*cascade)
+    forest = compile_forest(clf)
+    for name, proba, fitted in [("forest", clf.predict_proba(X[test]), calibration),
+                                ("cascade", CascadeForest(forest, delta=DEFAULT_DELTA).predict_proba(X[test]), cascade_calibration)]:
+        correct = clf.classes_[np.argmax(proba, axis=1)] == y[test]
+        print(f"Expected calibration error of the {name} on the test windows: {expected_calibration_error(proba, correct):.3f} raw, "
+              f"{expected_calibration_error(fitted.apply(proba), correct):.3f} calibrated")
+    print()
+
+    save_forest(forest, args.output, WINDOW_FEATURE_NAMES,
+                extra={"window": args.window, "holds": holds, "estimator": estimator_json(clf),
+                       "calibration": calibration.to_json(),
+                       "cascade_calibration": {delta_key(DEFAULT_DELTA): cascade_calibration.to_json()}})
+    print(f"Model exported to '{args.output}'")
+
+    print("=== Per-frame latency (features + ring buffer update + predict) ===")
+    sample = landmarks[0] if holds else first_recorded_hand(paths)
+    for window, us in per_frame_latency_us(forest, sample).items():
+        print(f"  window {window:>3}: {us:6.1f}us/frame")
+
+if __name__ == "__main__":
+    main()